@@ -0,0 +1,34 @@
+from dishka.integrations.fastapi import DishkaRoute, FromDishka
+from fastapi import APIRouter, Query
+
+from app.api.routes.profiling import ACCESS_DENIED, allowed
+from app.core.config import AppSettings
+from app.core.startup import STARTUP
+from app.core.tracing import TRACER
+from app.services.proxies import ProxyPool
+
+router = APIRouter(include_in_schema=False, route_class=DishkaRoute)
+
+
+@router.get("/debug/{code}/traces")
+async def _(code: str, settings: FromDishka[AppSettings], limit: int = Query(default=20, ge=1, le=200)):
+    if not allowed(code, settings):
+        return ACCESS_DENIED
+    return {
+        "last": [trace.as_dict() for trace in TRACER.last(limit)],
+        "slowest": [trace.as_dict() for trace in TRACER.slowest(limit)],
+    }
+
+
+@router.get("/debug/{code}/startup")
+async def _(code: str, settings: FromDishka[AppSettings]):
+    if not allowed(code, settings):
+        return ACCESS_DENIED
+    return STARTUP.as_dict()
+
+
+@router.get("/debug/{code}/proxies")
+async def _(code: str, settings: FromDishka[AppSettings], pool: FromDishka[ProxyPool]):
+    if not allowed(code, settings):
+        return ACCESS_DENIED
+    return pool.as_dict()
@@ -1,10 +1,13 @@
+import logging
 from typing import Any
 
 from fastapi import APIRouter
 
 router = APIRouter(include_in_schema=False)
 
+logger = logging.getLogger(__name__)
+
 
 @router.get("/health")
 async def _():
-    print("healthy")
+    logger.debug("healthy", extra={"event": "health"})
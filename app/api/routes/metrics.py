@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from app.core.metrics import REGISTRY
+
+router = APIRouter(include_in_schema=False)
+
+
+@router.get("/metrics")
+async def _():
+    return Response(content=REGISTRY.render(), media_type=REGISTRY.content_type)
@@ -0,0 +1,99 @@
+from dishka.integrations.fastapi import DishkaRoute, FromDishka
+from fastapi import APIRouter, Query
+from starlette.responses import PlainTextResponse, Response
+
+from app.core.config import AppSettings
+from app.core.profiling import PROFILER
+
+router = APIRouter(tags=["Профилирование"], route_class=DishkaRoute, include_in_schema=False)
+
+ACCESS_DENIED = {"error": "Ошибка! Неверный код доступа"}
+
+
+def allowed(code: str, settings: AppSettings) -> bool:
+    return code == settings.app.SECURITY_CODE.get_secret_value()
+
+
+@router.get("/profiling/{code}")
+async def _(code: str, settings: FromDishka[AppSettings]):
+    """
+    Состояние профилирования: снятые профили тиков, tracemalloc и блокировки event loop.
+    """
+    if not allowed(code, settings):
+        return ACCESS_DENIED
+    return PROFILER.as_dict()
+
+
+@router.post("/profiling/{code}/ticks")
+async def _(code: str, settings: FromDishka[AppSettings], count: int = Query(default=1, ge=0, le=20)):
+    """
+    Снять cProfile следующих `count` тиков.
+    """
+    if not allowed(code, settings):
+        return ACCESS_DENIED
+    PROFILER.capture_ticks(count)
+    return PROFILER.as_dict()
+
+
+@router.get("/profiling/{code}/ticks/{index}")
+async def _(code: str, index: int, settings: FromDishka[AppSettings],
+            output: str = Query(default="prof", pattern="^(prof|text)$")):
+    """
+    Профиль тика: `prof` — файл pstats для snakeviz, `text` — топ функций по cumulative.
+    """
+    if not allowed(code, settings):
+        return ACCESS_DENIED
+    profile = PROFILER.get(index)
+    if profile is None:
+        return {"error": f"Профиль тика {index} не найден"}
+    if output == "text":
+        return PlainTextResponse(profile.summary())
+    return Response(
+        profile.dump(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="tick-{index}.prof"'},
+    )
+
+
+@router.post("/profiling/{code}/memory")
+async def _(code: str, settings: FromDishka[AppSettings], enable: bool = True,
+            frames: int = Query(default=10, ge=1, le=50), top: int = Query(default=30, ge=1, le=500)):
+    """
+    Включить или выключить tracemalloc; при включенном снимки сравниваются между тиками.
+    """
+    if not allowed(code, settings):
+        return ACCESS_DENIED
+    if enable:
+        PROFILER.start_memory(frames, top)
+    else:
+        PROFILER.stop_memory()
+    return PROFILER.as_dict()
+
+
+@router.get("/profiling/{code}/memory")
+async def _(code: str, settings: FromDishka[AppSettings]):
+    """
+    Разница памяти между двумя последними тиками по строкам кода.
+    """
+    if not allowed(code, settings):
+        return ACCESS_DENIED
+    return PlainTextResponse(
+        "\n".join(PROFILER.memory_diff) + "\n",
+        headers={"Content-Disposition": 'attachment; filename="memory-diff.txt"'},
+    )
+
+
+@router.post("/profiling/{code}/loop")
+async def _(code: str, settings: FromDishka[AppSettings], enable: bool = True,
+            threshold_ms: float = Query(default=100, ge=10)):
+    """
+    Включить или выключить монитор блокировок event loop.
+    """
+    if not allowed(code, settings):
+        return ACCESS_DENIED
+    if enable:
+        PROFILER.loop.threshold = threshold_ms / 1000
+        PROFILER.loop.start()
+    else:
+        PROFILER.loop.stop()
+    return PROFILER.loop.as_dict()
@@ -0,0 +1,79 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator
+
+from dishka.integrations.fastapi import DishkaRoute, FromDishka
+from fastapi import APIRouter, Request
+from starlette.responses import StreamingResponse
+
+from app.core.config import AppSettings
+from app.services.avito import AvitoBL, ShadowAvitoBL
+
+router = APIRouter(tags=["Внеочередной тик"], route_class=DishkaRoute)
+
+# запущенные вручную тики доживают до конца, даже если клиент отключился
+_ticks: set[asyncio.Task] = set()
+
+
+def sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def tick_events(avito: AvitoBL, keepalive: float = 15.0) -> AsyncIterator[str]:
+    """
+    Запускает тик и отдает его события в формате SSE, пока он не закончится. События тика, который
+    шел до ручного (плановый держит замок), отбрасываются по номеру тика.
+    """
+    own: int | None = None
+
+    def started(tick: int):
+        nonlocal own
+        own = tick
+
+    with avito.progress.subscribe() as events:
+        tick = asyncio.create_task(avito.run_tick(wait=True, started=started))
+        _ticks.add(tick)
+        tick.add_done_callback(_ticks.discard)
+        get: asyncio.Future | None = None
+        try:
+            while True:
+                get = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait({get, tick}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+                if get in done:
+                    event, data = get.result()
+                    if data.get("tick") == own:
+                        yield sse(event, data)
+                    continue
+                if tick in done:
+                    break
+                yield ": keepalive\n\n"
+        finally:
+            if get is not None:
+                get.cancel()
+        while not events.empty():
+            event, data = events.get_nowait()
+            if data.get("tick") == own:
+                yield sse(event, data)
+    error = asyncio.CancelledError() if tick.cancelled() else tick.exception()
+    if error is not None:
+        yield sse("error", {"error": repr(error)})
+    yield sse("done", {"ok": error is None})
+
+
+@router.post("/tick/{code}")
+async def _(code: str, request: Request, settings: FromDishka[AppSettings]):
+    """
+    Внеочередной тик, например сразу после замены промпта. Если идет плановый тик, новый начнется после него.
+    Ответ — поток SSE: `tick.started`, `stage` и `planned`, `chat` по каждому чату, `tick.finished`, `done`.
+    """
+    if code != settings.app.SECURITY_CODE.get_secret_value():
+        return {"error": "Ошибка! Неверный код доступа"}
+    # в режиме only основной бот не отвечает, тики идут только в теневом
+    avito = await request.app.state.dishka_container.get(
+        ShadowAvitoBL if settings.app.SHADOW_MODE == "only" else AvitoBL
+    )
+    return StreamingResponse(
+        tick_events(avito),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
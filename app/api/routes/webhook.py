@@ -0,0 +1,19 @@
+from dishka.integrations.fastapi import DishkaRoute, FromDishka
+from fastapi import APIRouter, Body
+
+from app.core.config import AppSettings
+from app.services.eventlog import EventLog
+
+router = APIRouter(tags=["Вебхук Avito"], route_class=DishkaRoute, include_in_schema=False)
+
+
+@router.post("/webhook/avito/{code}")
+async def _(code: str, settings: FromDishka[AppSettings], log: FromDishka[EventLog], event: dict = Body()):
+    """
+    Прием событий мессенджера Avito. Событие подтверждается после записи в локальный журнал,
+    обработка идет в фоне и может отставать.
+    """
+    if code != settings.app.SECURITY_CODE.get_secret_value():
+        return {"error": "Ошибка! Неверный код доступа"}
+    await log.append(event)
+    return {"ok": True}
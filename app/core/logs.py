@@ -0,0 +1,146 @@
+import json
+import logging
+import queue
+import sys
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Iterator, TextIO
+
+from app.core.tracing import TRACER
+
+_log_context: ContextVar[dict[str, Any]] = ContextVar("log_context", default={})
+
+# атрибуты LogRecord; все остальное пришло через `extra=` и выводится как поле
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """Поля (tick, chat_id, bot) добавляются ко всем записям, сделанным внутри блока, включая дочерние задачи."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class JSONFormatter(logging.Formatter):
+    """Одна запись — одна JSON-строка: время, уровень, логгер, сообщение, контекст, поля `extra` и трейсбек."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", None) or {})
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "context":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = "".join(traceback.format_exception(*record.exc_info))
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Кладет запись в очередь, не трогая stdout. Контекст и трейсбек снимаются здесь, в потоке loop:
+    в потоке записи contextvars и `exc_info` уже недоступны.
+    """
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # писатель не успевает: теряем запись, но не блокируем loop
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        context = dict(_log_context.get())
+        span = TRACER.current_span()
+        if span is not None:
+            context.setdefault("trace_id", span.trace.trace_id)
+        record.context = context
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Прореживание частых событий: запись с `extra={"event": name}` проходит с долей `rates[name]`.
+    Выборка детерминированная (каждая 1/rate-я запись), к записи добавляется `sample_rate`.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._counts: dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        rate = self.rates.get(event) if event else None
+        if rate is None or rate >= 1:
+            return True
+        n = self._counts.get(event, 0) + 1
+        self._counts[event] = n
+        if int(n * rate) == int((n - 1) * rate):
+            return False
+        record.sample_rate = rate
+        return True
+
+
+_listener: QueueListener | None = None
+_handler: ContextQueueHandler | None = None
+
+
+def setup_logging(
+        level: int | str = "INFO",
+        levels: dict[str, str] | None = None,
+        sampling: dict[str, float] | None = None,
+        stream: TextIO | None = None,
+        queue_size: int = 10_000,
+) -> QueueListener:
+    """
+    Переключает корневой логгер на очередь с отдельным потоком записи в `stream` (по умолчанию stdout).
+    `levels` — уровни по модулям, например `{"app.services.avito": "DEBUG", "httpx": "WARNING"}`.
+    Повторный вызов заменяет предыдущую настройку.
+    """
+    global _listener, _handler
+    stop_logging()
+    records: queue.Queue = queue.Queue(queue_size)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JSONFormatter())
+    _listener = QueueListener(records, output, respect_handler_level=False)
+    _handler = ContextQueueHandler(records)
+    _handler.addFilter(SamplingFilter(sampling or {}))
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level)
+    for name, module_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Дописывает очередь и снимает обработчик; дальше записи идут в стандартный `lastResort`."""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
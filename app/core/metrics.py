@@ -0,0 +1,301 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterable, Iterator
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_muted: ContextVar[bool] = ContextVar("metrics_muted", default=False)
+
+
+@contextmanager
+def metrics_muted() -> Iterator[None]:
+    """Обновления метрик внутри блока, включая дочерние задачи, отбрасываются (теневой режим)."""
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: dict[str, str] | None = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.extend(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind: str = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: ожидались метки {self.label_names}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        if amount < 0:
+            raise ValueError("Счетчик может только расти")
+        if _muted.get():
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str):
+        if _muted.get():
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # ключ меток -> (счетчики по корзинам, сумма, количество)
+        self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str):
+        if _muted.get():
+            return
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels: str) -> int:
+        value = self._values.get(self._key(labels))
+        return value[2] if value else 0
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, key, {'le': str(bound)})} {cumulative}"
+                )
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, {'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Реестр метрик в текстовом формате Prometheus (exposition format 0.0.4)."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register[M: _Metric](self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "avito_stage_duration_seconds",
+    "Длительность этапов обработки (get_chats, get_chat_messages, gen_answer, ...)",
+    labels=("stage", "outcome"),
+))
+CHATS_TOTAL = REGISTRY.register(Counter(
+    "avito_chats_total",
+    "Чаты по итогу обработки: seen, deferred, shed, answered, failed, skipped",
+    labels=("status",),
+))
+OPENAI_TOKENS_TOTAL = REGISTRY.register(Counter(
+    "avito_openai_tokens_total",
+    "Токены OpenAI по типу: prompt, completion, cached",
+    labels=("kind",),
+))
+BACKLOG_SIZE = REGISTRY.register(Gauge(
+    "avito_backlog_chats",
+    "Чаты, требующие ответа AI-ассистента на последнем тике",
+))
+QUOTA_REMAINING = REGISTRY.register(Gauge(
+    "avito_quota_remaining",
+    "Остаток лимита бота по данным сервиса лимитов",
+))
+OPENAI_CONCURRENCY_LIMIT = REGISTRY.register(Gauge(
+    "avito_openai_concurrency_limit",
+    "Текущий лимит параллельных запросов к OpenAI (AIMD)",
+))
+OPENAI_IN_FLIGHT = REGISTRY.register(Gauge(
+    "avito_openai_in_flight",
+    "Запросы к OpenAI в работе",
+))
+OPENAI_THROTTLE_TOTAL = REGISTRY.register(Counter(
+    "avito_openai_throttle_total",
+    "Снижения лимита параллельности OpenAI по причине: rate_limit, server_error, latency, timeout, ratelimit_header",
+    labels=("reason",),
+))
+TOKEN_BUDGET_USED = REGISTRY.register(Gauge(
+    "avito_token_budget_used_ratio",
+    "Доля дневного бюджета токенов бота, израсходованная с начала суток (UTC)",
+))
+CONVERSATION_BUILDS_TOTAL = REGISTRY.register(Counter(
+    "avito_conversation_builds_total",
+    "Сборки диалога для OpenAI: append — дописаны новые сообщения, rebuild — собран заново",
+    labels=("kind",),
+))
+CHATS_LATE_TOTAL = REGISTRY.register(Counter(
+    "avito_chats_late_total",
+    "Ответы, отправленные позже дедлайна (last_message.created + SLA)",
+))
+DEBOUNCE_COALESCED_MESSAGES = REGISTRY.register(Histogram(
+    "avito_debounce_coalesced_messages",
+    "Сколько входящих подряд покрыл один ответ",
+    buckets=(1, 2, 3, 4, 5, 8, 13),
+))
+PLANNER_AVOIDED_CALLS_TOTAL = REGISTRY.register(Counter(
+    "avito_planner_avoided_calls_total",
+    "Запросы, которые планировщик тика не стал делать, потому что квота не позволит ответить",
+    labels=("call",),
+))
+WEBHOOK_EVENTS_TOTAL = REGISTRY.register(Counter(
+    "avito_webhook_events_total",
+    "События вебхука по этапу: appended — записаны в журнал, processed, failed",
+    labels=("stage",),
+))
+EVENT_LOG_LAG = REGISTRY.register(Gauge(
+    "avito_event_log_lag",
+    "События вебхука, записанные в журнал, но еще не обработанные",
+))
+PROXY_HEALTHY = REGISTRY.register(Gauge(
+    "avito_proxy_healthy",
+    "1 — прокси в пуле, 0 — исключен после ошибок",
+    labels=("proxy",),
+))
+PROXY_LATENCY = REGISTRY.register(Gauge(
+    "avito_proxy_latency_seconds",
+    "Сглаженная (EWMA) задержка запросов через прокси",
+    labels=("proxy",),
+))
+PROXY_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "avito_proxy_requests_total",
+    "Запросы и проверки через прокси по исходу",
+    labels=("proxy", "outcome"),
+))
+FAQ_ANSWERS_TOTAL = REGISTRY.register(Counter(
+    "avito_faq_answers_total",
+    "Проверки быстрого ответа из FAQ: hit — ответ без LLM, miss, missing_field — в объявлении нет поля шаблона",
+    labels=("outcome",),
+))
+OUTBOX_DEPTH = REGISTRY.register(Gauge(
+    "avito_outbox_depth",
+    "Сгенерированные ответы, ожидающие отправки",
+))
+OUTBOX_OLDEST_SECONDS = REGISTRY.register(Gauge(
+    "avito_outbox_oldest_seconds",
+    "Возраст самого старого неотправленного ответа",
+))
+OUTBOX_TOTAL = REGISTRY.register(Counter(
+    "avito_outbox_total",
+    "Ответы в outbox по исходу: queued, sent, retried, stale — покупатель написал снова, expired",
+    labels=("outcome",),
+))
+STORE_DROPPED_WRITES_TOTAL = REGISTRY.register(Counter(
+    "avito_store_dropped_writes_total",
+    "Записи в локальное хранилище, отброшенные из-за ошибки SQLite: statement — одна операция, batch — вся пачка",
+    labels=("scope",),
+))
+SYNC_PAGES_TOTAL = REGISTRY.register(Counter(
+    "avito_sync_pages_total",
+    "Страницы get_chats, прочитанные синхронизацией входящих: incremental, full",
+    labels=("mode",),
+))
+
+
+def observe_stage(stage: str) -> Callable:
+    """Декоратор: замеряет длительность асинхронного метода в гистограмме этапов."""
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                STAGE_DURATION.observe(time.perf_counter() - started, stage=stage, outcome=outcome)
+
+        return wrapper
+
+    return decorator
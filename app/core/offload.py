@@ -0,0 +1,139 @@
+import asyncio
+import concurrent.futures
+import importlib
+import logging
+import multiprocessing
+from typing import Literal
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pydantic_core import from_json
+
+logger = logging.getLogger(__name__)
+
+OffloadMode = Literal["off", "chunked", "interpreters", "processes"]
+
+
+class RawJSON(bytes):
+    """Тело ответа, которое валидируется вне event loop: `validate_response` отдает его в `Offloader`."""
+
+
+def _import(path: str) -> type[BaseModel]:
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def validate_json(paths: tuple[str, ...], raw: bytes) -> BaseModel:
+    """
+    Выполняется в воркере: разбор JSON и валидация в первую подходящую модель.
+    Ошибки pydantic не передаются между интерпретаторами, поэтому приводятся к ValueError.
+    """
+    last_error = None
+    for path in paths:
+        try:
+            return _import(path).model_validate_json(raw)
+        except ValidationError as e:
+            last_error = e
+    raise ValueError(f"Data validation failed for all types: {last_error}")
+
+
+def _warm(paths: tuple[str, ...]) -> int:
+    for path in paths:
+        _import(path)
+    return len(paths)
+
+
+class Offloader:
+    """
+    Валидация больших ответов Avito без долгой блокировки event loop. Ответы меньше `threshold` байт
+    валидируются на месте.
+
+    - `chunked` — в loop, но списки (`chats`, `messages`) валидируются кусками по `chunk` элементов
+      с передачей управления между кусками;
+    - `interpreters` — в `InterpreterPoolExecutor` (Python 3.14+); если модели не импортируются
+      в субинтерпретаторе (расширения без их поддержки), пул заменяется процессным;
+    - `processes` — в пуле процессов. Готовые модели возвращаются через pickle, и их распаковка
+      сопоставима с самой валидацией: выигрыш в задержке loop, а не в пропускной способности.
+    """
+
+    def __init__(self, mode: OffloadMode = "off", threshold: int = 256 * 1024, workers: int = 2,
+                 warm: tuple[str, ...] = (), chunk: int = 50):
+        self.mode = mode
+        self.threshold = threshold
+        self.workers = workers
+        self.warm = warm
+        self.chunk = chunk
+        self._executor: concurrent.futures.Executor | None = None
+        self._lock = asyncio.Lock()
+        self._adapters: dict[tuple[type, str], TypeAdapter] = {}
+
+    def should(self, size: int) -> bool:
+        return self.mode != "off" and size >= self.threshold
+
+    def _create(self) -> concurrent.futures.Executor:
+        if self.mode == "interpreters" and hasattr(concurrent.futures, "InterpreterPoolExecutor"):
+            return concurrent.futures.InterpreterPoolExecutor(self.workers)
+        if self.mode == "interpreters":
+            logger.warning("InterpreterPoolExecutor is unavailable, falling back to processes")
+            self.mode = "processes"
+        # spawn: fork процесса с потоками loop и логирования небезопасен
+        return concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def start(self):
+        """Поднимает воркеры и импортирует в них модели, чтобы первый большой ответ не ждал старта."""
+        if self.mode in ("off", "chunked"):
+            return
+        async with self._lock:
+            while self._executor is None:
+                self._executor = self._create()
+                loop = asyncio.get_running_loop()
+                try:
+                    await asyncio.gather(*(
+                        loop.run_in_executor(self._executor, _warm, self.warm) for _ in range(self.workers)
+                    ))
+                except Exception:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = None
+                    if self.mode != "interpreters":
+                        raise
+                    logger.warning("models are not importable in subinterpreters, falling back to processes",
+                                   exc_info=True)
+                    self.mode = "processes"
+
+    async def _validate_chunked(self, models: tuple[type[BaseModel], ...], raw: bytes) -> BaseModel:
+        data = from_json(raw)
+        await asyncio.sleep(0)
+        last_error = None
+        for model in models:
+            lists = {
+                name: field.alias or name for name, field in model.model_fields.items()
+                if isinstance(data, dict) and isinstance(data.get(field.alias or name), list)
+            }
+            try:
+                # сначала все, кроме длинных списков: заодно выбирается тип из Union
+                instance = model.model_validate({**data, **{key: [] for key in lists.values()}})
+                for name, key in lists.items():
+                    adapter = self._adapters.get((model, name))
+                    if adapter is None:
+                        adapter = self._adapters[(model, name)] = TypeAdapter(model.model_fields[name].annotation)
+                    items, validated = data[key], []
+                    for i in range(0, len(items), self.chunk):
+                        validated += adapter.validate_python(items[i:i + self.chunk])
+                        await asyncio.sleep(0)
+                    setattr(instance, name, validated)
+                return instance
+            except ValidationError as e:
+                last_error = e
+        raise ValueError(f"Data validation failed for all types: {last_error}")
+
+    async def validate(self, models: tuple[type[BaseModel], ...], raw: bytes) -> BaseModel:
+        if self.mode == "chunked":
+            return await self._validate_chunked(models, raw)
+        if self._executor is None:
+            await self.start()
+        paths = tuple(f"{model.__module__}:{model.__qualname__}" for model in models)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, validate_json, paths, bytes(raw))
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,209 @@
+import asyncio
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import wraps
+from typing import AsyncIterator, Callable
+
+
+class _CollectedStats:
+    """Уже собранная статистика в виде, который принимает `pstats.Stats` (он очищает `stats` источника)."""
+
+    def __init__(self, stats: dict):
+        self.stats = dict(stats)
+
+    def create_stats(self):
+        pass
+
+
+class TickProfile:
+    __slots__ = ("index", "started_at", "seconds", "stats")
+
+    def __init__(self, index: int, started_at: float, seconds: float, stats: dict):
+        self.index = index
+        self.started_at = started_at
+        self.seconds = seconds
+        self.stats = stats
+
+    def dump(self) -> bytes:
+        """Содержимое `.prof` в формате `pstats` (открывается snakeviz, `python -m pstats`)."""
+        return marshal.dumps(self.stats)
+
+    def summary(self, limit: int = 30, sort: str = "cumulative") -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(_CollectedStats(self.stats), stream=stream)
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def as_dict(self) -> dict:
+        return {"index": self.index, "started_at": self.started_at, "seconds": round(self.seconds, 4)}
+
+
+class LoopLagMonitor:
+    """
+    Ищет блокировки event loop. Корутина-пульс обновляет отметку времени каждые `interval` секунд,
+    а сторожевой поток, заметив, что отметка старше `threshold`, снимает стек потока loop —
+    это и есть код, который держит loop (синхронный print, большая валидация pydantic и т.п.).
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, events: int = 100):
+        self.interval = interval
+        self.threshold = threshold
+        self.events: deque[dict] = deque(maxlen=events)
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        self._task = None
+        self._stop.set()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.max_lag = max(self.max_lag, now - expected)
+            self._beat = now
+
+    def _watch(self):
+        reported = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._beat
+            lag = time.monotonic() - beat
+            if lag < self.threshold or beat == reported:
+                continue
+            # один отчет на одну блокировку: пока пульс не обновится, стек не снимаем повторно
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            self.events.append({
+                "at": time.time(),
+                "lag_ms": round(lag * 1000, 1),
+                "stack": traceback.format_stack(frame)[-15:] if frame else [],
+            })
+
+    def as_dict(self) -> dict:
+        return {
+            "running": self.running,
+            "threshold_ms": self.threshold * 1000,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "events": list(self.events),
+        }
+
+
+class Profiler:
+    """
+    Профилирование по запросу: cProfile следующих N тиков, дифф снимков tracemalloc между тиками
+    и монитор блокировок event loop. По умолчанию все выключено и тик не замедляет.
+    """
+
+    def __init__(self, keep: int = 10):
+        self.armed = 0
+        self.captured: deque[TickProfile] = deque(maxlen=keep)
+        self.loop = LoopLagMonitor()
+        self.memory_top = 30
+        self.memory_diff: list[str] = []
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._ticks = 0
+        self._active = False
+
+    def capture_ticks(self, count: int):
+        self.armed = count
+
+    def start_memory(self, frames: int = 10, top: int = 30):
+        self.memory_top = top
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._snapshot = None
+        self.memory_diff = []
+
+    def stop_memory(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._snapshot = None
+
+    def _memory_checkpoint(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        if self._snapshot is not None:
+            stats = snapshot.compare_to(self._snapshot, "lineno")[:self.memory_top]
+            self.memory_diff = [str(stat) for stat in stats]
+        self._snapshot = snapshot
+
+    @asynccontextmanager
+    async def tick(self) -> AsyncIterator[None]:
+        self._ticks += 1
+        profile = None
+        # cProfile один на процесс: параллельный тик не профилируем
+        if self.armed > 0 and not self._active:
+            self.armed -= 1
+            self._active = True
+            profile = cProfile.Profile()
+        started_at, started = time.time(), time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+                profile.create_stats()
+                self._active = False
+                self.captured.append(TickProfile(self._ticks, started_at, time.perf_counter() - started, profile.stats))
+            if tracemalloc.is_tracing():
+                self._memory_checkpoint()
+
+    def get(self, index: int) -> TickProfile | None:
+        return next((profile for profile in self.captured if profile.index == index), None)
+
+    def as_dict(self) -> dict:
+        return {
+            "armed_ticks": self.armed,
+            "captured": [profile.as_dict() for profile in self.captured],
+            "memory": {"tracing": tracemalloc.is_tracing(), "diff_lines": len(self.memory_diff)},
+            "loop": self.loop.as_dict(),
+        }
+
+
+PROFILER = Profiler()
+
+
+def profiled(func: Callable) -> Callable:
+    """Декоратор тика: при включенном профилировании снимает cProfile и tracemalloc."""
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        async with PROFILER.tick():
+            return await func(*args, **kwargs)
+
+    return wrapper
@@ -1,17 +1,28 @@
+from pathlib import Path
 from typing import Literal, AsyncGenerator
 
-from aiogram import Bot
-from aiogram.client.default import DefaultBotProperties
-from aiogram.client.session.aiohttp import AiohttpSession
 from dishka import provide, Provider, Scope
 from httpx import AsyncClient
-from openai import AsyncOpenAI
 
 from app.core.config import AppSettings, get_app_settings
+from app.core.metrics import metrics_muted
+from app.core.offload import Offloader
 from app.prompts.read import PromptEditor
-from app.services.avito import Avito, AvitoBL
-from app.services.limits import LimitsService, LimitsUOW
+from app.services.avito import Avito, AvitoBL, ShadowAvitoBL
+from app.services.debounce import Debouncer
+from app.services.eventlog import EventLog
+from app.services.faq import FAQIndex
+from app.services.governor import AIMDGovernor
+from app.services.limits import LimitsBackend, LimitsService, LimitsUOW, LocalLimits
+from app.services.metering import TokenMeter
 from app.services.notify import TGNotificator
+from app.services.outbox import Outbox
+from app.services.planner import TickPlanner
+from app.services.proxies import ProxyPool, ProxyPoolTransport
+from app.services.scheduling import DeadlineScheduler
+from app.services.shadow import ShadowLog
+from app.services.store import LocalStore
+from app.services.sync import InboxSync
 
 
 class Prompt(str):
@@ -30,64 +41,216 @@ class ConfigProvider(Provider):
 
 class ServiceProvider(Provider):
     @provide(scope=Scope.APP)
-    async def avito(self, settings: AppSettings) -> Avito:
+    async def avito(self, settings: AppSettings) -> AsyncGenerator[Avito, None]:
         client = Avito(
             settings.app.AVITO_CLIENT_ID.get_secret_value(),
             settings.app.AVITO_CLIENT_SECRET.get_secret_value()
         )
-        await client.get_user_data()
-        return client
+        client.offload = Offloader(
+            settings.app.OFFLOAD_MODE,
+            threshold=settings.app.OFFLOAD_THRESHOLD_BYTES,
+            workers=settings.app.OFFLOAD_WORKERS,
+            warm=("app.models.avito:ChatsResponse", "app.models.avito:MessagesResponse")
+        )
+        await client.offload.start()
+        await client.restore_user_data(Path(settings.app.STATE_DIR) / "user_data.json")
+        yield client
+        client.offload.close()
+
+    @provide(scope=Scope.APP)
+    async def proxy_pool(self, settings: AppSettings) -> AsyncGenerator[ProxyPool, None]:
+        """Общий пул прокси для OpenAI и Telegram."""
+        urls = settings.app.PROXY_URLS or [
+            f"http://{settings.app.SQUID_PROXY_USER.get_secret_value()}:{settings.app.SQUID_PROXY_PASSWORD.get_secret_value()}@{settings.app.SQUID_PROXY_HOST.get_secret_value()}:{settings.app.SQUID_PROXY_PORT.get_secret_value()}"
+        ]
+        pool = ProxyPool(
+            urls,
+            check_url=settings.app.PROXY_CHECK_URL,
+            check_interval=settings.app.PROXY_CHECK_INTERVAL,
+            eject_after=settings.app.PROXY_EJECT_AFTER,
+            eject_for=settings.app.PROXY_EJECT_FOR
+        )
+        pool.start()
+        yield pool
+        await pool.close()
 
     @provide(scope=Scope.APP)
-    async def httpx_client_proxied(self, settings: AppSettings) -> AsyncGenerator[AsyncClient, None]:
+    async def httpx_client_proxied(self, pool: ProxyPool) -> AsyncGenerator[AsyncClient, None]:
         """Создаем HTTP клиент с прокси для всей сессии."""
-        proxy = f"http://{settings.app.SQUID_PROXY_USER.get_secret_value()}:{settings.app.SQUID_PROXY_PASSWORD.get_secret_value()}@{settings.app.SQUID_PROXY_HOST.get_secret_value()}:{settings.app.SQUID_PROXY_PORT.get_secret_value()}"
-        async with AsyncClient(timeout=600, proxy=proxy) as client:
+        async with AsyncClient(timeout=600, transport=ProxyPoolTransport(pool)) as client:
             yield client
 
     @provide(scope=Scope.APP)
-    async def openai_client(self, settings: AppSettings, httpx_client: AsyncClient) -> AsyncOpenAI:
-        return AsyncOpenAI(api_key=settings.app.OPENAI_API_TOKEN.get_secret_value(), http_client=httpx_client)
+    async def local_store(self, settings: AppSettings) -> AsyncGenerator[LocalStore, None]:
+        store = LocalStore(
+            Path(settings.app.STATE_DIR) / "state.sqlite3",
+            flush_interval=settings.app.STORE_FLUSH_INTERVAL
+        )
+        await store.open()
+        yield store
+        await store.close()
+
+    @provide(scope=Scope.APP)
+    async def event_log(self, settings: AppSettings) -> AsyncGenerator[EventLog, None]:
+        log = EventLog(
+            Path(settings.app.STATE_DIR) / "events",
+            segment_bytes=settings.app.EVENT_LOG_SEGMENT_BYTES,
+            fsync_interval=settings.app.EVENT_LOG_FSYNC_INTERVAL
+        )
+        await log.open()
+        yield log
+        await log.close()
 
     @provide(scope=Scope.APP)
     async def prompt_editor(self) -> PromptEditor:
         return PromptEditor()
 
     @provide(scope=Scope.APP)
-    async def limits_service(self, settings: AppSettings) -> LimitsService:
-        return LimitsService(base_url=settings.app.LIMITS_SERVICE_URL)
+    async def limits_service(self, settings: AppSettings) -> AsyncGenerator[LimitsBackend, None]:
+        if settings.app.LIMITS_BACKEND == "http":
+            yield LimitsService(base_url=settings.app.LIMITS_SERVICE_URL)
+            return
+        limits = LocalLimits(
+            Path(settings.app.STATE_DIR) / "limits.sqlite3",
+            limit=settings.app.LIMITS_LOCAL_LIMIT,
+            reset=settings.app.LIMITS_LOCAL_RESET
+        )
+        await limits.open()
+        yield limits
+        await limits.close()
 
     @provide(scope=Scope.APP)
-    async def uow(self, settings: AppSettings, svc: LimitsService) -> LimitsUOW:
+    async def uow(self, settings: AppSettings, svc: LimitsBackend) -> LimitsUOW:
         return LimitsUOW(settings.app.BOT_UUID.get_secret_value(), svc)
 
     @provide(scope=Scope.APP)
-    async def bot(self, settings: AppSettings) -> Bot:
-        proxy = f"http://{settings.app.SQUID_PROXY_USER.get_secret_value()}:{settings.app.SQUID_PROXY_PASSWORD.get_secret_value()}@{settings.app.SQUID_PROXY_HOST.get_secret_value()}:{settings.app.SQUID_PROXY_PORT.get_secret_value()}"
-        session = AiohttpSession(proxy=proxy)
-        return Bot(
+    async def tg_notificator(self, settings: AppSettings, pool: ProxyPool) -> TGNotificator:
+        # aiogram и openai импортируются здесь, а не на уровне модуля: так API стартует без них
+        from aiogram import Bot
+        from aiogram.client.default import DefaultBotProperties
+        from app.services.telegram_session import PooledAiohttpSession
+
+        session = PooledAiohttpSession(pool)
+        bot = Bot(
             token=settings.app.TG_BOT_TOKEN.get_secret_value(),
             default=DefaultBotProperties(link_preview_is_disabled=True, parse_mode='HTML'),
             session=session
         )
-    @provide(scope=Scope.APP)
-    async def tg_notificator(self, bot: Bot) -> TGNotificator:
         return TGNotificator(bot)
 
     @provide(scope=Scope.APP)
     async def avito_bl(
             self,
+            settings: AppSettings,
             avito: Avito,
-            openai_client: AsyncOpenAI,
+            httpx_client: AsyncClient,
             editor: PromptEditor,
             limits_service: LimitsUOW,
-            notifier: TGNotificator
+            notifier: TGNotificator,
+            store: LocalStore
     ) -> AvitoBL:
-        print("new avito")
-        return AvitoBL(
+        from openai import AsyncOpenAI
+
+        openai_client = AsyncOpenAI(api_key=settings.app.OPENAI_API_TOKEN.get_secret_value(), http_client=httpx_client)
+        avito_bl = AvitoBL(
             avito=avito,
             openai=openai_client,
             editor=editor,
             limits_service=limits_service,
-            tg_notificator=notifier
+            tg_notificator=notifier,
+            store=store,
+            history_cache_size=settings.app.HISTORY_CACHE_SIZE,
+            history_tail=settings.app.HISTORY_TAIL,
+            sync=InboxSync(
+                avito,
+                store,
+                page_size=settings.app.SYNC_PAGE_SIZE,
+                max_pages=settings.app.SYNC_MAX_PAGES,
+                full_sweep_interval=settings.app.SYNC_FULL_SWEEP_INTERVAL
+            ),
+            governor=AIMDGovernor(
+                initial=settings.app.OPENAI_CONCURRENCY_INITIAL,
+                max_limit=settings.app.OPENAI_CONCURRENCY_MAX,
+                latency_target=settings.app.OPENAI_LATENCY_TARGET
+            ),
+            meter=TokenMeter(
+                limits_service.uuid,
+                store,
+                model=settings.app.OPENAI_MODEL,
+                reduced_model=settings.app.OPENAI_REDUCED_MODEL,
+                daily_budget=settings.app.TOKEN_DAILY_BUDGET,
+                chat_daily_budget=settings.app.TOKEN_CHAT_DAILY_BUDGET,
+                reduce_at=settings.app.TOKEN_BUDGET_REDUCE_AT,
+                reduced_context_messages=settings.app.TOKEN_REDUCED_CONTEXT
+            ),
+            debouncer=Debouncer(window=settings.app.DEBOUNCE_WINDOW, max_wait=settings.app.DEBOUNCE_MAX_WAIT),
+            scheduler=DeadlineScheduler(
+                sla=settings.app.REPLY_SLA,
+                stale_after=settings.app.REPLY_STALE_AFTER,
+                capacity=settings.app.TICK_CAPACITY
+            ),
+            planner=TickPlanner(lookahead=settings.app.PLANNER_LOOKAHEAD),
+            faq=FAQIndex(
+                editor.base_path / settings.app.FAQ_FILE,
+                threshold=settings.app.FAQ_THRESHOLD
+            ) if settings.app.FAQ_FILE else None,
+            outbox=Outbox(
+                store,
+                max_attempts=settings.app.OUTBOX_MAX_ATTEMPTS,
+                backoff=settings.app.OUTBOX_RETRY_BACKOFF,
+                max_age=settings.app.OUTBOX_MAX_AGE
+            )
         )
+        await avito_bl.restore_state()
+        return avito_bl
+
+    @provide(scope=Scope.APP)
+    async def shadow_avito_bl(
+            self,
+            settings: AppSettings,
+            avito: Avito,
+            httpx_client: AsyncClient,
+            editor: PromptEditor,
+            limits_service: LimitsUOW,
+            notifier: TGNotificator
+    ) -> ShadowAvitoBL:
+        from openai import AsyncOpenAI
+
+        openai_client = AsyncOpenAI(api_key=settings.app.OPENAI_API_TOKEN.get_secret_value(), http_client=httpx_client)
+        # Без общего хранилища: теневой режим не должен влиять на водяные знаки, ответы и расход основного,
+        # без метрик — на его дашборды (AIMDGovernor выставляет лимит уже при создании)
+        with metrics_muted():
+            return ShadowAvitoBL(
+                avito=avito,
+                openai=openai_client,
+                editor=editor,
+                limits_service=limits_service,
+                tg_notificator=notifier,
+                history_cache_size=settings.app.HISTORY_CACHE_SIZE,
+                history_tail=settings.app.HISTORY_TAIL,
+                sync=InboxSync(
+                    avito,
+                    page_size=settings.app.SYNC_PAGE_SIZE,
+                    max_pages=settings.app.SYNC_MAX_PAGES,
+                    full_sweep_interval=settings.app.SYNC_FULL_SWEEP_INTERVAL
+                ),
+                governor=AIMDGovernor(
+                    initial=settings.app.OPENAI_CONCURRENCY_INITIAL,
+                    max_limit=settings.app.OPENAI_CONCURRENCY_MAX,
+                    latency_target=settings.app.OPENAI_LATENCY_TARGET
+                ),
+                meter=TokenMeter(limits_service.uuid, model=settings.app.SHADOW_MODEL or settings.app.OPENAI_MODEL),
+                debouncer=Debouncer(window=settings.app.DEBOUNCE_WINDOW, max_wait=settings.app.DEBOUNCE_MAX_WAIT),
+                scheduler=DeadlineScheduler(
+                    sla=settings.app.REPLY_SLA,
+                    stale_after=settings.app.REPLY_STALE_AFTER,
+                    capacity=settings.app.TICK_CAPACITY
+                ),
+                shadow=ShadowLog(Path(settings.app.STATE_DIR) / "shadow.jsonl"),
+                prompt_file=settings.app.SHADOW_PROMPT_FILE,
+                planner=TickPlanner(lookahead=settings.app.PLANNER_LOOKAHEAD),
+                faq=FAQIndex(
+                    editor.base_path / settings.app.FAQ_FILE,
+                    threshold=settings.app.FAQ_THRESHOLD
+                ) if settings.app.FAQ_FILE else None
+            )
@@ -1,4 +1,6 @@
-from pydantic import Field, Secret, SecretStr
+from typing import Literal, Self
+
+from pydantic import Field, Secret, SecretStr, model_validator
 from pydantic_settings import SettingsConfigDict
 
 from app.core.settings.app import AppBase
@@ -19,4 +21,82 @@ class ProdAppSettings(AppBase):
     BOT_UUID: Secret[str] = Field()
     TG_BOT_TOKEN: Secret[str] = Field()
 
-    LIMITS_SERVICE_URL: str = Field(description="URL sub-service для управления лимитами")
+    LIMITS_SERVICE_URL: str | None = Field(
+        default=None, description="URL sub-service для управления лимитами (LIMITS_BACKEND=http)"
+    )
+
+    STATE_DIR: str = Field(default="data", description="Каталог локального состояния (кеши, журналы)")
+    STORE_FLUSH_INTERVAL: float = Field(default=0.5, description="Как часто сбрасывать пачку записей в SQLite, сек")
+    HISTORY_CACHE_SIZE: int = Field(default=2000, description="Сколько историй чатов держать в памяти")
+    HISTORY_TAIL: int = Field(default=100, description="Сколько последних сообщений чата загружать для ответа")
+    SYNC_PAGE_SIZE: int = Field(default=100, description="Размер страницы get_chats при синхронизации входящих")
+    SYNC_MAX_PAGES: int = Field(default=20, description="Максимум страниц get_chats за одну синхронизацию")
+    SYNC_FULL_SWEEP_INTERVAL: float = Field(default=600.0, description="Как часто делать полную сверку входящих, сек")
+    OPENAI_CONCURRENCY_INITIAL: int = Field(default=4, description="Начальный лимит параллельных запросов к OpenAI")
+    OPENAI_CONCURRENCY_MAX: int = Field(default=32, description="Верхняя граница лимита параллельных запросов к OpenAI")
+    OPENAI_LATENCY_TARGET: float = Field(default=15.0, description="Задержка OpenAI, выше которой лимит снижается, сек")
+    OPENAI_MODEL: str = Field(default="gpt-4o-mini", description="Модель для ответов")
+    OPENAI_REDUCED_MODEL: str = Field(default="gpt-4o-mini", description="Дешевая модель при подходе к бюджету")
+    TOKEN_DAILY_BUDGET: int | None = Field(default=None, description="Дневной бюджет токенов бота, None — без ограничения")
+    TOKEN_CHAT_DAILY_BUDGET: int | None = Field(default=None, description="Дневной бюджет токенов на один чат")
+    TOKEN_BUDGET_REDUCE_AT: float = Field(default=0.8, description="Доля бюджета, после которой ответы урезаются")
+    TOKEN_REDUCED_CONTEXT: int = Field(default=10, description="Сколько последних сообщений отправлять в урезанном режиме")
+    DEBOUNCE_WINDOW: float = Field(default=10.0, description="Тишина после последнего сообщения покупателя до ответа, сек")
+    DEBOUNCE_MAX_WAIT: float = Field(default=60.0, description="Максимальная задержка ответа на серию сообщений, сек")
+    REPLY_SLA: float = Field(default=300.0, description="Целевое время ответа на сообщение покупателя, сек")
+    REPLY_STALE_AFTER: float = Field(default=86_400.0, description="При перегрузке сбрасывать чаты, ждущие дольше, сек")
+    TICK_CAPACITY: int | None = Field(default=200, description="Сколько чатов обрабатывать за тик, None — все")
+    SHADOW_MODE: Literal["off", "alongside", "only"] = Field(
+        default="off",
+        description="Теневой режим: off, alongside — рядом с основным, only — вместо основного (dry run)"
+    )
+    SHADOW_PROMPT_FILE: str = Field(default="text.md", description="Файл промпта для теневого режима")
+    SHADOW_MODEL: str | None = Field(default=None, description="Модель для теневого режима, None — OPENAI_MODEL")
+    PLANNER_LOOKAHEAD: int = Field(default=5, description="Сколько первичных чатов обогащать сверх остатка квоты")
+    EVENT_LOG_SEGMENT_BYTES: int = Field(default=4 * 1024 * 1024, description="Размер сегмента журнала вебхуков")
+    EVENT_LOG_FSYNC_INTERVAL: float = Field(default=0.005, description="Окно группировки fsync журнала вебхуков, сек")
+    LOG_LEVELS: dict[str, str] = Field(
+        default={"httpx": "WARNING", "apscheduler": "WARNING"},
+        description="Уровни логирования по модулям"
+    )
+    LOG_SAMPLING: dict[str, float] = Field(
+        default={"chat.seen": 0.1},
+        description="Доля записей частых событий (поле `event`), попадающих в лог"
+    )
+    PROXY_URLS: list[str] = Field(
+        default=[],
+        description="Пул исходящих прокси для OpenAI и Telegram; пустой — один Squid из SQUID_PROXY_*"
+    )
+    PROXY_CHECK_URL: str = Field(default="https://api.openai.com/v1/models", description="Адрес активной проверки прокси")
+    PROXY_CHECK_INTERVAL: float = Field(default=15.0, description="Период активной проверки прокси, сек")
+    PROXY_EJECT_AFTER: int = Field(default=3, description="Ошибок подряд до исключения прокси из пула")
+    PROXY_EJECT_FOR: float = Field(default=30.0, description="Пауза перед повторной проверкой исключенного прокси, сек")
+    FAQ_FILE: str = Field(default="faq.md", description="Файл FAQ рядом с промптами; пустая строка отключает быстрый ответ")
+    FAQ_THRESHOLD: float = Field(default=0.75, description="Минимальная уверенность совпадения с вопросом из FAQ")
+    OFFLOAD_MODE: Literal["off", "chunked", "interpreters", "processes"] = Field(
+        default="off",
+        description="Валидация больших ответов Avito: кусками в loop, в субинтерпретаторах (3.14+) или процессах"
+    )
+    OFFLOAD_THRESHOLD_BYTES: int = Field(default=256 * 1024, description="Ответы меньше этого размера валидируются на месте")
+    OFFLOAD_WORKERS: int = Field(default=2, description="Воркеров в пуле валидации")
+    OUTBOX_MAX_ATTEMPTS: int = Field(default=5, description="Попыток отправки сгенерированного ответа")
+    OUTBOX_RETRY_BACKOFF: float = Field(default=30.0, description="Пауза перед повторной отправкой, удваивается, сек")
+    OUTBOX_MAX_AGE: float = Field(default=3600.0, description="Неотправленный ответ старше этого выбрасывается, сек")
+    LIMITS_BACKEND: Literal["http", "local"] = Field(
+        default="http",
+        description="Счетчики лимитов: http — sub-service по LIMITS_SERVICE_URL, local — SQLite в STATE_DIR"
+    )
+    LIMITS_LOCAL_LIMIT: int = Field(default=100, description="Лимит первых ответов бота за период (LIMITS_BACKEND=local)")
+    LIMITS_LOCAL_RESET: Literal["day", "month", "never"] = Field(
+        default="month", description="Период сброса счетчика (LIMITS_BACKEND=local), по UTC"
+    )
+    WARMUP_TIMEOUT: float = Field(default=10.0, description="Таймаут прогрева соединения с каждым сервисом, сек")
+
+    TRACE_BUFFER_SIZE: int = Field(default=200, description="Сколько последних трейсов тиков хранить в памяти")
+    TRACE_EXPORT_PATH: str | None = Field(default=None, description="Файл для выгрузки трейсов в OTLP/JSON")
+
+    @model_validator(mode="after")
+    def _limits_backend(self) -> Self:
+        if self.LIMITS_BACKEND == "http" and not self.LIMITS_SERVICE_URL:
+            raise ValueError("LIMITS_SERVICE_URL is required when LIMITS_BACKEND=http")
+        return self
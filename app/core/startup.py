@@ -0,0 +1,62 @@
+import asyncio
+import importlib
+import sys
+import time
+import traceback
+from typing import Awaitable, Callable, Iterable
+
+# Тяжелые зависимости, которые не импортируются при старте API, а подгружаются в фоне
+HEAVY_MODULES = ("aiogram", "openai", "taskiq", "apscheduler.schedulers.asyncio")
+
+
+class StartupReport:
+    """Время импорта тяжелых модулей, этапов старта и прогрева соединений."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.imports: dict[str, float] = {}
+        self.warmup: dict[str, dict] = {}
+
+    def phase(self, name: str):
+        """Отмечает, сколько секунд прошло от импорта приложения до этапа `name`."""
+        self.phases[name] = round(time.perf_counter() - self.started_at, 4)
+
+    def preload(self, modules: Iterable[str] = HEAVY_MODULES):
+        """Импортирует модули с замером времени. Блокирующая, вызывать через `asyncio.to_thread`."""
+        for name in modules:
+            if name in sys.modules:
+                self.imports.setdefault(name, 0.0)
+                continue
+            started = time.perf_counter()
+            importlib.import_module(name)
+            self.imports[name] = round(time.perf_counter() - started, 4)
+
+    async def warm_up(self, targets: dict[str, Callable[[], Awaitable]], timeout: float = 10.0) -> dict[str, dict]:
+        """Параллельно выполняет легкие запросы, чтобы заранее открыть TLS/HTTP2 соединения."""
+
+        async def run(name: str, target: Callable[[], Awaitable]):
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(target(), timeout)
+                self.warmup[name] = {"ok": True, "seconds": round(time.perf_counter() - started, 4)}
+            except Exception as e:
+                self.warmup[name] = {
+                    "ok": False,
+                    "seconds": round(time.perf_counter() - started, 4),
+                    "error": traceback.format_exception_only(e)[-1].strip(),
+                }
+
+        await asyncio.gather(*(run(name, target) for name, target in targets.items()))
+        return self.warmup
+
+    def as_dict(self) -> dict:
+        return {
+            "phases": self.phases,
+            "imports": self.imports,
+            "import_total_seconds": round(sum(self.imports.values()), 4),
+            "warmup": self.warmup,
+        }
+
+
+STARTUP = StartupReport()
@@ -0,0 +1,220 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: str | None, attributes: dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes = attributes
+        self.status = "unset"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1_000_000
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.start_ns - self.trace.root.start_ns) / 1_000_000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    __slots__ = ("trace_id", "root", "spans")
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.root: Span | None = None
+        self.spans: list[Span] = []
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.root.start_ns / 1_000_000_000,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.root.status,
+            "attributes": self.root.attributes,
+            "spans": [span.as_dict() for span in self.spans],
+        }
+
+
+class OTLPFileExporter:
+    """Дописывает завершенные трейсы в файл: одна строка — один OTLP/JSON `ExportTraceServiceRequest`."""
+
+    def __init__(self, path: str | Path, service_name: str = "avito"):
+        self.path = Path(path)
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> dict:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def encode(self, trace: Trace) -> dict:
+        status_codes = {"unset": 0, "ok": 1, "error": 2}
+        spans = [
+            {
+                "traceId": trace.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [self._attribute(k, v) for k, v in span.attributes.items()],
+                "status": {"code": status_codes[span.status]},
+            }
+            for span in trace.spans
+        ]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+            }]
+        }
+
+    def write(self, line: str):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def export(self, trace: Trace):
+        line = json.dumps(self.encode(trace), ensure_ascii=False)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.write(line)
+            return
+        # запись в файл не должна блокировать event loop
+        loop.run_in_executor(None, self.write, line)
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Легковесный трейсер внутри процесса.
+    Завершенные трейсы хранятся в кольцевом буфере, самые медленные — в отдельной куче.
+    """
+
+    def __init__(self, buffer_size: int = 200, slowest_size: int = 20, exporter: OTLPFileExporter | None = None):
+        self.exporter = exporter
+        self.slowest_size = slowest_size
+        self._buffer: deque[Trace] = deque(maxlen=buffer_size)
+        self._slowest: list[tuple[float, int, Trace]] = []
+        self._seq = itertools.count()
+
+    def configure(self, buffer_size: int | None = None, exporter: OTLPFileExporter | None = None):
+        if buffer_size is not None and buffer_size != self._buffer.maxlen:
+            self._buffer = deque(self._buffer, maxlen=buffer_size)
+        self.exporter = exporter
+
+    @staticmethod
+    def current_span() -> Span | None:
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        trace = parent.trace if parent else Trace()
+        span = Span(trace, name, parent.span_id if parent else None, attributes)
+        if parent is None:
+            trace.root = span
+        trace.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+            if span.status == "unset":
+                span.status = "ok"
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error.type"] = type(e).__name__
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if parent is None:
+                self._finish(trace)
+
+    def _finish(self, trace: Trace):
+        self._buffer.append(trace)
+        item = (trace.duration_ms, next(self._seq), trace)
+        if len(self._slowest) < self.slowest_size:
+            heapq.heappush(self._slowest, item)
+        elif item[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+        if self.exporter:
+            self.exporter.export(trace)
+
+    def last(self, n: int = 20) -> list[Trace]:
+        return list(self._buffer)[-n:][::-1]
+
+    def slowest(self, n: int = 20) -> list[Trace]:
+        return [trace for _, _, trace in heapq.nlargest(n, self._slowest)]
+
+
+TRACER = Tracer()
+
+
+def traced(name: str, *attributes: str) -> Callable:
+    """
+    Декоратор: оборачивает асинхронный метод в span текущего трейса.
+    Аргументы вызова, перечисленные в `attributes`, попадают в атрибуты span.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func) if attributes else None
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            span_attributes = {}
+            if signature:
+                bound = signature.bind_partial(*args, **kwargs).arguments
+                span_attributes = {key: bound[key] for key in attributes if bound.get(key) is not None}
+            with TRACER.span(name, **span_attributes):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
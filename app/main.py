@@ -1,56 +1,112 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
+from pathlib import Path
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
-from taskiq import AsyncBroker
 
+from app.core.logs import setup_logging, stop_logging
+from app.core.startup import STARTUP
 from app.core.config import get_app_settings
 from app.core.providers import ConfigProvider, ServiceProvider
-from app.tasks.base import avito_bl_exec, broker
+from app.core.tracing import OTLPFileExporter, TRACER
 
-scheduler = AsyncIOScheduler()
+logger = logging.getLogger(__name__)
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+async def start_background(app: FastAPI):
+    """
+    Тяжелая часть старта: импорт aiogram/openai/taskiq/apscheduler, прогрев соединений и запуск планировщика.
+    Выполняется после того, как API начал отвечать, поэтому `/health` доступен сразу.
+    """
+    settings = get_app_settings()
+    await asyncio.to_thread(STARTUP.preload)
+    STARTUP.phase("imports_loaded")
+
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from app.services.avito import AvitoBL
+    from app.services.eventlog import EventLog
+    from app.tasks.base import avito_bl_exec, broker, shadow_avito_bl_exec
+
+    setup_dependencies_taskiq(app.state.dishka_container, broker)
     if not broker.is_worker_process:
         await broker.startup()
+    app.state.broker = broker
+
+    try:
+        avito_bl = await app.state.dishka_container.get(AvitoBL)
+        STARTUP.phase("services_ready")
+        # события вебхука, записанные до рестарта, дочитываются из журнала
+        event_log = await app.state.dishka_container.get(EventLog)
+        app.state.event_consumer = asyncio.create_task(event_log.consume(avito_bl.ingest_event))
+        await STARTUP.warm_up(avito_bl.warmup_targets(), timeout=settings.app.WARMUP_TIMEOUT)
+        STARTUP.phase("warmed_up")
+    except Exception:
+        # Без прогрева сервисы соберутся на первом тике, планировщик запускаем в любом случае
+        logger.exception("warm-up failed")
+
+    ticks = []
+    if settings.app.SHADOW_MODE != "only":
+        ticks.append(avito_bl_exec)
+    if settings.app.SHADOW_MODE != "off":
+        ticks.append(shadow_avito_bl_exec)
+    scheduler = AsyncIOScheduler()
+    scheduler.start()
+    for tick in ticks:
+        scheduler.add_job(tick.kiq, 'interval', seconds=25)
+    app.state.scheduler = scheduler
+    for tick in ticks:
+        await tick.kiq()
+    STARTUP.phase("first_tick_scheduled")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     # settings = get_app_settings()
     # setup_dependencies_aiogram()
     # dp.include_router(router)
     # bot = Bot(token=settings.app.TG_BOT_TOKEN.get_secret_value())
     # asyncio.create_task(dp.start_polling(bot))
-    scheduler.start()
-    scheduler.add_job(avito_bl_exec.kiq, 'interval', seconds=25)
-    await avito_bl_exec.kiq()
+    app.state.scheduler = None
+    app.state.broker = None
+    app.state.event_consumer = None
+    startup = asyncio.create_task(start_background(app))
+    startup.add_done_callback(
+        lambda task: task.cancelled() or task.exception() is None or logger.error(
+            "background startup failed", exc_info=task.exception()
+        )
+    )
+    STARTUP.phase("serving")
     yield
-    if not broker.is_worker_process:
-        await broker.shutdown()
-
-    scheduler.shutdown()
+    if not startup.done():
+        startup.cancel()
+    if app.state.event_consumer:
+        app.state.event_consumer.cancel()
+    if app.state.scheduler:
+        app.state.scheduler.shutdown()
+    if app.state.broker and not app.state.broker.is_worker_process:
+        await app.state.broker.shutdown()
+    stop_logging()
 
 
 def setup_dependencies(app: FastAPI):
     from dishka import make_async_container
     from dishka.integrations.fastapi import setup_dishka, FastapiProvider
+    from dishka.integrations.taskiq import TaskiqProvider
+    # один контейнер на API и задачи: прогретые клиенты используются и в тике
     container = make_async_container(
         ConfigProvider("prod"),
         ServiceProvider(),
-        FastapiProvider()
+        FastapiProvider(),
+        TaskiqProvider(),
     )
     setup_dishka(container, app)
     return container
 
 
-def setup_dependencies_taskiq(_broker: AsyncBroker):
-    from dishka import make_async_container
-    from dishka.integrations.taskiq import setup_dishka, TaskiqProvider
-    container = make_async_container(
-        ConfigProvider("prod"),
-        ServiceProvider(),
-        TaskiqProvider()
-    )
+def setup_dependencies_taskiq(container, _broker):
+    from dishka.integrations.taskiq import setup_dishka
     setup_dishka(container, broker=_broker)
     return container
 
@@ -59,8 +115,16 @@ def get_application() -> FastAPI:
     settings = get_app_settings()
 
     application = FastAPI(**settings.app.fastapi_kwargs, lifespan=lifespan)
+    setup_logging(
+        level=settings.app.logging_level,
+        levels=settings.app.LOG_LEVELS,
+        sampling=settings.app.LOG_SAMPLING,
+    )
+    TRACER.configure(
+        buffer_size=settings.app.TRACE_BUFFER_SIZE,
+        exporter=OTLPFileExporter(settings.app.TRACE_EXPORT_PATH) if settings.app.TRACE_EXPORT_PATH else None
+    )
     setup_dependencies(application)
-    setup_dependencies_taskiq(broker)
 
     application.add_middleware(
         CORSMiddleware,
@@ -73,10 +137,21 @@ def get_application() -> FastAPI:
     application.include_router(router, prefix=settings.app.api_prefix)
     from app.api.routes.prompt import router
     application.include_router(router, prefix=settings.app.api_prefix)
+    from app.api.routes.metrics import router
+    application.include_router(router, prefix=settings.app.api_prefix)
+    from app.api.routes.debug import router
+    application.include_router(router, prefix=settings.app.api_prefix)
+    from app.api.routes.profiling import router
+    application.include_router(router, prefix=settings.app.api_prefix)
+    from app.api.routes.webhook import router
+    application.include_router(router, prefix=settings.app.api_prefix)
+    from app.api.routes.tick import router
+    application.include_router(router, prefix=settings.app.api_prefix)
     return application
 
 
 app = get_application()
+STARTUP.phase("app_created")
 
 if __name__ == '__main__':
     import uvicorn
@@ -203,6 +203,18 @@ class Chat(BaseModel):
             if msg.author_id != 0:
                 conversation_history.append(msg.as_conversation)
         conversation_history.reverse()
+        conversation_history.insert(
+            0,
+            {
+                "role": "system",
+                "content": self.conversation_header
+            }
+        )
+        return conversation_history
+
+    @property
+    def conversation_header(self) -> str:
+        """Системный блок диалога: объявление и никнейм покупателя."""
         content = ""
         if self.context:
             if self.context.value.title:
@@ -223,14 +235,7 @@ class Chat(BaseModel):
             #     }
             # )
             content += f" Никнейм пользователя: {self.user.name}"
-        conversation_history.insert(
-            0,
-            {
-                "role": "system",
-                "content": content
-            }
-        )
-        return conversation_history
+        return content
 
     @property
     def messages_sent(self) -> list[Message]:
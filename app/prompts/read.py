@@ -1,7 +1,10 @@
+import logging
 from pathlib import Path
 
 import aiofiles
 
+logger = logging.getLogger(__name__)
+
 
 class PromptEditor:
     def __init__(self, base_path: str = None):
@@ -13,7 +16,7 @@ class PromptEditor:
 
         if not self.base_path.exists():
             raise FileNotFoundError(f"Directory not found: {self.base_path}")
-        print(f"PromptReader initialized with base path: {self.base_path}")
+        logger.info("prompt editor initialized", extra={"base_path": str(self.base_path)})
 
     def get_file(self, filename: str = "text.md", subdir: str = "") -> Path:
         if subdir:
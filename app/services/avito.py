@@ -1,20 +1,48 @@
 import asyncio
-import traceback
+import logging
+import time
 from datetime import datetime, timedelta
 from functools import wraps
-from typing import Any, Callable, get_type_hints, get_args, Union, get_origin
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, get_type_hints, get_args, Union, get_origin, TYPE_CHECKING
 
+import aiofiles
+from cachetools import LRUCache
 from httpx import AsyncClient
-from openai import AsyncOpenAI
 from pydantic import BaseModel, ValidationError
 
+from app.core.logs import log_context
+from app.core.offload import Offloader, RawJSON
+from app.core.metrics import BACKLOG_SIZE, CHATS_TOTAL, metrics_muted, observe_stage
+from app.core.profiling import profiled
+from app.core.tracing import TRACER, traced
 from app.models.avito import ChatsPayloadFilter, ChatsResponse, ChatTypeEnum, Message, MessagesResponse, SendMessage, \
     SendMessagePayload, \
     SimpleActionResponse, \
     SubscribtionsResponse, UserData, Chat, FailedResponse
 from app.prompts.read import PromptEditor
+from app.services.conversation import ConversationCache
+from app.services.debounce import Debouncer
+from app.services.faq import FAQIndex
+from app.services.governor import AIMDGovernor
 from app.services.limits import LimitsUOW
+from app.services.metering import BudgetDecision, BudgetMode, TokenMeter
 from app.services.notify import TGNotificator
+from app.services.outbox import Outbox
+from app.services.planner import AssistState, TickPlanner
+from app.services.progress import TickProgress
+from app.services.scheduling import DeadlineScheduler
+from app.services.shadow import ShadowLog
+from app.services.store import LocalStore
+from app.services.sync import InboxSync
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Максимальный limit, который принимает /messenger/v3/.../messages/
+MESSAGES_PAGE_LIMIT = 100
 
 
 def with_token_refresh(func: Callable) -> Callable:
@@ -38,6 +66,9 @@ def validate_response(func):
         if return_type is None:
             return data
         origin = get_origin(return_type)
+        if isinstance(data, RawJSON):
+            types = get_args(return_type) if origin is Union else (return_type,)
+            return await self.offload.validate(tuple(t for t in types if issubclass(t, BaseModel)), data)
         if origin is Union:
             types_to_try = get_args(return_type)
             for t in types_to_try:
@@ -74,7 +105,15 @@ class AvitoBase:
         self._token_expires_at = None
         self.user_data: dict | None = None
         self.httpx_client = AsyncClient(base_url="https://api.avito.ru", http2=True)
+        # большие списки чатов и истории валидируются вне event loop
+        self.offload: Offloader | None = None
+
+    def _json(self, resp) -> Any:
+        if self.offload and self.offload.should(len(resp.content)):
+            return RawJSON(resp.content)
+        return resp.json()
 
+    @traced("avito.update_auth")
     async def update_auth(self):
         resp = await self.httpx_client.post(
             "/token/",
@@ -100,6 +139,7 @@ class AvitoBase:
         if not self._token or datetime.now() >= self._token_expires_at:
             await self.update_auth()
 
+    @traced("avito.get_user_data")
     @with_token_refresh
     async def get_user_data(self) -> dict | None:
         resp = await self.httpx_client.get("/core/v1/accounts/self")
@@ -107,16 +147,21 @@ class AvitoBase:
         self.user_data = resp.json()
         return self.user_data
 
+    @traced("avito.get_chats")
+    @observe_stage("get_chats")
     @with_token_refresh
     async def get_chats(self, user_id: int, filt: dict | None = None) -> dict:
         resp = await self.httpx_client.get(f"/messenger/v2/accounts/{user_id}/chats", params=filt)
         resp.raise_for_status()
-        return resp.json()
+        return self._json(resp)
 
+    @traced("avito.get_chat_messages", "chat_id")
+    @observe_stage("get_chat_messages")
     @with_token_refresh
-    async def get_chat_messages(self, user_id: int, chat_id: int):
-        resp = await self.httpx_client.get(f"/messenger/v3/accounts/{user_id}/chats/{chat_id}/messages/")
-        return resp.json()
+    async def get_chat_messages(self, user_id: int, chat_id: int, limit: int | None = None, offset: int | None = None):
+        params = {key: value for key, value in (("limit", limit), ("offset", offset)) if value is not None}
+        resp = await self.httpx_client.get(f"/messenger/v3/accounts/{user_id}/chats/{chat_id}/messages/", params=params)
+        return self._json(resp)
 
     @with_token_refresh
     async def subscriptions(self):
@@ -133,6 +178,8 @@ class AvitoBase:
         resp = await self.httpx_client.post(f"/messenger/v1/webhook/unsubscribe", json={"url": url})
         return resp.json()
 
+    @traced("avito.send_message", "chat_id")
+    @observe_stage("send_message")
     @with_token_refresh
     async def send_message(self, user_id: int, chat_id: str, payload: dict):
         resp = await self.httpx_client.post(
@@ -159,9 +206,15 @@ class AvitoModels(AvitoBase):
         return await super().get_chats(user_id=user_id, filt=filt.model_dump() if filt else filt)
 
     @validate_response
-    async def get_chat_messages(self, chat_id: str, user_id: int | None = None) -> MessagesResponse | FailedResponse:
+    async def get_chat_messages(
+            self,
+            chat_id: str,
+            user_id: int | None = None,
+            limit: int | None = None,
+            offset: int | None = None
+    ) -> MessagesResponse | FailedResponse:
         user_id = user_id or (self.user_data.id if self.user_data else None)
-        return await super().get_chat_messages(chat_id=chat_id, user_id=user_id)
+        return await super().get_chat_messages(chat_id=chat_id, user_id=user_id, limit=limit, offset=offset)
 
     @validate_response
     async def subscribe_messages_webhook(self, url: str) -> SimpleActionResponse:
@@ -184,6 +237,77 @@ class Avito(AvitoModels):
     def __init__(self, client_id: str, client_secret: str):
         super().__init__(client_id, client_secret)
         self.user_data: UserData | None = None
+        self._background: set[asyncio.Task] = set()
+
+    async def restore_user_data(self, cache_path: Path) -> UserData:
+        """
+        Данные аккаунта из кеша на диске, чтобы не ждать получения токена при старте.
+        Кеш перепроверяется в фоне; если его нет — данные запрашиваются сразу.
+        """
+        try:
+            async with aiofiles.open(cache_path, 'r', encoding='utf-8') as f:
+                self.user_data = UserData.model_validate_json(await f.read())
+        except (OSError, ValidationError):
+            return await self.revalidate_user_data(cache_path)
+
+        task = asyncio.create_task(self.revalidate_user_data(cache_path))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return self.user_data
+
+    async def revalidate_user_data(self, cache_path: Path) -> UserData:
+        cached = self.user_data
+        try:
+            user_data = await self.get_user_data()
+        except Exception:
+            if cached is None:
+                raise
+            logger.warning("user data revalidation failed", exc_info=True)
+            return cached
+        if user_data != cached:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            async with aiofiles.open(cache_path, 'w', encoding='utf-8') as f:
+                await f.write(user_data.model_dump_json())
+        return user_data
+
+    async def iter_messages(
+            self,
+            chat_id: str,
+            known_ids: Collection[str] = (),
+            first_page: int = MESSAGES_PAGE_LIMIT
+    ) -> AsyncIterator[Message]:
+        """
+        Сообщения чата от новых к старым, постранично. Останавливается на первом сообщении из `known_ids`,
+        поэтому для дозагрузки закешированной истории обычно хватает одной маленькой страницы.
+        Страницы растут от `first_page` вдвое до `MESSAGES_PAGE_LIMIT`.
+        """
+        limit = min(first_page, MESSAGES_PAGE_LIMIT)
+        offset = 0
+        seen: set[str] = set()
+        while True:
+            r = await self.get_chat_messages(chat_id, limit=limit, offset=offset)
+            if isinstance(r, FailedResponse):
+                raise ValueError(f"Не удалось получить сообщения чата {chat_id}: {r.code} {r.message}")
+            for message in r.messages:
+                if message.id in known_ids:
+                    return
+                # новые сообщения сдвигают offset, поэтому страницы могут перекрываться
+                if message.id not in seen:
+                    seen.add(message.id)
+                    yield message
+            if len(r.messages) < limit:
+                return
+            offset += limit
+            limit = min(limit * 2, MESSAGES_PAGE_LIMIT)
+
+    async def fetch_tail(self, chat_id: str, n: int) -> list[Message]:
+        """Только `n` последних сообщений чата, от новых к старым."""
+        messages = []
+        async for message in self.iter_messages(chat_id, first_page=n):
+            messages.append(message)
+            if len(messages) >= n:
+                break
+        return messages
 
     async def send_message(self, chat_id: str, text: str, user_id: int | None = None, ai_mark: bool = True) -> Message:
         return await super().send_message(
@@ -222,6 +346,19 @@ class AvitoBL:
             editor: PromptEditor,
             tg_notificator: TGNotificator,
             limits_service: LimitsUOW,
+            store: LocalStore | None = None,
+            history_cache_size: int = 2000,
+            history_tail: int = MESSAGES_PAGE_LIMIT,
+            sync: InboxSync | None = None,
+            governor: AIMDGovernor | None = None,
+            meter: TokenMeter | None = None,
+            debouncer: Debouncer | None = None,
+            scheduler: DeadlineScheduler | None = None,
+            shadow: ShadowLog | None = None,
+            prompt_file: str = "text.md",
+            planner: TickPlanner | None = None,
+            faq: FAQIndex | None = None,
+            outbox: Outbox | None = None,
     ):
         self.avito = avito
         self.openai = openai
@@ -229,97 +366,371 @@ class AvitoBL:
         self.prompt = None
         self.limits: LimitsUOW = limits_service
         self.tg_notificator = tg_notificator
+        self.store = store
+        # Хвост истории чата (от новых к старым) длиной до history_tail; дозагружается до last_message чата
+        self.history_tail = history_tail
+        self.histories: LRUCache[str, list[Message]] = LRUCache(maxsize=history_cache_size)
+        # chat_id -> id входящего сообщения, на которое уже был отправлен ответ
+        self.replied: LRUCache[str, str] = LRUCache(maxsize=history_cache_size)
+        self.conversations = ConversationCache(maxsize=history_cache_size, max_turns=history_tail)
+        self.sync = sync or InboxSync(avito, store)
+        self.governor = governor or AIMDGovernor()
+        self.meter = meter or TokenMeter(limits_service.uuid, store)
+        self.debouncer = debouncer or Debouncer()
+        self.scheduler = scheduler or DeadlineScheduler()
+        # В теневом режиме ответы, токены и тайминги пишутся в журнал, а не покупателю
+        self.shadow = shadow
+        self.prompt_file = prompt_file
+        self.planner = planner or TickPlanner()
+        self.ticks = 0
+        self.faq = faq
+        # сгенерированные ответы, которые не удалось отправить: повторяются без новой генерации
+        self.outbox = outbox or Outbox(store)
+        self.progress = TickProgress()
+        self._tick_lock = asyncio.Lock()
+        self._last_tick: float | None = None
+
+    async def restore_state(self):
+        """Прогревает кеши из локального хранилища, чтобы после рестарта не перечитывать все истории."""
+        if not self.store:
+            return
+        await self.sync.restore()
+        await self.meter.restore()
+        await self.outbox.restore()
+        histories = await self.store.recent_histories(self.histories.maxsize)
+        self.histories.update({chat_id: messages[:self.history_tail] for chat_id, messages in histories.items()})
+        self.replied.update(await self.store.last_replies())
+
+    def warmup_targets(self) -> dict[str, Callable[[], Awaitable]]:
+        """Легкие запросы к каждому внешнему сервису, открывающие соединения до первого тика."""
+        return {
+            "avito": self.avito._ensure_valid_token,
+            "openai": self.openai.models.list,
+            "limits": self.limits.get_bot,
+            "telegram": self.tg_notificator.bot.get_me,
+        }
 
     async def not_answered_chats(self) -> list[Chat]:
-        r = await self.avito.chats(chat_types=[ChatTypeEnum.u2i], limit=10)
-        return [chat for chat in r.not_answered_chats if not chat.is_system]
+        await self.sync.delta()
+        # Системные чаты sync отсеивает по последнему сообщению, так как чаты из списка еще не обогащены
+        chats = sorted(self.sync.pending.values(), key=lambda chat: chat.updated, reverse=True)
+        return [chat for chat in chats if self.replied.get(chat.id) != chat.last_message.id]
+
+    def known_assisted(self, chat: Chat) -> AssistState | None:
+        """Отвечали ли в чате AI или менеджер — по кешу, без запроса истории. None, если чат еще не знаком."""
+        cached = self.histories.get(chat.id)
+        if cached is None:
+            return AssistState.assisted if chat.id in self.replied else None
+        sent = [message for message in cached if message.direction == "out"]
+        # как Chat.ai_assist_required: любой ответ не от AI означает, что чат ведет менеджер
+        if any(not message.from_ai for message in sent):
+            return AssistState.not_required
+        if sent or chat.id in self.replied:
+            return AssistState.assisted
+        return AssistState.first_time
+
+    def ingest_event(self, event: dict):
+        """
+        Событие вебхука `messenger` v3: чат отмечается для следующей синхронизации, а новое сообщение
+        дописывается в начало закешированной истории, чтобы тик взял ее из кеша без запроса `get_chat_messages`.
+        """
+        payload = event.get("payload") or {}
+        if payload.get("type") != "message":
+            return
+        value = payload["value"]
+        direction = "out" if value.get("author_id") == value.get("user_id") else "in"
+        message = Message.model_validate({**value, "direction": direction})
+        self.sync.mark(value["chat_id"], message)
+        cached = self.histories.get(value["chat_id"])
+        if cached and message.created >= cached[0].created and all(m.id != message.id for m in cached):
+            self.histories[value["chat_id"]] = [message, *cached][:self.history_tail]
 
     async def enrich_message(self, chat: Chat) -> Chat:
-        r = await self.avito.get_chat_messages(chat.id)
-        if isinstance(r, MessagesResponse):
-            chat.messages = r.messages
+        cached = self.histories.get(chat.id)
+        if cached and cached[0].id == chat.last_message.id:
+            chat.messages = cached
+            return chat
+        try:
+            if cached:
+                fresh = []
+                # дозагружаем только то, что новее кеша; если разрыв длиннее хвоста — кеш больше не нужен
+                async for message in self.avito.iter_messages(chat.id, {m.id for m in cached}, first_page=10):
+                    fresh.append(message)
+                    if len(fresh) >= self.history_tail:
+                        cached = []
+                        break
+                messages = (fresh + cached)[:self.history_tail]
+            else:
+                fresh = messages = await self.avito.fetch_tail(chat.id, self.history_tail)
+        except ValueError:
+            logger.warning("messages fetch failed", extra={"chat_id": chat.id}, exc_info=True)
+            return chat
+        chat.messages = messages
+        if messages:
+            self.histories[chat.id] = messages
+        if self.store:
+            self.store.save_chat(chat)
+            self.store.save_messages(chat.id, fresh)
         return chat
 
+    def remember_reply(self, chat: Chat, answer: str, first_time: bool):
+        """Запоминает ответ на текущее последнее сообщение чата, чтобы не ответить на него повторно."""
+        self.replied[chat.id] = chat.last_message.id
+        self.debouncer.answered(chat)
+        self.scheduler.answered(chat)
+        if self.store and not self.shadow:
+            self.store.record_reply(chat.id, chat.last_message.id, answer, first_time)
+
     async def enrich_messages(self, chats: list[Chat]) -> list[Chat]:
         tasks = [self.enrich_message(chat) for chat in chats]
         await asyncio.gather(*tasks)
         return chats
 
-    async def gen_answer(self, chat: Chat):
-        messages = chat.as_conversation_with_prompt(self.prompt)
-        response = await self.openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.7,
-        )
+    @traced("openai.chat.completions")
+    @observe_stage("gen_answer")
+    async def gen_answer(self, chat: Chat, budget: BudgetDecision | None = None):
+        budget = budget or self.meter.decide(chat.id)
+        messages = self.conversations.build(chat, self.prompt, last=budget.context_messages)
+        async with self.governor.slot():
+            raw = await self.openai.chat.completions.with_raw_response.create(
+                model=budget.model,
+                messages=messages,
+                temperature=0.7,
+            )
+        self.governor.observe_headers(raw.headers)
+        response = raw.parse()
+        if response.usage:
+            self.meter.record(chat.id, budget.model, response.usage)
         answer = response.choices[0].message.content
         return answer
 
+    async def run_tick(self, cooldown: float = 0, wait: bool = False,
+                       started: Callable[[int], Any] | None = None) -> bool:
+        """
+        Тик под общим замком: два тика одного бота одновременно не идут. Плановый тик (`wait=False`)
+        пропускается, если идет другой или с начала прошлого прошло меньше `cooldown` секунд;
+        ручной (`wait=True`) дожидается окончания текущего. `started` получает номер тика, как только
+        замок взят. Возвращает, был ли выполнен тик.
+        """
+        if not wait and (
+                self._tick_lock.locked()
+                or self._last_tick is not None and time.monotonic() - self._last_tick < cooldown
+        ):
+            return False
+        async with self._tick_lock:
+            self._last_tick = time.monotonic()
+            if started is not None:
+                started(self.ticks + 1)  # номер, который meta присвоит этому тику
+            await self.meta()
+        return True
+
+    @traced("tick")
+    @profiled
     async def meta(self):
-        self.prompt = await self.editor.read_text("text.md")
+        self.ticks += 1
+        tick = self.ticks
+        self.progress.emit("tick.started", tick=tick)
+        started = time.perf_counter()
+        ok = False
+        try:
+            with log_context(tick=tick, bot=str(self.limits.uuid)):
+                await self._meta()
+            ok = True
+        finally:
+            self.progress.emit("tick.finished", tick=tick, ok=ok, seconds=round(time.perf_counter() - started, 4))
+
+    def _stage(self, stages: dict[str, float], stage: str, started: float):
+        stages[stage] = time.perf_counter() - started
+        self.progress.emit("stage", tick=self.ticks, stage=stage, seconds=round(stages[stage], 4))
+
+    async def _meta(self):
+        self.prompt = await self.editor.read_text(self.prompt_file)
+        if self.faq:
+            self.faq.refresh()
         bot = await self.limits.get_bot()
+        stages: dict[str, float] = {}
+        started = time.perf_counter()
 
         not_answered_chats = await self.not_answered_chats()
+        self._stage(stages, "listing", started)
+        self.outbox.prune(self.sync.pending)
+        CHATS_TOTAL.inc(len(not_answered_chats), status="seen")
+        self.debouncer.prune(not_answered_chats)
+        # Покупатель еще пишет — отвечаем на всю серию сообщений на одном из следующих тиков
+        ready = [chat for chat in not_answered_chats if self.debouncer.ready(chat)]
+        CHATS_TOTAL.inc(len(not_answered_chats) - len(ready), status="deferred")
+        # Ранние дедлайны первыми, так что квота first_time_assist тоже уходит самым давним чатам
+        # Пропущенные при перегрузке чаты остаются в sync.pending до следующих тиков
+        plan = self.scheduler.plan(ready)
+        not_answered_chats = plan.ordered
         for chat in not_answered_chats:
-            print(
-                f"{chat.user.name} ({chat.user.id}): {chat.id}"
-            )
-        if not_answered_chats:
-            print(
-                f"Всего неотвеченных чатов: {len(not_answered_chats)}"
-            )
-        await self.enrich_messages(not_answered_chats)
-
-        enriched = [chat for chat in not_answered_chats if chat.enriched]
-
-        print(
-            f"Всего обогащенных чатов: {len(enriched)}"
-        )
+            logger.debug("chat not answered", extra={"event": "chat.seen", "chat_id": chat.id, "user_id": chat.user.id})
+        # Историю запрашиваем только для чатов, на которые хватит квоты (уже ассистированные — бесплатны)
+        tick_plan = self.planner.plan(not_answered_chats, bot.remain, self.known_assisted, self.histories.get)
+        CHATS_TOTAL.inc(len(tick_plan.postponed) + len(tick_plan.not_required), status="skipped")
+        for chat in tick_plan.not_required:
+            # вернется в очередь, когда покупатель напишет снова
+            self.sync.pending.pop(chat.id, None)
+        started = time.perf_counter()
+        await self.enrich_messages(tick_plan.enrich)
+        self._stage(stages, "enrichment", started)
+
+        enriched = [chat for chat in tick_plan.enrich if chat.enriched]
         required = [chat for chat in enriched if chat.ai_assist_required]
 
         # Разделяем на две группы
         first_time_assist = [chat for chat in required if not chat.ai_assisted]  # Требуется впервые
         already_assisted = [chat for chat in required if chat.ai_assisted]  # Уже был ассистент
-
-        print(f"Всего чатов где требуется аи ассистент впервые: {len(first_time_assist)}")
+        BACKLOG_SIZE.set(len(required))
+        CHATS_TOTAL.inc(len(tick_plan.enrich) - len(required), status="skipped")
+
+        planned = {
+            "not_answered": len(not_answered_chats),
+            "enriched": len(enriched),
+            "first_time": len(first_time_assist),
+            "already_assisted": len(already_assisted),
+            "remain": bot.remain,
+        }
+        logger.info("tick planned", extra=planned)
+        self.progress.emit("planned", tick=self.ticks, **planned)
+        to_answer = []
         if first_time_assist:
-
-            bot = await self.limits.get_bot()
-
             # Определяем сколько можем обработать с учетом лимита
+            CHATS_TOTAL.inc(max(0, len(first_time_assist) - bot.remain), status="skipped")
             if bot.remain > 0:
-                chats_to_answer_with_increment = first_time_assist[:bot.remain]
+                to_answer += [(chat, True) for chat in first_time_assist[:bot.remain]]
+
+        to_answer += [(chat, False) for chat in already_assisted]
+
+        # Чаты обрабатываются параллельно, число одновременных запросов к OpenAI задает governor
+        started = time.perf_counter()
+        answered = await asyncio.gather(*(self._answer_chat(chat, first_time) for chat, first_time in to_answer))
+        self._stage(stages, "answering", started)
+        self.meter.flush()
+        if self.shadow:
+            self.shadow.tick(stages, seen=len(not_answered_chats), enriched=len(enriched), required=len(required),
+                             answered=sum(answered))
+
+    async def _answer_chat(self, chat: Chat, first_time: bool) -> bool:
+        started = time.perf_counter()
+        answered = await self.answer_chat(chat, first_time)
+        self.progress.emit("chat", tick=self.ticks, chat_id=chat.id, first_time=first_time, answered=answered,
+                           seconds=round(time.perf_counter() - started, 4))
+        return answered
+
+    def faq_answer(self, chat: Chat) -> str | None:
+        """Ответ из FAQ на первые сообщения покупателя, если вопрос почти дословно совпал с известным."""
+        if not self.faq or chat.messages_sent:
+            return None
+        question = " ".join(m.content.text for m in reversed(chat.incoming_messages) if m.content.text)
+        item = chat.context.value if chat.context else None
+        return self.faq.answer(
+            question,
+            title=item.title if item else None,
+            price=item.price_string if item else None,
+            url=item.url if item else None,
+            name=chat.user.name,
+        )
 
-                for chat in chats_to_answer_with_increment:
-                    answered = False
-                    try:
-                        answer = await self.gen_answer(chat)
-                        await self.avito.send_message(chat_id=chat.id, text=answer)
-                        answered = True
-                    except Exception as e:
-                        print(traceback.format_exc())
-                        continue
+    async def answer_chat(self, chat: Chat, first_time: bool) -> bool:
+        """Отвечает в чат. Первый ответ AI расходует квоту бота и уведомляет менеджера в Telegram."""
+        with (
+            TRACER.span("chat", chat_id=chat.id, assist="first_time" if first_time else "continued") as span,
+            log_context(chat_id=chat.id),
+        ):
+            entry = None if self.shadow else self.outbox.pending(chat)
+            if entry is not None and not self.outbox.due(entry):
+                CHATS_TOTAL.inc(status="deferred")
+                span.set_attribute("status", "deferred")
+                return False
+            # ответ из outbox и из FAQ не тратит токены, поэтому проверяется до бюджета
+            answer = entry.text if entry else self.faq_answer(chat)
+            budget = None
+            if answer is not None:
+                span.set_attribute("source", "outbox" if entry else "faq")
+            else:
+                budget = self.meter.decide(chat.id)
+                span.set_attribute("budget", budget.mode.value)
+                if budget.mode is BudgetMode.skip:
+                    CHATS_TOTAL.inc(status="skipped")
+                    span.set_attribute("status", "skipped")
+                    return False
+            if self.shadow:
+                span.set_attribute("shadow", True)
+                return await self.shadow_answer(chat, first_time, budget, answer)
+            try:
+                if answer is None:
+                    answer = await self.gen_answer(chat, budget)
+                # до отправки: если она упадет, оплаченный ответ уйдет на следующем тике
+                entry = entry or self.outbox.put(chat, answer, first_time)
+                await self.avito.send_message(chat_id=chat.id, text=answer)
+                self.outbox.sent(entry)
+                self.remember_reply(chat, answer, first_time=first_time)
+                CHATS_TOTAL.inc(status="answered")
+                span.set_attribute("status", "answered")
+            except Exception:
+                if entry is not None:
+                    self.outbox.failed(entry)
+                CHATS_TOTAL.inc(status="failed")
+                span.set_attribute("status", "failed")
+                span.status = "error"
+                logger.exception("answer failed")
+                return False
+
+            if first_time:
+                # ответ уже у покупателя: сбой квоты или уведомления не должен прерывать тик
+                try:
+                    await self.limits.increment_usage()
+                    await self.tg_notificator.new_assist(
+                        chat_url=chat.url,
+                        ad_url=chat.ad_url,
+                        last_message_content=chat.messages[-1].content.text if chat.messages[-1].content else None,
+                        ai_assistant_content=answer
+                    )
+                except Exception:
+                    span.set_attribute("side_effects", "failed")
+                    logger.exception("post-send side effects failed")
+            return True
+
+    async def shadow_answer(self, chat: Chat, first_time: bool, budget: BudgetDecision | None,
+                            answer: str | None = None) -> bool:
+        """Генерирует ответ и пишет его в журнал вместо отправки, расхода квоты и уведомления."""
+        tokens = self.meter.chats[chat.id]
+        started = time.perf_counter()
+        try:
+            if answer is None:
+                answer = await self.gen_answer(chat, budget)
+        except Exception:
+            CHATS_TOTAL.inc(status="failed")
+            logger.exception("shadow answer failed")
+            return False
+        self.shadow.reply(
+            chat_id=chat.id,
+            in_reply_to=chat.last_message.id,
+            first_time=first_time,
+            answer=answer,
+            model=budget.model if budget else "faq",
+            budget=budget.mode.value if budget else "faq",
+            tokens=self.meter.chats[chat.id] - tokens,
+            gen_seconds=time.perf_counter() - started,
+        )
+        # запоминаем только в памяти, чтобы не генерировать ответ на то же сообщение каждый тик
+        self.remember_reply(chat, answer, first_time)
+        CHATS_TOTAL.inc(status="answered")
+        return True
 
-                    if answered:
-                        await self.limits.increment_usage()
-                        await self.tg_notificator.new_assist(
-                            chat_url=chat.url,
-                            ad_url=chat.ad_url,
-                            last_message_content=chat.messages[-1].content.text if chat.messages[-1].content else None,
-                            ai_assistant_content=answer
-                        )
 
-        print(f"Всего частов где уже был аи ассистент: {len(already_assisted)}")
-        if already_assisted:
+class ShadowAvitoBL(AvitoBL):
+    """
+    `AvitoBL` в теневом режиме для запуска рядом с основным на тех же входящих:
+    свои кеши и журнал, без записи в общее хранилище и без побочных эффектов для покупателей.
+    Метрики основного бота теневой тик не трогает: его цифры есть в журнале.
+    """
 
+    def __init__(self, *args, shadow: ShadowLog, **kwargs):
+        with metrics_muted():
+            super().__init__(*args, shadow=shadow, **kwargs)
 
-            for chat in already_assisted:
-                try:
-                    answer = await self.gen_answer(chat)
-                    print(chat.last_message.content.text)
-                    print(answer)
-                    await self.avito.send_message(chat_id=chat.id, text=answer)
-                    # Здесь НЕ вызываем increment_usage()
-                except Exception as e:
-                    print(traceback.format_exc())
-                    continue
+    async def meta(self):
+        with metrics_muted():
+            await super().meta()
@@ -0,0 +1,70 @@
+from collections import deque
+
+from cachetools import LRUCache
+
+from app.core.metrics import CONVERSATION_BUILDS_TOTAL
+from app.models.avito import Chat, Message
+
+
+class ConversationState:
+    """Собранный диалог чата: системный блок и реплики от старых к новым до `last_message_id` включительно."""
+
+    __slots__ = ("prompt_version", "system", "turns", "last_message_id")
+
+    def __init__(self, chat: Chat, prompt: str, max_turns: int):
+        self.prompt_version = hash(prompt)
+        self.system = {"role": "system", "content": f"{chat.conversation_header} | {prompt}"}
+        self.turns: deque[dict] = deque(maxlen=max_turns)
+        self.last_message_id: str | None = None
+
+    def extend(self, messages: list[Message]) -> bool:
+        """
+        Дописывает сообщения новее `last_message_id` (`messages` — от новых к старым).
+        Возвращает False, если уже учтенное сообщение не найдено и состояние надо собрать заново.
+        """
+        new = messages
+        if self.last_message_id is not None:
+            for i, message in enumerate(messages):
+                if message.id == self.last_message_id:
+                    new = messages[:i]
+                    break
+            else:
+                return False
+        for message in reversed(new):
+            if message.author_id != 0:
+                self.turns.append(message.as_conversation)
+        if messages:
+            self.last_message_id = messages[0].id
+        return True
+
+    def build(self, last: int | None = None) -> list[dict]:
+        turns = list(self.turns)
+        if last:
+            turns = turns[-last:]
+        return [dict(self.system), *turns]
+
+
+class ConversationCache:
+    """
+    Ограниченный кеш диалогов по чатам. Для уже ассистированных чатов новый ответ
+    дописывает в диалог только новые сообщения, а не пересобирает его из всей истории.
+    Смена промпта сбрасывает состояние чата.
+    """
+
+    def __init__(self, maxsize: int = 2000, max_turns: int = 100):
+        self.max_turns = max_turns
+        self.states: LRUCache[str, ConversationState] = LRUCache(maxsize=maxsize)
+
+    def build(self, chat: Chat, prompt: str, last: int | None = None) -> list[dict]:
+        """То же, что `chat.as_conversation_with_prompt(prompt)`, но инкрементально."""
+        if not chat.enriched:
+            raise ValueError("Chat not enriched with messages")
+        state = self.states.get(chat.id)
+        if state is not None and state.prompt_version == hash(prompt) and state.extend(chat.messages):
+            CONVERSATION_BUILDS_TOTAL.inc(kind="append")
+        else:
+            state = ConversationState(chat, prompt, self.max_turns)
+            state.extend(chat.messages)
+            self.states[chat.id] = state
+            CONVERSATION_BUILDS_TOTAL.inc(kind="rebuild")
+        return state.build(last)
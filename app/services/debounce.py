@@ -0,0 +1,50 @@
+import time
+from itertools import takewhile
+
+from cachetools import LRUCache
+
+from app.core.metrics import DEBOUNCE_COALESCED_MESSAGES
+from app.models.avito import Chat
+
+
+class Debouncer:
+    """
+    Откладывает ответ в чат, пока покупатель пишет серию сообщений.
+
+    Чат готов к ответу, когда после его последнего входящего прошло `window` секунд тишины,
+    но не позже `max_wait` секунд от начала серии. `window=0` отключает задержку.
+    """
+
+    def __init__(self, window: float = 0.0, max_wait: float = 60.0, maxsize: int = 10_000):
+        self.window = window
+        self.max_wait = max_wait
+        # chat_id -> время первого входящего текущей серии
+        self.bursts: LRUCache[str, float] = LRUCache(maxsize=maxsize)
+
+    def ready(self, chat: Chat, now: float | None = None) -> bool:
+        if self.window <= 0:
+            return True
+        now = time.time() if now is None else now
+        started = self.bursts.setdefault(chat.id, chat.last_message.created)
+        return now - chat.last_message.created >= self.window or now - started >= self.max_wait
+
+    def due_in(self, chat: Chat, now: float | None = None) -> float:
+        """Через сколько секунд чат станет готов к ответу."""
+        if self.window <= 0:
+            return 0.0
+        now = time.time() if now is None else now
+        started = self.bursts.get(chat.id, chat.last_message.created)
+        due = min(chat.last_message.created + self.window, started + self.max_wait)
+        return max(0.0, due - now)
+
+    def prune(self, waiting: list[Chat]):
+        """Закрывает серии чатов, которые больше не ждут ответа: новое сообщение начнет новую серию."""
+        waiting_ids = {chat.id for chat in waiting}
+        for chat_id in [chat_id for chat_id in self.bursts if chat_id not in waiting_ids]:
+            del self.bursts[chat_id]
+
+    def answered(self, chat: Chat):
+        """Закрывает серию и учитывает, сколько входящих подряд покрыл один ответ."""
+        self.bursts.pop(chat.id, None)
+        if chat.messages:
+            DEBOUNCE_COALESCED_MESSAGES.observe(sum(1 for _ in takewhile(lambda m: m.direction == "in", chat.messages)))
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator
+
+from app.core.metrics import EVENT_LOG_LAG, WEBHOOK_EVENTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+
+
+class EventLog:
+    """
+    Локальный журнал входящих событий вебхука (write-ahead).
+
+    `append` возвращается только после fsync, поэтому ответ Avito можно отдавать сразу после него.
+    Записи группируются: один fsync на все события, пришедшие за `fsync_interval`.
+    Журнал разбит на сегменты по `segment_bytes`; сегменты, целиком обработанные потребителем,
+    удаляются. При старте необработанные события читаются с диска заново.
+    """
+
+    def __init__(self, path: str | Path, segment_bytes: int = 4 * 1024 * 1024, fsync_interval: float = 0.005,
+                 commit_every: int = 100):
+        self.path = Path(path)
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.commit_every = commit_every
+        self.next_offset = 0
+        self.committed = -1  # последнее обработанное смещение
+        self._file = None
+        self._segment_size = 0
+        self._pending: list[tuple[int, str, asyncio.Future]] = []
+        self._flusher: asyncio.Task | None = None
+        self._queue: asyncio.Queue[tuple[int, dict]] = asyncio.Queue()
+        self._closed = False
+
+    # --- файлы ----------------------------------------------------------------------------------
+
+    @property
+    def _checkpoint(self) -> Path:
+        return self.path / "checkpoint.json"
+
+    def _segments(self) -> list[tuple[int, Path]]:
+        return sorted((int(p.stem), p) for p in self.path.glob(f"*{SEGMENT_SUFFIX}") if p.stem.isdigit())
+
+    @staticmethod
+    def _read_segment(path: Path) -> Iterator[tuple[int, dict]]:
+        data = path.read_bytes()
+        if data and not data.endswith(b"\n"):
+            # оборванная при падении последняя строка: ее append не был подтвержден
+            data = data[:data.rfind(b"\n") + 1]
+            with path.open("r+b") as f:
+                f.truncate(len(data))
+        for line in data.decode("utf-8").splitlines():
+            record = json.loads(line)
+            yield record["offset"], record["event"]
+
+    def _open_segment(self, first_offset: int):
+        if self._file:
+            self._file.close()
+        self._file = (self.path / f"{first_offset:020d}{SEGMENT_SUFFIX}").open("a", encoding="utf-8")
+        self._segment_size = self._file.tell()
+
+    def _recover(self) -> list[tuple[int, dict]]:
+        self.path.mkdir(parents=True, exist_ok=True)
+        if self._checkpoint.exists():
+            self.committed = json.loads(self._checkpoint.read_text())["offset"]
+        self.next_offset = self.committed + 1
+        unprocessed = []
+        segments = self._segments()
+        for _, segment in segments:
+            for offset, event in self._read_segment(segment):
+                self.next_offset = max(self.next_offset, offset + 1)
+                if offset > self.committed:
+                    unprocessed.append((offset, event))
+        self._open_segment(self.next_offset)
+        return unprocessed
+
+    def _write(self, lines: list[str], last_offset: int):
+        data = "".join(lines)
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._segment_size += len(data.encode("utf-8"))
+        if self._segment_size >= self.segment_bytes:
+            # имя сегмента — первое смещение в нем
+            self._open_segment(last_offset + 1)
+
+    def _write_checkpoint(self, offset: int):
+        tmp = self._checkpoint.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"offset": offset}))
+        os.replace(tmp, self._checkpoint)
+        segments = self._segments()
+        # сегмент (кроме последнего, активного) можно удалить, если следующий начинается не позже committed + 1
+        for (_, segment), (next_start, _) in zip(segments, segments[1:]):
+            if next_start <= offset + 1:
+                segment.unlink(missing_ok=True)
+
+    # --- жизненный цикл -------------------------------------------------------------------------
+
+    async def open(self):
+        unprocessed = await asyncio.to_thread(self._recover)
+        for item in unprocessed:
+            self._queue.put_nowait(item)
+        EVENT_LOG_LAG.set(self._queue.qsize())
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        self._closed = True
+        if self._flusher:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self._pending:
+            await self._flush()
+        if self._file:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+    # --- запись ---------------------------------------------------------------------------------
+
+    async def append(self, event: dict[str, Any]) -> int:
+        """Добавляет событие и ждет, пока оно окажется на диске. Возвращает его смещение."""
+        if self._closed:
+            raise RuntimeError("EventLog is closed")
+        offset = self.next_offset
+        self.next_offset += 1
+        future = asyncio.get_running_loop().create_future()
+        line = json.dumps({"offset": offset, "event": event}, ensure_ascii=False) + "\n"
+        self._pending.append((offset, line, future))
+        await future
+        self._queue.put_nowait((offset, event))
+        WEBHOOK_EVENTS_TOTAL.inc(stage="appended")
+        EVENT_LOG_LAG.set(self._queue.qsize())
+        return offset
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._write, [line for _, line, _ in batch], batch[-1][0])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for _, _, future in batch:
+            future.set_result(None)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            if self._pending:
+                await self._flush()
+
+    # --- обработка ------------------------------------------------------------------------------
+
+    async def commit(self, offset: int):
+        if offset <= self.committed:
+            return
+        self.committed = offset
+        await asyncio.to_thread(self._write_checkpoint, offset)
+
+    async def consume(self, handler: Callable[[dict], Awaitable[None] | None]):
+        """Бесконечно передает события обработчику по порядку; ошибка обработчика не останавливает поток."""
+        processed = 0
+        while True:
+            offset, event = await self._queue.get()
+            try:
+                result = handler(event)
+                if asyncio.iscoroutine(result):
+                    await result
+                WEBHOOK_EVENTS_TOTAL.inc(stage="processed")
+            except Exception:
+                WEBHOOK_EVENTS_TOTAL.inc(stage="failed")
+                logger.exception("webhook event failed", extra={"offset": offset})
+            processed += 1
+            EVENT_LOG_LAG.set(self._queue.qsize())
+            if processed % self.commit_every == 0 or self._queue.empty():
+                await self.commit(offset)
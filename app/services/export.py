@@ -0,0 +1,310 @@
+"""
+Потоковая выгрузка чатов и сообщений для аналитики и настройки промптов.
+
+    python -m app.services.export --source store --kind messages --out exports/messages \
+        --fields id,chat_id,created,direction,content.text
+
+Источник `store` — локальное состояние (без запросов к Avito), `api` — Avito API; при выгрузке из API
+полученное сохраняется в локальное состояние, а уже сохраненные истории дозагружаются только до первого
+известного сообщения. Повторный запуск с тем же `--out` продолжает с последнего готового файла, а после
+завершенной выгрузки дописывает только новое: из API — чаты и сообщения новее водяного знака `updated`.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Literal, Sequence, TextIO
+
+from app.core.logs import setup_logging, stop_logging
+from app.models.avito import FailedResponse
+from app.services.avito import Avito
+from app.services.store import LocalStore
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+logger = logging.getLogger(__name__)
+
+Kind = Literal["chats", "messages"]
+Compression = Literal["gzip", "zstd", "none"]
+SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst", "none": ".jsonl"}
+
+# пачка строк и позиция источника сразу после нее: с этой позиции выгрузку можно продолжить
+Batch = tuple[list[dict[str, Any]], Any]
+Source = Callable[[Any], AsyncIterator[Batch]]
+
+
+def project(row: dict[str, Any], fields: Sequence[str] | None) -> dict[str, Any]:
+    """Только нужные поля; вложенные задаются через точку (`content.text`) и выводятся плоско."""
+    if not fields:
+        return row
+    result = {}
+    for path in fields:
+        value: Any = row
+        for key in path.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        result[path] = value
+    return result
+
+
+def _open(path: Path, compression: Compression) -> TextIO:
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        return zstd.open(path, "wt", encoding="utf-8")
+    return path.open("w", encoding="utf-8")
+
+
+# --- источники ----------------------------------------------------------------------------------
+
+
+async def store_messages(store: LocalStore, cursor: int | None, batch: int = 1000) -> AsyncIterator[Batch]:
+    rowid = cursor or 0
+    while rows := await store.messages_after(rowid, batch):
+        rowid = rows[-1][0]
+        yield [{"chat_id": chat_id, **json.loads(payload)} for _, chat_id, payload in rows], rowid
+
+
+async def store_chats(store: LocalStore, cursor: list | None, batch: int = 1000) -> AsyncIterator[Batch]:
+    updated, chat_id = cursor or (0, "")
+    while rows := await store.chats_after(updated, chat_id, batch):
+        updated, chat_id, _ = rows[-1]
+        yield [json.loads(payload) for _, _, payload in rows], [updated, chat_id]
+
+
+def _api_cursor(cursor: Any) -> tuple[tuple | None, tuple | None, int]:
+    if isinstance(cursor, dict):
+        since, newest = cursor["since"], cursor["newest"]
+        return tuple(since) if since else None, tuple(newest) if newest else None, cursor["offset"]
+    # ранние выгрузки хранили только смещение в списке чатов
+    return None, None, cursor or 0
+
+
+def _position(since: tuple | None, newest: tuple | None, offset: int) -> dict[str, Any]:
+    return {"since": list(since) if since else None, "newest": list(newest) if newest else None, "offset": offset}
+
+
+async def _chat_pages(avito: Avito, cursor: Any, page_size: int):
+    """
+    Чаты новее водяного знака `since` — пары `(updated, id)` самого нового чата прошлого полного прохода.
+    Avito отдает чаты от недавно обновленных к старым, поэтому проход идет с начала списка до водяного знака;
+    позиция внутри прохода — смещение. Каждый чат выдается вместе с позицией сразу после него.
+    """
+    since, newest, offset = _api_cursor(cursor)
+    while True:
+        r = await avito.chats(limit=page_size, offset=offset)
+        if isinstance(r, FailedResponse):
+            raise ValueError(f"Не удалось получить чаты: {r.code} {r.message}")
+        done = len(r.chats) < page_size or since is not None and r.chats[-1].updated < since[0]
+        chats = []
+        for i, chat in enumerate(r.chats, start=1):
+            if since is not None and (chat.updated, chat.id) <= since:
+                continue
+            newest = max(newest or (0, ""), (chat.updated, chat.id))
+            chats.append((chat, _position(since, newest, offset + i)))
+        offset += len(r.chats)
+        if not done:
+            yield since, chats, _position(since, newest, offset)
+            continue
+        # полный проход: следующий запуск начнет с начала списка и возьмет только то, что новее
+        end = _position(newest or since, None, 0)
+        if chats:
+            chats[-1] = (chats[-1][0], end)
+        yield since, chats, end
+        return
+
+
+async def api_chats(avito: Avito, cursor: Any, page_size: int = 100,
+                    store: LocalStore | None = None) -> AsyncIterator[Batch]:
+    """Новые и изменившиеся с прошлой выгрузки чаты; новые чаты, пришедшие во время прохода, могут повториться."""
+    async for _, chats, end in _chat_pages(avito, cursor, page_size):
+        for chat, _ in chats:
+            if store:
+                store.save_chat(chat)
+        yield [chat.model_dump(mode="json", by_alias=True, exclude={"messages"}) for chat, _ in chats], end
+
+
+async def api_messages(avito: Avito, cursor: Any, page_size: int = 100,
+                       store: LocalStore | None = None) -> AsyncIterator[Batch]:
+    """
+    Одна пачка — сообщения одного чата, новые с прошлой выгрузки (у нового чата — вся история);
+    сохраненная в `store` история из API не перечитывается. Сообщения с секундой водяного знака могут повториться.
+    """
+    async for since, chats, end in _chat_pages(avito, cursor, page_size):
+        for chat, position in chats:
+            cached = await store.load_messages(chat.id) if store else []
+            known = {message.id for message in cached}
+            fresh = []
+            if chat.last_message.id not in known:
+                fresh = [message async for message in avito.iter_messages(chat.id, known_ids=known)]
+            if store:
+                store.save_chat(chat)
+                store.save_messages(chat.id, fresh)
+            messages = fresh + cached
+            if since is not None and chat.created <= since[0]:
+                # чат был в прошлой выгрузке: его сообщения до водяного знака уже выгружены
+                messages = [message for message in messages if message.created >= since[0]]
+            yield [
+                {"chat_id": chat.id, **message.model_dump(mode="json", by_alias=True)} for message in messages
+            ], position
+        if not chats:
+            yield [], end
+
+
+# --- запись -------------------------------------------------------------------------------------
+
+
+@dataclass
+class Checkpoint:
+    kind: str
+    fields: list[str] | None = None
+    cursor: Any = None
+    chunk: int = 0  # номер следующего файла
+    rows: int = 0
+
+
+class Exporter:
+    """
+    Запись в сжатые NDJSON-файлы `<kind>-00000.jsonl.gz` примерно по `chunk_rows` строк.
+
+    Файл пишется во временный `.part` и переименовывается целиком, после чего позиция источника
+    сохраняется в `<kind>.checkpoint.json`. Прерванная выгрузка продолжается с последнего готового файла,
+    завершенная при повторном запуске дописывает только новое. В памяти одновременно одна пачка источника.
+    """
+
+    def __init__(self, out_dir: str | Path, kind: Kind, fields: Sequence[str] | None = None,
+                 chunk_rows: int = 50_000, compression: Compression = "gzip"):
+        if compression == "zstd" and zstd is None:
+            raise ValueError("zstd compression requires Python 3.14+")
+        self.out_dir = Path(out_dir)
+        self.kind = kind
+        self.fields = list(fields) if fields else None
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+
+    @property
+    def checkpoint_path(self) -> Path:
+        return self.out_dir / f"{self.kind}.checkpoint.json"
+
+    def chunk_path(self, chunk: int) -> Path:
+        return self.out_dir / f"{self.kind}-{chunk:05d}{SUFFIXES[self.compression]}"
+
+    def load(self) -> Checkpoint:
+        try:
+            checkpoint = Checkpoint(**json.loads(self.checkpoint_path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return Checkpoint(self.kind, self.fields)
+        if checkpoint.fields != self.fields:
+            # иначе в одном каталоге окажутся файлы с разными колонками
+            raise ValueError(f"Export in {self.out_dir} was started with fields {checkpoint.fields}")
+        return checkpoint
+
+    def _save(self, checkpoint: Checkpoint):
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(checkpoint), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+
+    async def run(self, source: Source) -> Checkpoint:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        checkpoint = self.load()
+        part = self.chunk_path(checkpoint.chunk).with_suffix(".part")
+        file: TextIO | None = None
+        rows = 0
+        cursor = checkpoint.cursor
+        try:
+            async for batch, cursor in source(checkpoint.cursor):
+                if batch:
+                    if file is None:
+                        file = await asyncio.to_thread(_open, part, self.compression)
+                    lines = "".join(json.dumps(project(row, self.fields), ensure_ascii=False) + "\n" for row in batch)
+                    await asyncio.to_thread(file.write, lines)
+                    rows += len(batch)
+                if rows >= self.chunk_rows:
+                    await self._commit(file, part, checkpoint, cursor, rows)
+                    part = self.chunk_path(checkpoint.chunk).with_suffix(".part")
+                    file, rows = None, 0
+        except BaseException:
+            if file is not None:
+                await asyncio.to_thread(file.close)
+            raise
+        if file is not None:
+            await self._commit(file, part, checkpoint, cursor, rows)
+        elif cursor != checkpoint.cursor:
+            checkpoint.cursor = cursor
+            self._save(checkpoint)
+        return checkpoint
+
+    async def _commit(self, file: TextIO, part: Path, checkpoint: Checkpoint, cursor: Any, rows: int):
+        await asyncio.to_thread(file.close)
+        os.replace(part, self.chunk_path(checkpoint.chunk))
+        checkpoint.chunk += 1
+        checkpoint.rows += rows
+        checkpoint.cursor = cursor
+        self._save(checkpoint)
+        logger.info("export chunk written", extra={"kind": self.kind, "chunk": checkpoint.chunk - 1, "rows": rows})
+
+
+# --- запуск -------------------------------------------------------------------------------------
+
+
+async def run(args: argparse.Namespace) -> list[Checkpoint]:
+    store = LocalStore(args.db)
+    await store.open()
+    avito = None
+    try:
+        if args.source == "api":
+            from app.core.config import get_app_settings
+
+            settings = get_app_settings()
+            avito = Avito(
+                settings.app.AVITO_CLIENT_ID.get_secret_value(),
+                settings.app.AVITO_CLIENT_SECRET.get_secret_value()
+            )
+            await avito.get_user_data()
+        results = []
+        for kind in args.kind:
+            exporter = Exporter(args.out, kind, args.fields, args.chunk_rows, args.compression)
+            if avito is not None:
+                source = partial(api_chats if kind == "chats" else api_messages, avito, store=store)
+            else:
+                source = partial(store_chats if kind == "chats" else store_messages, store, batch=args.batch)
+            results.append(await exporter.run(source))
+        return results
+    finally:
+        if avito is not None:
+            await avito.httpx_client.aclose()
+        await store.close()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["store", "api"], default="store")
+    parser.add_argument("--kind", nargs="+", choices=["chats", "messages"], default=["chats", "messages"])
+    parser.add_argument("--db", type=Path, default=Path("data") / "state.sqlite3", help="файл локального состояния")
+    parser.add_argument("--out", type=Path, required=True, help="каталог выгрузки")
+    parser.add_argument("--fields", type=lambda value: value.split(","), default=None,
+                        help="поля через запятую, вложенные через точку; по умолчанию все")
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="строк в одном файле")
+    parser.add_argument("--batch", type=int, default=1000, help="строк в одном чтении из локального состояния")
+    parser.add_argument("--compression", choices=list(SUFFIXES), default="gzip")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    setup_logging("INFO")
+    try:
+        for checkpoint in asyncio.run(run(parse_args(argv))):
+            logger.info("export finished", extra=asdict(checkpoint))
+    finally:
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import math
+import os
+import re
+import string
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from app.core.metrics import FAQ_ANSWERS_TOTAL
+
+_WORD = re.compile(r"\w+")
+# приветствия и связки не отличают один вопрос от другого
+STOPWORDS = frozenset({
+    "здравствуйте", "здрасьте", "привет", "добрый", "доброе", "день", "вечер", "утро", "а", "и", "ну", "вы", "вас",
+    "у", "мне", "скажите", "подскажите", "пожалуйста", "еще", "это", "ли", "же",
+})
+
+
+def tokenize(text: str) -> list[str]:
+    """Нижний регистр, ё -> е, без стоп-слов; слово обрезается до 5 букв — грубый стемминг для русских окончаний."""
+    words = _WORD.findall(text.lower().replace("ё", "е"))
+    return [word[:5] for word in words if word not in STOPWORDS]
+
+
+@dataclass
+class FAQEntry:
+    question: str
+    phrasings: list[str] = field(default_factory=list)
+    template: str = ""
+
+    @property
+    def fields(self) -> set[str]:
+        return {name for _, name, _, _ in string.Formatter().parse(self.template) if name}
+
+
+def parse_faq(text: str) -> list[FAQEntry]:
+    """
+    Формат файла: `## вопрос`, затем строки `? формулировка` и текст ответа.
+    В ответе доступны поля `{title}`, `{price}`, `{name}` и `{url}` из объявления и профиля покупателя.
+    """
+    entries: list[FAQEntry] = []
+    for line in text.splitlines():
+        if line.startswith("## "):
+            entries.append(FAQEntry(question=line[3:].strip(), phrasings=[line[3:].strip()]))
+        elif not entries:
+            continue
+        elif line.startswith("? "):
+            entries[-1].phrasings.append(line[2:].strip())
+        elif line.strip():
+            entries[-1].template = f"{entries[-1].template}\n{line.strip()}".strip()
+    return [entry for entry in entries if entry.template]
+
+
+class FAQIndex:
+    """
+    BM25 по формулировкам вопросов из FAQ оператора.
+
+    Уверенность совпадения — доля слов запроса, найденных в формулировке, умноженная на отношение
+    BM25-оценки к оценке самой формулировки: близкая к 1 только для почти дословных вопросов.
+    Файл перечитывается при изменении; токены неизмененных формулировок берутся из кеша.
+    """
+
+    def __init__(self, path: str | Path, threshold: float = 0.75, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.k1 = k1
+        self.b = b
+        self.entries: list[FAQEntry] = []
+        self._docs: list[tuple[FAQEntry, Counter, int]] = []  # (запись, частоты, длина) на каждую формулировку
+        self._tokens: dict[str, list[str]] = {}
+        self._df: Counter = Counter()
+        self._avgdl = 1.0
+        self._self_scores: list[float] = []
+        self._version: tuple[int, int] | None = None
+
+    def refresh(self) -> bool:
+        """Перестраивает индекс, если файл изменился. Возвращает True, если индекс обновлен."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            changed = self._version is not None
+            self._version = None
+            self._build([])
+            return changed
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self._version:
+            return False
+        self._version = version
+        self._build(parse_faq(self.path.read_text(encoding="utf-8")))
+        return True
+
+    def _build(self, entries: list[FAQEntry]):
+        tokens = {}
+        docs = []
+        for entry in entries:
+            for phrasing in entry.phrasings:
+                tokens[phrasing] = self._tokens.get(phrasing) or tokenize(phrasing)
+                if tokens[phrasing]:
+                    docs.append((entry, Counter(tokens[phrasing]), len(tokens[phrasing])))
+        self.entries = entries
+        self._tokens = tokens
+        self._docs = docs
+        self._df = Counter(term for _, terms, _ in docs for term in terms)
+        self._avgdl = sum(length for _, _, length in docs) / len(docs) if docs else 1.0
+        self._self_scores = [self._score(list(terms.elements()), i) for i, (_, terms, _) in enumerate(docs)]
+
+    def _idf(self, term: str) -> float:
+        n = len(self._docs)
+        df = self._df[term]
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _score(self, query: list[str], i: int) -> float:
+        _, terms, length = self._docs[i]
+        score = 0.0
+        for term in set(query):
+            tf = terms[term]
+            if tf:
+                score += self._idf(term) * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / self._avgdl))
+        return score
+
+    def match(self, text: str) -> tuple[FAQEntry, float] | None:
+        query = tokenize(text)
+        if not query or not self._docs:
+            return None
+        best: tuple[FAQEntry, float] | None = None
+        for i, (entry, terms, _) in enumerate(self._docs):
+            coverage = sum(1 for term in query if term in terms) / len(query)
+            if not coverage:
+                continue
+            confidence = coverage * min(1.0, self._score(query, i) / self._self_scores[i])
+            if best is None or confidence > best[1]:
+                best = (entry, confidence)
+        return best
+
+    def answer(self, text: str, **values: str | None) -> str | None:
+        """Ответ по шаблону для уверенного совпадения; None — отвечать через LLM."""
+        found = self.match(text)
+        if found is None or found[1] < self.threshold:
+            FAQ_ANSWERS_TOTAL.inc(outcome="miss")
+            return None
+        entry, _ = found
+        # шаблон с незаполненным полем хуже ответа LLM
+        if any(not values.get(name) for name in entry.fields):
+            FAQ_ANSWERS_TOTAL.inc(outcome="missing_field")
+            return None
+        FAQ_ANSWERS_TOTAL.inc(outcome="hit")
+        return entry.template.format(**values)
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Mapping
+
+from app.core.metrics import OPENAI_CONCURRENCY_LIMIT, OPENAI_IN_FLIGHT, OPENAI_THROTTLE_TOTAL
+
+RATELIMIT_HEADERS = ("x-ratelimit-remaining-requests", "x-ratelimit-remaining-tokens")
+
+
+class Slot:
+    __slots__ = ("epoch", "started")
+
+    def __init__(self, epoch: int):
+        self.epoch = epoch
+        self.started = time.perf_counter()
+
+
+class AIMDGovernor:
+    """
+    Адаптивный (AIMD) ограничитель параллельных запросов к OpenAI.
+
+    Пока запросы успешны и укладываются в `latency_target`, лимит растет примерно на `increase`
+    за каждое «окно» из `limit` запросов. На 429, 5xx и всплеск задержки лимит умножается на `decrease`.
+    Снижение срабатывает один раз на эпоху: запросы, начатые до снижения, его не повторяют.
+    Заголовки `x-ratelimit-remaining-*` ограничивают лимит сверху, не дожидаясь 429.
+    """
+
+    def __init__(
+            self,
+            initial: int = 4,
+            min_limit: int = 1,
+            max_limit: int = 32,
+            increase: float = 1.0,
+            decrease: float = 0.5,
+            latency_target: float = 15.0,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.limit = float(initial)
+        self.in_flight = 0
+        self.epoch = 0
+        self._condition = asyncio.Condition()
+        OPENAI_CONCURRENCY_LIMIT.set(self.current_limit)
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def _set_limit(self, limit: float):
+        self.limit = min(float(self.max_limit), max(float(self.min_limit), limit))
+        OPENAI_CONCURRENCY_LIMIT.set(self.current_limit)
+
+    def throttle(self, slot: Slot, reason: str):
+        """Мультипликативное снижение лимита, не чаще одного раза на эпоху."""
+        if slot.epoch != self.epoch:
+            return
+        self.epoch += 1
+        OPENAI_THROTTLE_TOTAL.inc(reason=reason)
+        self._set_limit(self.limit * self.decrease)
+
+    def observe_headers(self, headers: Mapping[str, str]):
+        """Не даем лимиту превысить остаток квоты, о котором сообщил OpenAI."""
+        for name in RATELIMIT_HEADERS:
+            value = headers.get(name)
+            if value is None or not value.isdigit():
+                continue
+            remaining = int(value)
+            if remaining < self.current_limit:
+                OPENAI_THROTTLE_TOTAL.inc(reason="ratelimit_header")
+                self._set_limit(remaining)
+
+    def _on_success(self, slot: Slot):
+        if time.perf_counter() - slot.started > self.latency_target:
+            self.throttle(slot, "latency")
+        else:
+            self._set_limit(self.limit + self.increase / self.limit)
+
+    def _on_error(self, slot: Slot, error: BaseException):
+        status = getattr(error, "status_code", None)
+        if status == 429:
+            self.throttle(slot, "rate_limit")
+        elif status is not None and status >= 500:
+            self.throttle(slot, "server_error")
+        elif isinstance(error, (TimeoutError, asyncio.TimeoutError)) or type(error).__name__ == "APITimeoutError":
+            self.throttle(slot, "timeout")
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[Slot]:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.current_limit)
+            self.in_flight += 1
+            OPENAI_IN_FLIGHT.set(self.in_flight)
+        slot = Slot(self.epoch)
+        try:
+            yield slot
+        except Exception as e:
+            self._on_error(slot, e)
+            raise
+        else:
+            self._on_success(slot)
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                OPENAI_IN_FLIGHT.set(self.in_flight)
+                self._condition.notify_all()
+
+    def as_dict(self) -> dict:
+        return {"limit": self.current_limit, "in_flight": self.in_flight, "throttle_epoch": self.epoch}
@@ -1,10 +1,32 @@
-from typing import Optional
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Literal, Optional, Protocol
 from uuid import UUID
 
 import httpx
 
+from app.core.metrics import QUOTA_REMAINING, observe_stage
+from app.core.tracing import traced
 from app.models.limits import BotConfigWithEditable
 
+logger = logging.getLogger(__name__)
+
+LimitsReset = Literal["day", "month", "never"]
+
+
+class LimitsBackend(Protocol):
+    """Хранилище счетчиков использования ботов: HTTP sub-service или локальный SQLite."""
+
+    async def get_bot(self, uuid: UUID) -> Optional[BotConfigWithEditable]: ...
+
+    async def increment_usage(self, uuid: UUID) -> Optional[BotConfigWithEditable]: ...
+
+    async def decrement_usage(self, uuid: UUID) -> Optional[BotConfigWithEditable]: ...
+
 
 class LimitsService:
     """
@@ -14,36 +36,133 @@ class LimitsService:
 
     def __init__(self, base_url):
         self.base_url = base_url
-        print(self.base_url)
+        logger.info("limits service", extra={"base_url": str(self.base_url)})
         self.http_client = httpx.AsyncClient(base_url=self.base_url, timeout=10.0)
 
+    @traced("limits.get_bot")
     async def get_bot(self, uuid: UUID) -> Optional[BotConfigWithEditable]:
         """Получить информацию о боте по UUID."""
         response = await self.http_client.get(f"/bot/{uuid}")
         response.raise_for_status()
         data = response.json()
-        return BotConfigWithEditable(**data)
+        bot = BotConfigWithEditable(**data)
+        QUOTA_REMAINING.set(bot.remain)
+        return bot
 
+    @traced("limits.increment_usage")
+    @observe_stage("increment_usage")
     async def increment_usage(self, uuid: UUID) -> Optional[BotConfigWithEditable]:
         response = await self.http_client.patch(f"/bot/{uuid}/count/increment", )
         response.raise_for_status()
         data = response.json()
-        return BotConfigWithEditable(**data)
+        bot = BotConfigWithEditable(**data)
+        QUOTA_REMAINING.set(bot.remain)
+        return bot
 
+    @traced("limits.decrement_usage")
     async def decrement_usage(self, uuid: UUID) -> Optional[BotConfigWithEditable]:
         response = await self.http_client.patch(f"/bot/{uuid}/count/decrement", )
         response.raise_for_status()
         data = response.json()
-        return BotConfigWithEditable(**data)
+        bot = BotConfigWithEditable(**data)
+        QUOTA_REMAINING.set(bot.remain)
+        return bot
+
+
+LIMITS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bots (
+    uuid TEXT PRIMARY KEY,
+    "limit" INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    period TEXT NOT NULL
+);
+"""
+
+
+class LocalLimits:
+    """
+    Счетчики использования в локальном SQLite — для установки на одном хосте без sub-service лимитов.
+
+    Операция — INSERT ... ON CONFLICT (завести бота и обновить лимит из настройки), затем
+    UPDATE ... RETURNING, который меняет счетчик и сбрасывает его в начале нового периода `reset`
+    (сутки или месяц по UTC). Запросы идут в autocommit, поэтому инкременты не теряются только потому,
+    что все операции выполняются по очереди в одном потоке: к файлу должен обращаться один процесс.
+    """
+
+    def __init__(self, path: str | Path, limit: int, reset: LimitsReset = "month"):
+        self.path = Path(path)
+        self.limit = limit
+        self.reset = reset
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-limits")
+        self._connection: sqlite3.Connection | None = None
+
+    async def _run[T](self, fn, *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(LIMITS_SCHEMA)
+        self._connection = connection
+
+    async def open(self):
+        await self._run(self._connect)
+
+    async def close(self):
+        if self._connection:
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=True)
+
+    def _period(self) -> str:
+        now = datetime.now(timezone.utc)
+        if self.reset == "day":
+            return now.date().isoformat()
+        if self.reset == "month":
+            return now.strftime("%Y-%m")
+        return "-"
+
+    def _change(self, uuid: UUID, delta: int) -> BotConfigWithEditable:
+        period = self._period()
+        self._connection.execute(
+            'INSERT INTO bots (uuid, "limit", count, period) VALUES (?, ?, 0, ?) '
+            'ON CONFLICT(uuid) DO UPDATE SET "limit" = excluded."limit"',
+            (str(uuid), self.limit, period),
+        )
+        row = self._connection.execute(
+            "UPDATE bots SET count = MAX(0, CASE WHEN period = ? THEN count ELSE 0 END + ?), period = ? "
+            'WHERE uuid = ? RETURNING uuid, "limit", count',
+            (period, delta, period, str(uuid)),
+        ).fetchone()
+        return BotConfigWithEditable(id=row[0], uuid=row[0], limit=row[1], count=row[2])
+
+    async def _apply(self, uuid: UUID, delta: int) -> BotConfigWithEditable:
+        bot = await self._run(self._change, uuid, delta)
+        QUOTA_REMAINING.set(bot.remain)
+        return bot
+
+    @traced("limits.get_bot")
+    async def get_bot(self, uuid: UUID) -> Optional[BotConfigWithEditable]:
+        return await self._apply(uuid, 0)
+
+    @traced("limits.increment_usage")
+    @observe_stage("increment_usage")
+    async def increment_usage(self, uuid: UUID) -> Optional[BotConfigWithEditable]:
+        return await self._apply(uuid, 1)
+
+    @traced("limits.decrement_usage")
+    async def decrement_usage(self, uuid: UUID) -> Optional[BotConfigWithEditable]:
+        return await self._apply(uuid, -1)
 
 
 class LimitsUOW:
-    def __init__(self, uuid: str | UUID, service: LimitsService):
+    def __init__(self, uuid: str | UUID, service: LimitsBackend):
         self.uuid = UUID(uuid) if isinstance(uuid, str) else uuid
         self.service = service
 
     async def get_bot(self) -> BotConfigWithEditable | None:
-        print(f"get bot with uuid {self.uuid}" )
+        logger.debug("get bot", extra={"bot": str(self.uuid)})
         return await self.service.get_bot(self.uuid)
 
     async def increment_usage(self) -> BotConfigWithEditable:
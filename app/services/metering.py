@@ -0,0 +1,135 @@
+import enum
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from app.core.metrics import OPENAI_TOKENS_TOTAL, TOKEN_BUDGET_USED
+from app.services.store import LocalStore
+
+
+class BudgetMode(enum.StrEnum):
+    full = "full"
+    reduced = "reduced"  # короче контекст и дешевле модель
+    skip = "skip"
+
+
+@dataclass
+class BudgetDecision:
+    mode: BudgetMode
+    model: str
+    context_messages: int | None = None  # сколько последних сообщений чата отправлять, None — весь хвост
+
+
+@dataclass
+class Usage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, other: "Usage"):
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class TokenMeter:
+    """
+    Учет токенов OpenAI по вызовам, чатам и боту с дневными бюджетами.
+
+    Расход копится в памяти и сбрасывается в локальное хранилище пачкой через `flush`.
+    По мере приближения к бюджету бот отвечает с урезанным контекстом и дешевой моделью,
+    а после его исчерпания — пропускает чаты. Отдельный бюджет на чат останавливает
+    «разговор, который не заканчивается».
+    """
+
+    def __init__(
+            self,
+            bot_uuid: str,
+            store: LocalStore | None = None,
+            model: str = "gpt-4o-mini",
+            reduced_model: str = "gpt-4o-mini",
+            daily_budget: int | None = None,
+            chat_daily_budget: int | None = None,
+            reduce_at: float = 0.8,
+            reduced_context_messages: int = 10,
+    ):
+        self.bot_uuid = str(bot_uuid)
+        self.store = store
+        self.model = model
+        self.reduced_model = reduced_model
+        self.daily_budget = daily_budget
+        self.chat_daily_budget = chat_daily_budget
+        self.reduce_at = reduce_at
+        self.reduced_context_messages = reduced_context_messages
+        self.day = today()
+        self.chats: Counter[str] = Counter()  # chat_id -> токены за день
+        self.pending: dict[tuple[str, str, str], Usage] = {}  # (day, chat_id, model) -> еще не сброшенный расход
+
+    @property
+    def used(self) -> int:
+        return self.chats.total()
+
+    async def restore(self):
+        if self.store:
+            self.chats = Counter(await self.store.token_usage(self.day, self.bot_uuid))
+        self._report()
+
+    def _rollover(self):
+        day = today()
+        if day != self.day:
+            self.day = day
+            self.chats.clear()
+
+    def _report(self):
+        if self.daily_budget:
+            TOKEN_BUDGET_USED.set(round(self.used / self.daily_budget, 4))
+
+    def decide(self, chat_id: str) -> BudgetDecision:
+        self._rollover()
+        if self.chat_daily_budget and self.chats[chat_id] >= self.chat_daily_budget:
+            return BudgetDecision(BudgetMode.skip, self.model)
+        if not self.daily_budget:
+            return BudgetDecision(BudgetMode.full, self.model)
+        used = self.used / self.daily_budget
+        if used >= 1:
+            return BudgetDecision(BudgetMode.skip, self.model)
+        if used >= self.reduce_at:
+            return BudgetDecision(BudgetMode.reduced, self.reduced_model, self.reduced_context_messages)
+        return BudgetDecision(BudgetMode.full, self.model)
+
+    def record(self, chat_id: str, model: str, usage) -> Usage:
+        """Учитывает `usage` ответа chat completions."""
+        details = getattr(usage, "prompt_tokens_details", None)
+        call = Usage(
+            calls=1,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=(getattr(details, "cached_tokens", None) or 0) if details else 0,
+        )
+        OPENAI_TOKENS_TOTAL.inc(call.prompt_tokens, kind="prompt")
+        OPENAI_TOKENS_TOTAL.inc(call.completion_tokens, kind="completion")
+        OPENAI_TOKENS_TOTAL.inc(call.cached_tokens, kind="cached")
+        self._rollover()
+        self.chats[chat_id] += call.total
+        self.pending.setdefault((self.day, chat_id, model), Usage()).add(call)
+        self._report()
+        return call
+
+    def flush(self):
+        """Ставит накопленный расход в очередь записи хранилища."""
+        pending, self.pending = self.pending, {}
+        if not self.store:
+            return
+        for (day, chat_id, model), usage in pending.items():
+            self.store.add_token_usage(day, self.bot_uuid, chat_id, model, usage.calls, usage.prompt_tokens,
+                                       usage.completion_tokens, usage.cached_tokens)
@@ -1,10 +1,17 @@
-from aiogram import Bot
-from aiogram.types import InlineKeyboardButton
-from aiogram.utils.formatting import Bold, Code, TextLink, as_line
-from aiogram.utils.keyboard import InlineKeyboardBuilder
+from typing import TYPE_CHECKING
+
+from app.core.metrics import observe_stage
+from app.core.tracing import traced
+
+# aiogram импортируется долго (секунды), поэтому грузим его при первом использовании, а не при старте API
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 
 def new_assist_text(last_user_message: str, ai_assistant_content: str | None = None,  chat_url: str | None = None) -> str:
+    from aiogram.utils.formatting import Bold, Code, TextLink, as_line
+
     text = '<tg-emoji emoji-id="5318861974375767587">🔥</tg-emoji> '
     text += as_line(
         Bold(TextLink("Новый чат", url=chat_url)),
@@ -29,6 +36,9 @@ def new_assist_text(last_user_message: str, ai_assistant_content: str | None = N
 
 
 def new_assist_builder(chat_url: str, ad_url: str | None = None) -> InlineKeyboardBuilder:
+    from aiogram.types import InlineKeyboardButton
+    from aiogram.utils.keyboard import InlineKeyboardBuilder
+
     builder = InlineKeyboardBuilder()
     row = builder.row()
     row.add(InlineKeyboardButton(text="Чат", url=chat_url, style="success", icon_custom_emoji_id="5397735522598659551"))
@@ -43,6 +53,8 @@ class TGNotificator:
         self.bot = bot
         self.chat_id = -1003657683249
 
+    @traced("telegram.new_assist")
+    @observe_stage("new_assist")
     async def new_assist(self, chat_url: str, ad_url: str | None = None,
                          last_message_content: str | None = None, ai_assistant_content: str | None = None):
         text = new_assist_text(
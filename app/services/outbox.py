@@ -0,0 +1,102 @@
+import time
+from dataclasses import dataclass, field
+
+from app.core.metrics import OUTBOX_DEPTH, OUTBOX_OLDEST_SECONDS, OUTBOX_TOTAL
+from app.models.avito import Chat
+from app.services.store import LocalStore
+
+
+@dataclass
+class OutboxEntry:
+    chat_id: str
+    in_reply_to: str  # id входящего сообщения, на которое сгенерирован ответ
+    text: str
+    first_time: bool
+    created_at: float = field(default_factory=time.time)
+    attempts: int = 0
+    next_attempt: float = 0.0
+
+
+class Outbox:
+    """
+    Сгенерированные, но еще не доставленные ответы: на чат не больше одного.
+
+    Ответ записывается до отправки и удаляется только после успешной. При ошибке отправки следующая
+    попытка — через `backoff * 2^(попытки - 1)` секунд, после `max_attempts` попыток или `max_age`
+    секунд ответ выбрасывается. Если покупатель успел написать снова (или чат уже не ждет ответа),
+    ответ устарел и тоже выбрасывается — на новое сообщение будет сгенерирован новый.
+    """
+
+    def __init__(self, store: LocalStore | None = None, max_attempts: int = 5, backoff: float = 30.0,
+                 max_age: float = 3600.0):
+        self.store = store
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_age = max_age
+        self.entries: dict[str, OutboxEntry] = {}
+
+    async def restore(self):
+        if self.store:
+            self.entries = {row["chat_id"]: OutboxEntry(**row) for row in await self.store.load_outbox()}
+        self.observe()
+
+    def _save(self, entry: OutboxEntry):
+        if self.store:
+            self.store.save_outbox(
+                entry.chat_id, entry.in_reply_to, entry.text, entry.first_time, entry.created_at, entry.attempts,
+                entry.next_attempt
+            )
+
+    def _drop(self, entry: OutboxEntry, outcome: str):
+        self.entries.pop(entry.chat_id, None)
+        if self.store:
+            self.store.delete_outbox(entry.chat_id)
+        OUTBOX_TOTAL.inc(outcome=outcome)
+
+    def put(self, chat: Chat, text: str, first_time: bool) -> OutboxEntry:
+        entry = OutboxEntry(chat.id, chat.last_message.id, text, first_time)
+        self.entries[chat.id] = entry
+        self._save(entry)
+        OUTBOX_TOTAL.inc(outcome="queued")
+        return entry
+
+    def pending(self, chat: Chat) -> OutboxEntry | None:
+        """Недоставленный ответ на текущее последнее сообщение чата; устаревший выбрасывается."""
+        entry = self.entries.get(chat.id)
+        if entry is not None and entry.in_reply_to != chat.last_message.id:
+            self._drop(entry, "stale")
+            return None
+        return entry
+
+    def due(self, entry: OutboxEntry, now: float | None = None) -> bool:
+        return (time.time() if now is None else now) >= entry.next_attempt
+
+    def sent(self, entry: OutboxEntry):
+        self._drop(entry, "sent")
+
+    def failed(self, entry: OutboxEntry, now: float | None = None):
+        now = time.time() if now is None else now
+        entry.attempts += 1
+        if entry.attempts >= self.max_attempts or now - entry.created_at > self.max_age:
+            self._drop(entry, "expired")
+            return
+        entry.next_attempt = now + self.backoff * 2 ** (entry.attempts - 1)
+        self._save(entry)
+        OUTBOX_TOTAL.inc(outcome="retried")
+
+    def prune(self, unanswered: dict[str, Chat], now: float | None = None):
+        """Выбрасывает ответы для чатов, которые уже не ждут ответа, покупатель написал снова или ответ слишком стар."""
+        now = time.time() if now is None else now
+        for entry in list(self.entries.values()):
+            chat = unanswered.get(entry.chat_id)
+            if chat is None or chat.last_message.id != entry.in_reply_to:
+                self._drop(entry, "stale")
+            elif now - entry.created_at > self.max_age:
+                self._drop(entry, "expired")
+        self.observe(now)
+
+    def observe(self, now: float | None = None):
+        now = time.time() if now is None else now
+        OUTBOX_DEPTH.set(len(self.entries))
+        oldest = min((entry.created_at for entry in self.entries.values()), default=None)
+        OUTBOX_OLDEST_SECONDS.set(round(now - oldest, 3) if oldest is not None else 0)
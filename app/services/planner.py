@@ -0,0 +1,62 @@
+import enum
+from dataclasses import dataclass, field
+from typing import Callable
+
+from app.core.metrics import PLANNER_AVOIDED_CALLS_TOTAL
+from app.models.avito import Chat, Message
+
+
+class AssistState(enum.StrEnum):
+    """Что известно о чате по кешу без запроса истории."""
+    assisted = "assisted"  # AI уже отвечал
+    first_time = "first_time"  # ответов еще не было, ответ потратит квоту
+    not_required = "not_required"  # отвечал менеджер, AI в чат не вмешивается
+
+
+@dataclass
+class TickPlan:
+    enrich: list[Chat] = field(default_factory=list)  # чаты, по которым на этом тике будет действие
+    postponed: list[Chat] = field(default_factory=list)  # первичные чаты сверх квоты — не обогащаем
+    not_required: list[Chat] = field(default_factory=list)  # чаты менеджера — не обогащаем и не ждем ответа
+    avoided_calls: int = 0
+
+
+class TickPlanner:
+    """
+    Планирует тик до обогащения: дорогой `get_chat_messages` делается только для чатов,
+    на которые квота позволит ответить.
+
+    Уже ассистированные чаты квоту не тратят и обогащаются всегда, чаты, где по кешу уже ответил
+    менеджер, не обогащаются вовсе. Первичные и еще неизвестные чаты обогащаются в пределах
+    `remain + lookahead`: запас покрывает чаты, которые после обогащения окажутся не требующими ответа.
+    """
+
+    def __init__(self, lookahead: int = 5):
+        self.lookahead = lookahead
+
+    def plan(
+            self,
+            chats: list[Chat],
+            remain: int,
+            assisted: Callable[[Chat], AssistState | None],
+            cached: Callable[[str], list[Message] | None],
+    ) -> TickPlan:
+        plan = TickPlan()
+        budget = max(remain, 0) + self.lookahead
+        for chat in chats:
+            state = assisted(chat)
+            if state is AssistState.not_required:
+                plan.not_required.append(chat)
+            elif state is AssistState.assisted:
+                plan.enrich.append(chat)
+            elif budget > 0:
+                plan.enrich.append(chat)
+                budget -= 1
+            else:
+                plan.postponed.append(chat)
+                history = cached(chat.id)
+                # актуальная история взялась бы из кеша без запроса
+                if not history or history[0].id != chat.last_message.id:
+                    plan.avoided_calls += 1
+        PLANNER_AVOIDED_CALLS_TOTAL.inc(plan.avoided_calls, call="get_chat_messages")
+        return plan
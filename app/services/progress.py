@@ -0,0 +1,34 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+class TickProgress:
+    """
+    События тика (начало, этапы, чаты, окончание) для подписчиков, например SSE-потока ручного тика.
+    Без подписчиков `emit` ничего не делает; медленный подписчик теряет события, но не тормозит тик.
+    """
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self._subscribers: set[asyncio.Queue[tuple[str, dict[str, Any]]]] = set()
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Queue[tuple[str, dict[str, Any]]]]:
+        events: asyncio.Queue[tuple[str, dict[str, Any]]] = asyncio.Queue(self.maxsize)
+        self._subscribers.add(events)
+        try:
+            yield events
+        finally:
+            self._subscribers.discard(events)
+
+    def emit(self, event: str, **data: Any):
+        if not self._subscribers:
+            return
+        data["at"] = time.time()
+        for events in self._subscribers:
+            try:
+                events.put_nowait((event, data))
+            except asyncio.QueueFull:
+                pass
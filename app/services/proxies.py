@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from typing import Collection
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.metrics import PROXY_HEALTHY, PROXY_LATENCY, PROXY_REQUESTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# ошибки, при которых запрос не дошел до апстрима и его можно повторить через другой прокси
+PROXY_ERRORS = (httpx.ProxyError, httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class Proxy:
+    __slots__ = ("url", "name", "healthy", "latency", "failures", "ejections", "ejected_until", "requests", "errors",
+                 "in_flight")
+
+    def __init__(self, url: str, latency: float = 1.0):
+        self.url = url
+        parts = urlsplit(url)
+        # в метках и статистике без логина и пароля
+        self.name = f"{parts.hostname}:{parts.port}"
+        self.healthy = True
+        self.latency = latency  # EWMA, сек
+        self.failures = 0  # подряд
+        self.ejections = 0  # подряд, для экспоненциальной паузы
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "proxy": self.name,
+            "healthy": self.healthy,
+            "latency_ms": round(self.latency * 1000, 1),
+            "failures": self.failures,
+            "ejected_for": round(max(0.0, self.ejected_until - time.monotonic()), 1),
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+        }
+
+
+class ProxyPool:
+    """
+    Пул исходящих прокси для OpenAI и Telegram.
+
+    Прокси выбирается случайно с весом, обратным задержке (EWMA) с учетом запросов в полете.
+    Для `key` (например, хоста Telegram) выбор липкий: rendezvous-хеш среди живых прокси,
+    так что при выпадении одного прокси переезжают только его ключи.
+    После `eject_after` ошибок подряд прокси исключается на `eject_for` секунд (с удвоением при повторах)
+    и возвращается после успешной активной проверки или первого успешного запроса через него.
+    Единственный прокси не проверяется: все запросы и так идут через него.
+    """
+
+    def __init__(self, urls: Collection[str], check_url: str = "https://api.openai.com/v1/models",
+                 check_interval: float = 15.0, check_timeout: float = 5.0, eject_after: int = 3,
+                 eject_for: float = 30.0, alpha: float = 0.3):
+        if not urls:
+            raise ValueError("ProxyPool requires at least one proxy")
+        self.proxies = [Proxy(url) for url in dict.fromkeys(urls)]
+        self.check_url = check_url
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.eject_after = eject_after
+        self.eject_for = eject_for
+        self.alpha = alpha
+        self._checker: asyncio.Task | None = None
+        for proxy in self.proxies:
+            PROXY_HEALTHY.set(1, proxy=proxy.name)
+
+    # --- выбор ----------------------------------------------------------------------------------
+
+    def _available(self) -> list[Proxy]:
+        healthy = [proxy for proxy in self.proxies if proxy.healthy]
+        # все исключены — лучше попробовать наименее плохой, чем отказать
+        return healthy or [min(self.proxies, key=lambda proxy: proxy.ejected_until)]
+
+    @staticmethod
+    def _score(key: str, proxy: Proxy) -> bytes:
+        return hashlib.blake2b(f"{key}|{proxy.url}".encode(), digest_size=8).digest()
+
+    def choose(self, key: str | None = None, exclude: Collection[Proxy] = ()) -> Proxy:
+        candidates = [proxy for proxy in self._available() if proxy not in exclude] or self._available()
+        if key is not None:
+            return max(candidates, key=lambda proxy: self._score(key, proxy))
+        weights = [1.0 / (proxy.latency * (1 + proxy.in_flight)) for proxy in candidates]
+        return random.choices(candidates, weights)[0]
+
+    # --- учет -----------------------------------------------------------------------------------
+
+    def observe(self, proxy: Proxy, seconds: float, ok: bool):
+        proxy.requests += 1
+        PROXY_REQUESTS_TOTAL.inc(proxy=proxy.name, outcome="ok" if ok else "error")
+        if ok:
+            proxy.latency += self.alpha * (seconds - proxy.latency)
+            proxy.failures = 0
+            PROXY_LATENCY.set(round(proxy.latency, 4), proxy=proxy.name)
+            if not proxy.healthy:
+                # запрос через исключенный прокси (все исключены или он единственный) прошел — прокси жив
+                self.readmit(proxy)
+            return
+        proxy.errors += 1
+        proxy.failures += 1
+        if proxy.healthy and proxy.failures >= self.eject_after:
+            self.eject(proxy)
+
+    def eject(self, proxy: Proxy):
+        proxy.healthy = False
+        proxy.ejected_until = time.monotonic() + self.eject_for * 2 ** min(proxy.ejections, 5)
+        proxy.ejections += 1
+        PROXY_HEALTHY.set(0, proxy=proxy.name)
+        logger.warning("proxy ejected", extra={"proxy": proxy.name, "failures": proxy.failures})
+
+    def readmit(self, proxy: Proxy):
+        proxy.healthy = True
+        proxy.failures = 0
+        proxy.ejections = 0
+        PROXY_HEALTHY.set(1, proxy=proxy.name)
+        logger.info("proxy readmitted", extra={"proxy": proxy.name})
+
+    # --- активные проверки ----------------------------------------------------------------------
+
+    async def check(self, proxy: Proxy) -> tuple[bool, float]:
+        """Любой HTTP-ответ апстрима означает, что прокси работает; ошибки соединения и 407 — нет."""
+        started = time.perf_counter()
+        try:
+            async with httpx.AsyncClient(proxy=proxy.url, timeout=self.check_timeout) as client:
+                response = await client.head(self.check_url)
+            ok = response.status_code != 407
+        except httpx.HTTPError:
+            ok = False
+        return ok, time.perf_counter() - started
+
+    async def check_all(self):
+        now = time.monotonic()
+        # исключенный прокси проверяем только после паузы
+        due = [proxy for proxy in self.proxies if proxy.healthy or proxy.ejected_until <= now]
+        results = await asyncio.gather(*(self.check(proxy) for proxy in due))
+        for proxy, (ok, seconds) in zip(due, results):
+            if ok and not proxy.healthy:
+                self.readmit(proxy)
+            self.observe(proxy, seconds, ok)
+
+    async def _check_loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check_all()
+            except Exception:
+                logger.exception("proxy health check failed")
+
+    def start(self):
+        if self._checker is None and len(self.proxies) > 1:
+            self._checker = asyncio.create_task(self._check_loop())
+
+    async def close(self):
+        if self._checker:
+            self._checker.cancel()
+            await asyncio.gather(self._checker, return_exceptions=True)
+            self._checker = None
+
+    def as_dict(self) -> list[dict]:
+        return [proxy.as_dict() for proxy in self.proxies]
+
+
+class ProxyPoolTransport(httpx.AsyncBaseTransport):
+    """
+    Транспорт httpx поверх пула: на каждый прокси свой пул соединений, запрос уходит через выбранный прокси.
+    Если прокси не смог соединиться, запрос повторяется через другой (до апстрима он не дошел).
+    """
+
+    def __init__(self, pool: ProxyPool, sticky_hosts: Collection[str] = (), retries: int = 1, **transport_kwargs):
+        self.pool = pool
+        self.sticky_hosts = set(sticky_hosts)
+        self.retries = retries
+        self._transports = {
+            proxy.url: httpx.AsyncHTTPTransport(proxy=proxy.url, **transport_kwargs) for proxy in pool.proxies
+        }
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request.url.host if request.url.host in self.sticky_hosts else None
+        tried: list[Proxy] = []
+        while True:
+            proxy = self.pool.choose(key, exclude=tried)
+            tried.append(proxy)
+            proxy.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await self._transports[proxy.url].handle_async_request(request)
+            except PROXY_ERRORS:
+                self.pool.observe(proxy, time.perf_counter() - started, ok=False)
+                if len(tried) > self.retries:
+                    raise
+                continue
+            finally:
+                proxy.in_flight -= 1
+            # время до заголовков: стриминг тела на задержку прокси не влияет
+            self.pool.observe(proxy, time.perf_counter() - started, ok=response.status_code != 407)
+            return response
+
+    async def aclose(self):
+        for transport in self._transports.values():
+            await transport.aclose()
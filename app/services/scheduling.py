@@ -0,0 +1,63 @@
+import heapq
+import time
+from dataclasses import dataclass, field
+
+from cachetools import LRUCache
+
+from app.core.metrics import CHATS_LATE_TOTAL, CHATS_TOTAL
+from app.models.avito import Chat
+
+
+@dataclass
+class SchedulePlan:
+    ordered: list[Chat] = field(default_factory=list)  # к обработке на этом тике, от ранних дедлайнов к поздним
+    deferred: list[Chat] = field(default_factory=list)  # не влезли в тик, останутся в очереди
+    shed: list[Chat] = field(default_factory=list)  # пропущены на этом тике: устарели при перегрузке
+
+
+class DeadlineScheduler:
+    """
+    Планирование неотвеченных чатов по ближайшему дедлайну (EDF).
+
+    Дедлайн ответа — `last_message.created + sla`. За тик обрабатывается не больше `capacity` чатов;
+    если очередь больше, пропускается не больше лишних `len(chats) - capacity` чатов, ждущих дольше
+    `stale_after` секунд, от самых давних. Пропущенные чаты остаются в очереди и обрабатываются, когда
+    нагрузка спадет или покупатель напишет снова.
+    """
+
+    def __init__(self, sla: float = 300.0, stale_after: float = 86_400.0, capacity: int | None = None,
+                 maxsize: int = 10_000):
+        self.sla = sla
+        self.stale_after = stale_after
+        self.capacity = capacity
+        # chat_id -> id последнего сообщения на момент пропуска: метрика считает каждый пропуск один раз
+        self.shed: LRUCache[str, str] = LRUCache(maxsize=maxsize)
+
+    def deadline(self, chat: Chat) -> float:
+        return chat.last_message.created + self.sla
+
+    def plan(self, chats: list[Chat], now: float | None = None) -> SchedulePlan:
+        now = time.time() if now is None else now
+        plan = SchedulePlan()
+        queue = [(self.deadline(chat), i, chat) for i, chat in enumerate(chats)]
+        heapq.heapify(queue)
+        excess = 0 if self.capacity is None else len(queue) - self.capacity
+        while queue:
+            _, _, chat = heapq.heappop(queue)
+            if len(plan.shed) < excess and now - chat.last_message.created > self.stale_after:
+                plan.shed.append(chat)
+                if self.shed.get(chat.id) != chat.last_message.id:
+                    self.shed[chat.id] = chat.last_message.id
+                    CHATS_TOTAL.inc(status="shed")
+            elif self.capacity is None or len(plan.ordered) < self.capacity:
+                plan.ordered.append(chat)
+            else:
+                plan.deferred.append(chat)
+        CHATS_TOTAL.inc(len(plan.deferred), status="deferred")
+        return plan
+
+    def answered(self, chat: Chat, now: float | None = None):
+        now = time.time() if now is None else now
+        self.shed.pop(chat.id, None)
+        if now > self.deadline(chat):
+            CHATS_LATE_TOTAL.inc()
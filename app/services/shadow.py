@@ -0,0 +1,51 @@
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+
+class ShadowLog:
+    """
+    Журнал теневого режима: одна JSON-строка на каждый несостоявшийся ответ и на каждый тик.
+    Запись идет в отдельном потоке, чтобы не блокировать event loop.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._pending: set[asyncio.Future] = set()
+
+    def _write(self, line: str):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def write(self, kind: str, **fields: Any):
+        line = json.dumps({"kind": kind, "at": time.time(), **fields}, ensure_ascii=False)
+        future = asyncio.get_running_loop().run_in_executor(None, self._write, line)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    async def flush(self):
+        """Дожидается записи уже поставленных строк."""
+        await asyncio.gather(*self._pending)
+
+    def reply(self, chat_id: str, in_reply_to: str, first_time: bool, answer: str, model: str, budget: str,
+              tokens: int, gen_seconds: float):
+        self.write(
+            "reply",
+            chat_id=chat_id,
+            in_reply_to=in_reply_to,
+            first_time=first_time,
+            answer=answer,
+            model=model,
+            budget=budget,
+            tokens=tokens,
+            gen_seconds=round(gen_seconds, 4),
+        )
+
+    def tick(self, stages: dict[str, float], **counts: int):
+        self.write("tick", stages={stage: round(seconds, 4) for stage, seconds in stages.items()}, **counts)
@@ -0,0 +1,321 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+from app.core.metrics import STORE_DROPPED_WRITES_TOTAL
+from app.models.avito import Chat, Message
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    id TEXT PRIMARY KEY,
+    updated INTEGER NOT NULL,
+    last_message_id TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chats_updated ON chats (updated);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    direction TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_chat_created ON messages (chat_id, created);
+
+CREATE TABLE IF NOT EXISTS replies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL,
+    in_reply_to TEXT NOT NULL,
+    message_id TEXT,
+    text TEXT NOT NULL,
+    first_time INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS replies_chat ON replies (chat_id, id);
+
+CREATE TABLE IF NOT EXISTS token_usage (
+    day TEXT NOT NULL,
+    bot_uuid TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    PRIMARY KEY (day, bot_uuid, chat_id, model)
+);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    chat_id TEXT PRIMARY KEY,
+    in_reply_to TEXT NOT NULL,
+    text TEXT NOT NULL,
+    first_time INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    next_attempt REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS watermarks (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class LocalStore:
+    """
+    Локальное состояние в SQLite (WAL): чаты, сообщения, отправленные и ожидающие отправки ответы,
+    расход токенов и водяные знаки синхронизации.
+
+    Запись не блокирует event loop: операции копятся в очереди и пишутся пачками одной транзакцией
+    в отдельном потоке. Чтение выполняется в том же потоке, поэтому видит все уже сброшенные записи.
+    """
+
+    def __init__(self, path: str | Path, flush_interval: float = 0.5, batch_size: int = 500):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-store")
+        self._connection: sqlite3.Connection | None = None
+        self._queue: asyncio.Queue[tuple[str, tuple] | None] = asyncio.Queue()
+        self._writer: asyncio.Task | None = None
+        self._flushed = asyncio.Event()
+        self._flushed.set()
+
+    async def _run[T](self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        self._connection = connection
+
+    async def open(self):
+        await self._run(self._connect)
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        if self._writer:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        if self._connection:
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=True)
+
+    # --- запись -------------------------------------------------------------------------------
+
+    def _enqueue(self, sql: str, params: tuple):
+        self._flushed.clear()
+        self._queue.put_nowait((sql, params))
+
+    def save_chat(self, chat: Chat):
+        self._enqueue(
+            "INSERT INTO chats (id, updated, last_message_id, payload) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET updated = excluded.updated, "
+            "last_message_id = excluded.last_message_id, payload = excluded.payload",
+            (chat.id, chat.updated, chat.last_message.id,
+             chat.model_dump_json(by_alias=True, exclude={"messages"})),
+        )
+
+    def save_messages(self, chat_id: str, messages: list[Message]):
+        for message in messages:
+            # без REPLACE: повторно сохраненное сообщение сохраняет rowid, и выгрузка его не дублирует
+            self._enqueue(
+                "INSERT INTO messages (id, chat_id, created, direction, payload) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET chat_id = excluded.chat_id, created = excluded.created, "
+                "direction = excluded.direction, payload = excluded.payload WHERE payload <> excluded.payload",
+                (message.id, chat_id, message.created, message.direction, message.model_dump_json(by_alias=True)),
+            )
+
+    def record_reply(self, chat_id: str, in_reply_to: str, text: str, first_time: bool, message_id: str | None = None):
+        self._enqueue(
+            "INSERT INTO replies (chat_id, in_reply_to, message_id, text, first_time, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (chat_id, in_reply_to, message_id, text, int(first_time), time.time()),
+        )
+
+    def save_outbox(self, chat_id: str, in_reply_to: str, text: str, first_time: bool, created_at: float,
+                    attempts: int, next_attempt: float):
+        self._enqueue(
+            "INSERT OR REPLACE INTO outbox (chat_id, in_reply_to, text, first_time, created_at, attempts, next_attempt) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (chat_id, in_reply_to, text, int(first_time), created_at, attempts, next_attempt),
+        )
+
+    def delete_outbox(self, chat_id: str):
+        self._enqueue("DELETE FROM outbox WHERE chat_id = ?", (chat_id,))
+
+    def add_token_usage(self, day: str, bot_uuid: str, chat_id: str, model: str, calls: int, prompt_tokens: int,
+                        completion_tokens: int, cached_tokens: int):
+        self._enqueue(
+            "INSERT INTO token_usage (day, bot_uuid, chat_id, model, calls, prompt_tokens, completion_tokens, "
+            "cached_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(day, bot_uuid, chat_id, model) DO UPDATE SET "
+            "calls = calls + excluded.calls, prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+            "completion_tokens = completion_tokens + excluded.completion_tokens, "
+            "cached_tokens = cached_tokens + excluded.cached_tokens",
+            (day, bot_uuid, chat_id, model, calls, prompt_tokens, completion_tokens, cached_tokens),
+        )
+
+    def set_watermark(self, name: str, value: Any):
+        self._enqueue(
+            "INSERT OR REPLACE INTO watermarks (name, value, updated_at) VALUES (?, ?, ?)",
+            (name, json.dumps(value), time.time()),
+        )
+
+    async def flush(self):
+        """Дожидается записи всего, что уже поставлено в очередь."""
+        if self._writer is None or self._queue.empty() and self._flushed.is_set():
+            return
+        await self._flushed.wait()
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            batch = []
+            deadline = loop.time() + self.flush_interval
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), max(0.0, deadline - loop.time()))
+                except TimeoutError:
+                    break
+            stopping = item is None
+            if batch:
+                try:
+                    dropped = await self._run(self._write_batch, batch)
+                    if dropped:
+                        STORE_DROPPED_WRITES_TOTAL.inc(dropped, scope="statement")
+                except sqlite3.Error:
+                    STORE_DROPPED_WRITES_TOTAL.inc(len(batch), scope="batch")
+                    logger.exception("local store batch failed", extra={"operations": len(batch)})
+            if self._queue.empty():
+                self._flushed.set()
+
+    def _write_batch(self, batch: list[tuple[str, tuple]]) -> int:
+        """
+        Пачка одной транзакцией. Каждая операция — под своей точкой сохранения: ошибочная откатывается
+        одна, остальные записываются. Возвращает число отброшенных операций.
+        """
+        cursor = self._connection.cursor()
+        dropped = 0
+        cursor.execute("BEGIN")
+        try:
+            for sql, params in batch:
+                cursor.execute("SAVEPOINT operation")
+                try:
+                    cursor.execute(sql, params)
+                except sqlite3.Error:
+                    cursor.execute("ROLLBACK TO operation")
+                    dropped += 1
+                    logger.exception("local store write dropped", extra={"sql": sql.split(" (", 1)[0]})
+                cursor.execute("RELEASE operation")
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        return dropped
+
+    # --- чтение -------------------------------------------------------------------------------
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        return self._connection.execute(sql, params).fetchall()
+
+    async def get_watermark(self, name: str, default: Any = None) -> Any:
+        rows = await self._run(self._query, "SELECT value FROM watermarks WHERE name = ?", (name,))
+        return json.loads(rows[0][0]) if rows else default
+
+    async def load_chats(self, limit: int | None = None) -> list[Chat]:
+        rows = await self._run(
+            self._query, "SELECT payload FROM chats ORDER BY updated DESC LIMIT ?", (limit if limit else -1,)
+        )
+        return [Chat.model_validate_json(payload) for payload, in rows]
+
+    async def load_messages(self, chat_id: str) -> list[Message]:
+        """Сообщения чата от новых к старым, как их отдает Avito."""
+        rows = await self._run(
+            self._query, "SELECT payload FROM messages WHERE chat_id = ? ORDER BY created DESC, id DESC", (chat_id,)
+        )
+        return [Message.model_validate_json(payload) for payload, in rows]
+
+    async def recent_histories(self, chats: int) -> dict[str, list[Message]]:
+        """Истории `chats` последних обновленных чатов — для прогрева кеша при старте."""
+
+        def query() -> list[tuple]:
+            return self._query(
+                "SELECT m.chat_id, m.payload FROM messages m "
+                "JOIN (SELECT id FROM chats ORDER BY updated DESC LIMIT ?) c ON c.id = m.chat_id "
+                "ORDER BY m.chat_id, m.created DESC, m.id DESC",
+                (chats,),
+            )
+
+        histories: dict[str, list[Message]] = {}
+        for chat_id, payload in await self._run(query):
+            histories.setdefault(chat_id, []).append(Message.model_validate_json(payload))
+        return histories
+
+    async def token_usage(self, day: str, bot_uuid: str) -> dict[str, int]:
+        """Токены (prompt + completion) за день по каждому чату бота."""
+        rows = await self._run(
+            self._query,
+            "SELECT chat_id, SUM(prompt_tokens + completion_tokens) FROM token_usage "
+            "WHERE day = ? AND bot_uuid = ? GROUP BY chat_id",
+            (day, bot_uuid),
+        )
+        return dict(rows)
+
+    async def load_outbox(self) -> list[dict[str, Any]]:
+        rows = await self._run(
+            self._query,
+            "SELECT chat_id, in_reply_to, text, first_time, created_at, attempts, next_attempt FROM outbox",
+        )
+        return [
+            {"chat_id": chat_id, "in_reply_to": in_reply_to, "text": text, "first_time": bool(first_time),
+             "created_at": created_at, "attempts": attempts, "next_attempt": next_attempt}
+            for chat_id, in_reply_to, text, first_time, created_at, attempts, next_attempt in rows
+        ]
+
+    async def messages_after(self, rowid: int, limit: int) -> list[tuple[int, str, str]]:
+        """
+        Страница сообщений для выгрузки: (rowid, chat_id, payload) в порядке первой записи.
+        Повторное сохранение сообщения rowid не меняет, поэтому продолженная выгрузка отдает
+        каждое сообщение один раз; изменения уже выгруженных сообщений в нее не попадают.
+        """
+        return await self._run(
+            self._query,
+            "SELECT rowid, chat_id, payload FROM messages WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (rowid, limit),
+        )
+
+    async def chats_after(self, updated: int, chat_id: str, limit: int) -> list[tuple[int, str, str]]:
+        """Страница чатов для выгрузки: (updated, id, payload) по возрастанию (updated, id)."""
+        return await self._run(
+            self._query,
+            "SELECT updated, id, payload FROM chats WHERE (updated, id) > (?, ?) ORDER BY updated, id LIMIT ?",
+            (updated, chat_id, limit),
+        )
+
+    async def last_replies(self) -> dict[str, str]:
+        """id входящего сообщения, на которое был последний ответ, по каждому чату."""
+        rows = await self._run(
+            self._query,
+            "SELECT chat_id, in_reply_to FROM replies WHERE id IN (SELECT MAX(id) FROM replies GROUP BY chat_id)",
+        )
+        return dict(rows)
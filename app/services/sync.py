@@ -0,0 +1,144 @@
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from cachetools import LRUCache
+
+from app.core.metrics import SYNC_PAGES_TOTAL
+from app.models.avito import Chat, ChatTypeEnum, Message
+from app.services.store import LocalStore
+
+if TYPE_CHECKING:
+    from app.services.avito import Avito
+
+WATERMARK = "chats_updated"
+
+
+@dataclass
+class SyncDelta:
+    changed: list[Chat] = field(default_factory=list)  # новые или изменившиеся с прошлой синхронизации чаты
+    pages: int = 0
+    full: bool = False
+
+
+class InboxSync:
+    """
+    Инкрементальная синхронизация входящих по водяному знаку `Chat.updated`.
+
+    Avito отдает чаты от недавно обновленных к старым, поэтому страницы `get_chats` читаются только
+    до первого чата старше водяного знака. Раз в `full_sweep_interval` секунд выполняется полный
+    проход, который подбирает пропущенное. Неотвеченные чаты остаются в `pending`, пока на них
+    не ответят или они не изменятся, так что пропущенный по квоте чат не теряется.
+
+    Сообщения из вебхука (`mark`) делают чат «грязным»: инкрементальный проход читает страницы, пока
+    не встретит все такие чаты, и учитывает их с последним сообщением из события, даже если список
+    Avito еще отдает старое.
+    """
+
+    def __init__(
+            self,
+            avito: "Avito",
+            store: LocalStore | None = None,
+            page_size: int = 100,
+            max_pages: int = 20,
+            full_sweep_interval: float = 600,
+            chat_types: list[ChatTypeEnum] | None = None,
+            known_size: int = 10_000,
+    ):
+        self.avito = avito
+        self.store = store
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.full_sweep_interval = full_sweep_interval
+        self.chat_types = chat_types or [ChatTypeEnum.u2i]
+        self.watermark: int | None = None
+        self.last_full_sweep: float | None = None
+        self.known: LRUCache[str, int] = LRUCache(maxsize=known_size)  # chat_id -> updated
+        self.pending: dict[str, Chat] = {}
+        self.dirty: LRUCache[str, Message] = LRUCache(maxsize=known_size)  # chat_id -> сообщение из вебхука
+
+    async def restore(self):
+        if not self.store:
+            return
+        self.watermark = await self.store.get_watermark(WATERMARK)
+        for chat in await self.store.load_chats(self.known.maxsize):
+            self.known[chat.id] = chat.updated
+            self._track(chat)
+
+    def _track(self, chat: Chat):
+        if chat.last_message.direction == "in" and not chat.last_message.is_system:
+            self.pending[chat.id] = chat
+        else:
+            self.pending.pop(chat.id, None)
+
+    def mark(self, chat_id: str, message: Message):
+        """Новое сообщение чата из вебхука: чат будет учтен на следующей синхронизации."""
+        known = self.dirty.get(chat_id)
+        if known is None or message.created >= known.created:
+            self.dirty[chat_id] = message
+
+    def _apply_event(self, chat: Chat) -> Chat:
+        message = self.dirty.pop(chat.id)
+        if message.created < chat.last_message.created or message.id == chat.last_message.id:
+            return chat
+        return chat.model_copy(update={"last_message": message, "updated": max(chat.updated, message.created)})
+
+    def _full_sweep_due(self) -> bool:
+        return (
+                self.watermark is None
+                or self.last_full_sweep is None
+                or time.monotonic() - self.last_full_sweep >= self.full_sweep_interval
+        )
+
+    async def delta(self, full: bool | None = None) -> SyncDelta:
+        full = self._full_sweep_due() if full is None else full
+        result = SyncDelta(full=full)
+        seen: set[str] = set()
+        watermark = self.watermark
+        newest = watermark or 0
+        exhausted = False
+
+        for page in range(self.max_pages):
+            response = await self.avito.chats(chat_types=self.chat_types, limit=self.page_size,
+                                              offset=page * self.page_size)
+            result.pages += 1
+            for chat in response.chats:
+                seen.add(chat.id)
+                newest = max(newest, chat.updated)
+                listed = chat.updated
+                dirty = chat.id in self.dirty
+                if dirty:
+                    chat = self._apply_event(chat)
+                if dirty or self.known.get(chat.id) != listed:
+                    # по updated из списка: отставший список не затрет чат, обновленный событием
+                    self.known[chat.id] = listed
+                    result.changed.append(chat)
+                    self._track(chat)
+            if len(response.chats) < self.page_size:
+                exhausted = True
+                break
+            # Дальше только чаты старше водяного знака — в инкрементальном режиме читать их незачем,
+            # если среди них нет чатов с событиями вебхука
+            if not full and watermark is not None and response.chats[-1].updated < watermark and not self.dirty:
+                break
+
+        if exhausted:
+            # весь список прочитан: события чатов, которых в нем нет, ждать незачем
+            for chat_id in [chat_id for chat_id in self.dirty if chat_id not in seen]:
+                del self.dirty[chat_id]
+        if full and exhausted:
+            # Полный проход увидел все чаты: исчезнувшие из списка больше не ждут ответа
+            for chat_id in list(self.pending):
+                if chat_id not in seen:
+                    del self.pending[chat_id]
+
+        SYNC_PAGES_TOTAL.inc(result.pages, mode="full" if full else "incremental")
+        if full:
+            self.last_full_sweep = time.monotonic()
+        self.watermark = newest or self.watermark
+        if self.store:
+            for chat in result.changed:
+                self.store.save_chat(chat)
+            if self.watermark is not None:
+                self.store.set_watermark(WATERMARK, self.watermark)
+        return result
@@ -0,0 +1,41 @@
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from app.services.proxies import ProxyPool
+
+TELEGRAM_HOST = "api.telegram.org"
+
+
+class PooledAiohttpSession(AiohttpSession):
+    """
+    Сессия aiogram поверх `ProxyPool`. Прокси липкий по хосту Telegram, чтобы не терять keep-alive,
+    и меняется (с пересозданием коннектора), только когда пул его исключил.
+    """
+
+    def __init__(self, pool: ProxyPool, **kwargs):
+        self.pool = pool
+        self.current = pool.choose(TELEGRAM_HOST)
+        super().__init__(proxy=self.current.url, **kwargs)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None
+                           ) -> TelegramType:
+        proxy = self.pool.choose(TELEGRAM_HOST)
+        if proxy is not self.current:
+            self.current = proxy
+            self.proxy = proxy.url
+        proxy.in_flight += 1
+        started = time.perf_counter()
+        try:
+            result = await super().make_request(bot, method, timeout)
+        except TelegramNetworkError:
+            self.pool.observe(proxy, time.perf_counter() - started, ok=False)
+            raise
+        finally:
+            proxy.in_flight -= 1
+        self.pool.observe(proxy, time.perf_counter() - started, ok=True)
+        return result
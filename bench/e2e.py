@@ -0,0 +1,146 @@
+"""
+Сквозной бенчмарк тика `AvitoBL.meta` на локальных заглушках сервисов.
+
+    python -m bench.e2e --sizes 10 100 1000 --latency 0.05 --output bench_output.json
+
+Результат — JSON, который можно сравнивать между версиями: длительность тика, вызовы
+по этапам, пиковая память и ответов в секунду для каждого размера входящих.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.prompts.read import PromptEditor
+from app.services.avito import Avito, AvitoBL
+from app.services.limits import LimitsService, LimitsUOW
+from app.services.notify import TGNotificator
+from app.services.store import LocalStore
+from bench.fakes import BOT_UUID, FakeAvito, FakeConfig, FakeEnvironment, FakeLimits, FakeOpenAI, FakeTelegram
+from bench.report import environment_info, write_report
+
+
+async def build_avito_bl(env: FakeEnvironment, store: LocalStore | None = None) -> AvitoBL:
+    """Собирает `AvitoBL` так же, как `ServiceProvider`, но поверх заглушек."""
+    avito = Avito("fake-client-id", "fake-client-secret")
+    await avito.httpx_client.aclose()
+    avito.httpx_client = httpx.AsyncClient(base_url="https://api.avito.ru", transport=env.avito.transport())
+    await avito.get_user_data()
+
+    openai = AsyncOpenAI(
+        api_key="fake",
+        base_url="https://openai.local/v1",
+        http_client=httpx.AsyncClient(transport=env.openai.transport()),
+        max_retries=0,
+    )
+
+    limits = LimitsService(base_url="http://limits.local")
+    await limits.http_client.aclose()
+    limits.http_client = httpx.AsyncClient(base_url="http://limits.local", transport=env.limits.transport())
+
+    avito_bl = AvitoBL(
+        avito=avito,
+        openai=openai,
+        editor=PromptEditor(),
+        limits_service=LimitsUOW(BOT_UUID, limits),
+        tg_notificator=TGNotificator(env.telegram.bot()),
+        store=store,
+    )
+    await avito_bl.restore_state()
+    return avito_bl
+
+
+def make_env(size: int, args: argparse.Namespace, seed: int) -> FakeEnvironment:
+    config = FakeConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    return FakeEnvironment(
+        avito=FakeAvito(inbox_size=size, history=args.history, answered=args.answered,
+                        assisted_ratio=args.assisted_ratio, config=config, seed=seed),
+        openai=FakeOpenAI(FakeConfig(latency=args.llm_latency, jitter=args.jitter, error_rate=args.error_rate),
+                          seed=seed),
+        limits=FakeLimits(limit=args.quota, config=config, seed=seed),
+        telegram=FakeTelegram(config, seed=seed),
+    )
+
+
+async def run_tick(size: int, args: argparse.Namespace, seed: int, trace_memory: bool) -> dict:
+    env = make_env(size, args, seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        bl = await build_avito_bl(env)
+    before = env.calls()
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await bl.meta()
+    duration = time.perf_counter() - started
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    calls = {stage: count - before.get(stage, 0) for stage, count in env.calls().items()
+             if count - before.get(stage, 0)}
+    replies = env.avito.calls["send_message"] - env.avito.errors["send_message"]
+    return {
+        "tick_seconds": duration,
+        "calls": calls,
+        "errors": env.errors(),
+        "replies": replies,
+        "replies_per_second": replies / duration if duration else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results = []
+    for size in args.sizes:
+        runs = [await run_tick(size, args, seed=args.seed + i, trace_memory=False) for i in range(args.repeat)]
+        # tracemalloc заметно замедляет код, поэтому память меряется отдельным прогоном
+        memory = await run_tick(size, args, seed=args.seed, trace_memory=True)
+        durations = [r["tick_seconds"] for r in runs]
+        median = statistics.median(durations)
+        results.append({
+            "unanswered_chats": size,
+            "tick_seconds_median": median,
+            "tick_seconds_min": min(durations),
+            "tick_seconds_max": max(durations),
+            "calls": runs[0]["calls"],
+            "errors": runs[0]["errors"],
+            "replies": runs[0]["replies"],
+            "replies_per_second": runs[0]["replies"] / median if median else None,
+            "peak_memory_bytes": memory["peak_memory_bytes"],
+        })
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    return {"meta": environment_info("e2e", config), "results": results}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="неотвеченных чатов во входящих")
+    parser.add_argument("--history", type=int, default=6, help="сообщений в каждом чате")
+    parser.add_argument("--assisted-ratio", type=float, default=0.5, help="доля чатов, где AI уже отвечал")
+    parser.add_argument("--answered", type=int, default=0, help="дополнительных уже отвеченных чатов")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка Avito/лимитов/Telegram, сек")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="задержка OpenAI, сек")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, сек")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--quota", type=int, default=1_000_000, help="лимит бота")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов на каждый размер")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="файл для JSON (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    write_report(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
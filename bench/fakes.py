@@ -0,0 +1,271 @@
+"""
+Локальные in-process заглушки внешних сервисов: мессенджер Avito, OpenAI-совместимый
+chat completions, сервис лимитов и Telegram Bot API.
+
+HTTP-сервисы реализованы как `httpx.MockTransport`, поэтому клиенты приложения работают
+без изменений — подменяется только транспорт. Telegram подключается через сессию aiogram.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import httpx
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+
+from bench import payloads
+from bench.payloads import COMPANY_ID
+
+BOT_UUID = "00000000-0000-0000-0000-000000000001"
+
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.0  # базовая задержка ответа, сек
+    jitter: float = 0.0  # равномерный разброс задержки, сек
+    error_rate: float = 0.0  # доля ответов 500
+
+
+class FakeService:
+    def __init__(self, config: FakeConfig | None = None, seed: int = 0):
+        self.config = config or FakeConfig()
+        self.random = random.Random(seed)
+        self.calls: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+
+    async def _delay(self):
+        delay = self.config.latency + (self.random.uniform(0, self.config.jitter) if self.config.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _failed(self, stage: str) -> bool:
+        if self.config.error_rate and self.random.random() < self.config.error_rate:
+            self.errors[stage] += 1
+            return True
+        return False
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        stage, handler, params = self.route(request)
+        if handler is None:
+            return httpx.Response(404, json={"code": 404, "message": "not found"})
+        self.calls[stage] += 1
+        await self._delay()
+        if self._failed(stage):
+            return httpx.Response(500, json={"code": 500, "message": "fake failure"})
+        return handler(request, **params)
+
+    def route(self, request: httpx.Request):
+        raise NotImplementedError
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+
+class FakeAvito(FakeService):
+    """
+    Мессенджер Avito с `inbox_size` неотвеченными чатами по `history` сообщений в каждом.
+    Доля `assisted_ratio` неотвеченных чатов уже содержит ответы AI, остальные — только вопросы покупателя.
+    """
+
+    def __init__(self, inbox_size: int = 10, history: int = 6, answered: int = 0, assisted_ratio: float = 0.5,
+                 config: FakeConfig | None = None, seed: int = 0):
+        super().__init__(config, seed)
+        self.chats: dict[str, dict] = {}
+        self.messages: dict[str, list[dict]] = {}
+        self._now = int(time.time())
+        assisted = round(inbox_size * assisted_ratio)
+        for i in range(inbox_size + answered):
+            self._add_chat(i, history, unanswered=i < inbox_size, assisted=i < assisted or i >= inbox_size)
+        self._routes = [
+            ("POST", re.compile(r"^/token/$"), "update_auth", self._token),
+            ("GET", re.compile(r"^/core/v1/accounts/self$"), "get_user_data", self._self),
+            ("GET", re.compile(r"^/messenger/v2/accounts/(?P<user_id>\d+)/chats$"), "get_chats", self._chats),
+            ("GET", re.compile(r"^/messenger/v3/accounts/(?P<user_id>\d+)/chats/(?P<chat_id>[^/]+)/messages/$"),
+             "get_chat_messages", self._chat_messages),
+            ("POST", re.compile(r"^/messenger/v1/accounts/(?P<user_id>\d+)/chats/(?P<chat_id>[^/]+)/messages$"),
+             "send_message", self._send_message),
+        ]
+
+    def _add_chat(self, i: int, history: int, unanswered: bool, assisted: bool):
+        chat_id = f"u2i-fake{i}"
+        created = self._now - 3600 - i * 60
+        self.messages[chat_id] = payloads.history(chat_id, history, created, unanswered=unanswered, assisted=assisted)
+        self.chats[chat_id] = payloads.chat(i, self.messages[chat_id][0], created)
+
+    def route(self, request: httpx.Request):
+        for method, pattern, stage, handler in self._routes:
+            match = pattern.match(request.url.path)
+            if request.method == method and match:
+                return stage, handler, match.groupdict()
+        return None, None, {}
+
+    def _token(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"access_token": "fake-token", "expires_in": 86400})
+
+    def _self(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={
+            "email": "shop@example.com", "id": COMPANY_ID, "name": "М-мебель", "phone": "70000000000",
+            "phones": ["70000000000"], "profile_url": f"https://www.avito.ru/user/{COMPANY_ID}",
+        })
+
+    def _chats(self, request: httpx.Request, user_id: str) -> httpx.Response:
+        limit = int(request.url.params.get("limit", 100))
+        offset = int(request.url.params.get("offset", 0))
+        ordered = sorted(self.chats.values(), key=lambda chat: chat["updated"], reverse=True)
+        return httpx.Response(200, json={"chats": ordered[offset:offset + limit]})
+
+    def _chat_messages(self, request: httpx.Request, user_id: str, chat_id: str) -> httpx.Response:
+        if chat_id not in self.messages:
+            return httpx.Response(200, json={"code": 404, "message": "chat not found"})
+        messages = self.messages[chat_id]
+        limit = int(request.url.params.get("limit", 100))
+        offset = int(request.url.params.get("offset", 0))
+        return httpx.Response(200, json={"messages": messages[offset:offset + limit], "meta": {}})
+
+    def _send_message(self, request: httpx.Request, user_id: str, chat_id: str) -> httpx.Response:
+        payload = json.loads(request.content)
+        chat = self.chats[chat_id]
+        n = len(self.messages[chat_id])
+        message = payloads.message(chat_id, n, "out", max(int(time.time()), chat["updated"] + 1),
+                                   text=payload["message"]["text"])
+        self.messages[chat_id].insert(0, message)
+        chat["last_message"] = message
+        chat["updated"] = message["created"]
+        return httpx.Response(200, json=message)
+
+    def buyer_writes(self, chat_id: str, text: str = "А доставка есть?"):
+        """Имитирует новое входящее сообщение покупателя."""
+        chat = self.chats[chat_id]
+        message = payloads.message(chat_id, len(self.messages[chat_id]), "in",
+                                   max(int(time.time()), chat["updated"] + 1), text=text)
+        self.messages[chat_id].insert(0, message)
+        chat["last_message"] = message
+        chat["updated"] = message["created"]
+
+
+class FakeOpenAI(FakeService):
+    """OpenAI-совместимый `/v1/chat/completions` с детерминированным ответом и `usage`."""
+
+    def route(self, request: httpx.Request):
+        if request.method == "POST" and request.url.path.endswith("/chat/completions"):
+            return "gen_answer", self._completion, {}
+        return None, None, {}
+
+    def _completion(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        prompt_tokens = sum(len(str(m.get("content") or "")) // 4 for m in payload["messages"])
+        answer = "Здравствуйте! Да, товар в наличии. Подскажите, пожалуйста, ваш номер телефона?"
+        completion_tokens = len(answer) // 4
+        return httpx.Response(200, json={
+            "id": f"chatcmpl-fake{self.calls['gen_answer']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+class FakeLimits(FakeService):
+    """Сервис лимитов: `GET /bot/{uuid}` и `PATCH /bot/{uuid}/count/{increment|decrement}`."""
+
+    def __init__(self, limit: int = 1_000_000, count: int = 0, config: FakeConfig | None = None, seed: int = 0):
+        super().__init__(config, seed)
+        self.limit = limit
+        self.count = count
+
+    def route(self, request: httpx.Request):
+        match = re.match(r"^/bot/(?P<uuid>[^/]+)(?P<action>/count/(increment|decrement))?$", request.url.path)
+        if not match:
+            return None, None, {}
+        action = match.group("action")
+        if request.method == "GET" and not action:
+            return "get_bot", self._bot, {"uuid": match.group("uuid")}
+        if request.method == "PATCH" and action:
+            stage = "increment_usage" if action.endswith("increment") else "decrement_usage"
+            return stage, self._change, {"uuid": match.group("uuid"), "delta": 1 if stage == "increment_usage" else -1}
+        return None, None, {}
+
+    def _state(self, uuid: str) -> dict:
+        return {"id": "fake-bot", "uuid": uuid, "limit": self.limit, "count": self.count}
+
+    def _bot(self, request: httpx.Request, uuid: str) -> httpx.Response:
+        return httpx.Response(200, json=self._state(uuid))
+
+    def _change(self, request: httpx.Request, uuid: str, delta: int) -> httpx.Response:
+        self.count += delta
+        return httpx.Response(200, json=self._state(uuid))
+
+
+class FakeTelegramSession(BaseSession):
+    """Сессия aiogram, отвечающая на методы Bot API локально."""
+
+    def __init__(self, service: "FakeTelegram"):
+        super().__init__()
+        self.service = service
+
+    async def make_request(self, bot: Bot, method, timeout: int | None = None):
+        name = type(method).__name__
+        self.service.calls[name] += 1
+        await self.service._delay()
+        if self.service._failed(name):
+            content = {"ok": False, "error_code": 500, "description": "Internal Server Error: fake failure"}
+            response = self.check_response(bot, method, status_code=500, content=json.dumps(content))
+            return response.result
+        self.service.sent += 1
+        result = {
+            "message_id": self.service.sent,
+            "date": int(time.time()),
+            "chat": {"id": getattr(method, "chat_id", 0), "type": "supergroup"},
+            "text": getattr(method, "text", None),
+        }
+        response = self.check_response(bot, method, status_code=200, content=json.dumps({"ok": True, "result": result}))
+        return response.result
+
+    async def stream_content(self, url: str, headers: dict | None = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True):
+        yield b""
+
+    async def close(self):
+        return None
+
+
+class FakeTelegram(FakeService):
+    def __init__(self, config: FakeConfig | None = None, seed: int = 0):
+        super().__init__(config, seed)
+        self.sent = 0
+
+    def bot(self) -> Bot:
+        return Bot(token="123456:fake", session=FakeTelegramSession(self))
+
+
+@dataclass
+class FakeEnvironment:
+    avito: FakeAvito
+    openai: FakeOpenAI = field(default_factory=FakeOpenAI)
+    limits: FakeLimits = field(default_factory=FakeLimits)
+    telegram: FakeTelegram = field(default_factory=FakeTelegram)
+
+    def calls(self) -> dict[str, int]:
+        merged: Counter[str] = Counter()
+        for service in (self.avito, self.openai, self.limits, self.telegram):
+            merged.update(service.calls)
+        return dict(merged)
+
+    def errors(self) -> dict[str, int]:
+        merged: Counter[str] = Counter()
+        for service in (self.avito, self.openai, self.limits, self.telegram):
+            merged.update(service.errors)
+        return dict(merged)
@@ -0,0 +1,193 @@
+"""
+Микробенчмарки горячих путей моделей и уведомлений.
+
+    python -m bench.micro --filter as_conversation --output micro.json
+
+Для каждого случая сообщается время на операцию (медиана и минимум по повторам),
+пик выделенной памяти за одну операцию и объем, который удерживает ее результат.
+"""
+import argparse
+import gc
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from app.models.avito import Chat, ChatsResponse, MessagesResponse
+from app.services.conversation import ConversationCache
+from app.services.notify import new_assist_text
+from bench import payloads
+from bench.report import environment_info, write_report
+
+PROMPT_PATH = Path(__file__).resolve().parent.parent / "app" / "prompts" / "data" / "text.md"
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[], Callable[[], Any]]  # готовит данные вне замера и возвращает замеряемую операцию
+    params: dict = field(default_factory=dict)
+
+
+def enriched_chat(history_length: int, extra_users: int = 0, unanswered: bool = True) -> Chat:
+    chat = ChatsResponse.model_validate(payloads.chats_payload(1, extra_users=extra_users)).chats[0]
+    chat.messages = MessagesResponse.model_validate(
+        payloads.messages_payload(history_length, unanswered=unanswered)
+    ).messages
+    return chat
+
+
+def case_chats_validate(count: int, extra_users: int):
+    data = payloads.chats_payload(count, extra_users=extra_users)
+    return lambda: ChatsResponse.model_validate(data)
+
+
+def case_not_answered(count: int):
+    response = ChatsResponse.model_validate(payloads.chats_payload(count))
+    return lambda: response.not_answered_chats
+
+
+def case_messages_validate(length: int):
+    data = payloads.messages_payload(length)
+    return lambda: MessagesResponse.model_validate(data)
+
+
+def case_as_conversation(length: int):
+    chat = enriched_chat(length)
+    return lambda: chat.as_conversation
+
+
+def case_as_conversation_with_prompt(length: int):
+    chat = enriched_chat(length)
+    prompt = PROMPT_PATH.read_text(encoding="utf-8")
+    return lambda: chat.as_conversation_with_prompt(prompt)
+
+
+def case_conversation_cache(length: int):
+    # в кеше уже есть диалог без последнего сообщения — как для уже ассистированного чата
+    chat = enriched_chat(length)
+    prompt = PROMPT_PATH.read_text(encoding="utf-8")
+    cache = ConversationCache(max_turns=length)
+    cache.build(chat, prompt)
+    state = cache.states[chat.id]
+
+    def op():
+        state.turns.pop()
+        state.last_message_id = chat.messages[1].id
+        return cache.build(chat, prompt)
+
+    return op
+
+
+def case_ai_assist_required(length: int):
+    chat = enriched_chat(length)
+    return lambda: (chat.ai_assist_required, chat.ai_assisted)
+
+
+def case_new_assist_text(length: int):
+    user_message = ("Здравствуйте! Подскажите по шкафу <b>2400</b> & доставке. " * (length // 60 + 1))[:length]
+    answer = ("Добрый день! Да, шкаф в наличии, доставим завтра. " * (length // 50 + 1))[:length]
+    chat_url = "https://www.avito.ru/profile/messenger/channel/u2i-fake0"
+    return lambda: new_assist_text(user_message, answer, chat_url)
+
+
+CASES = [
+    Case("chats_validate", lambda: case_chats_validate(100, 0), {"chats": 100, "extra_users": 0}),
+    Case("chats_validate", lambda: case_chats_validate(100, 20), {"chats": 100, "extra_users": 20}),
+    Case("chats_validate", lambda: case_chats_validate(1000, 0), {"chats": 1000, "extra_users": 0}),
+    Case("not_answered_chats", lambda: case_not_answered(1000), {"chats": 1000}),
+    Case("messages_validate", lambda: case_messages_validate(20), {"messages": 20}),
+    Case("messages_validate", lambda: case_messages_validate(500), {"messages": 500}),
+    Case("as_conversation", lambda: case_as_conversation(20), {"messages": 20}),
+    Case("as_conversation", lambda: case_as_conversation(500), {"messages": 500}),
+    Case("as_conversation_with_prompt", lambda: case_as_conversation_with_prompt(50), {"messages": 50}),
+    Case("conversation_cache", lambda: case_conversation_cache(50), {"messages": 50}),
+    Case("conversation_cache", lambda: case_conversation_cache(500), {"messages": 500}),
+    Case("ai_assist_required", lambda: case_ai_assist_required(20), {"messages": 20}),
+    Case("ai_assist_required", lambda: case_ai_assist_required(500), {"messages": 500}),
+    Case("new_assist_text", lambda: case_new_assist_text(100), {"chars": 100}),
+    Case("new_assist_text", lambda: case_new_assist_text(4000), {"chars": 4000}),
+]
+
+
+def measure_time(op: Callable[[], Any], min_time: float, repeat: int) -> tuple[int, list[float]]:
+    # калибруем число итераций так, чтобы один повтор длился не меньше min_time / repeat
+    loops = 1
+    budget = min_time / repeat
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            op()
+        elapsed = time.perf_counter() - started
+        if elapsed >= budget or loops >= 1_000_000:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(budget / elapsed) + 1))
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter_ns()
+            for _ in range(loops):
+                op()
+            timings.append((time.perf_counter_ns() - started) / loops)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return loops, timings
+
+
+def measure_allocations(op: Callable[[], Any]) -> tuple[int, int]:
+    """Пик памяти за одну операцию и сколько из нее удерживает результат."""
+    op()  # прогрев кешей pydantic и интернирования строк
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = op()
+        retained, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak - before, retained - before
+
+
+def run(args: argparse.Namespace) -> dict:
+    results = []
+    for case in CASES:
+        if args.filter and args.filter not in case.name:
+            continue
+        op = case.setup()
+        loops, timings = measure_time(op, args.min_time, args.repeat)
+        peak_bytes, retained_bytes = measure_allocations(op)
+        results.append({
+            "name": case.name,
+            "params": case.params,
+            "loops": loops,
+            "ns_per_op_median": statistics.median(timings),
+            "ns_per_op_min": min(timings),
+            "alloc_peak_bytes": peak_bytes,
+            "alloc_retained_bytes": retained_bytes,
+        })
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    return {"meta": environment_info("micro", config), "results": results}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default=None, help="запускать только случаи, имя которых содержит подстроку")
+    parser.add_argument("--min-time", type=float, default=1.0, help="минимальное время замера одного случая, сек")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов замера")
+    parser.add_argument("--output", type=Path, default=None, help="файл для JSON (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    write_report(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Задержка event loop и пропускная способность при валидации больших ответов Avito:
+на месте (inline), кусками в loop (chunked) и в пуле `Offloader` (процессы, субинтерпретаторы на 3.14+).
+
+    python -m bench.offload --chats 500 --payloads 20 --concurrency 1 --output offload.json
+
+Пока идут валидации, корутина-пульс просыпается каждую миллисекунду; ее опоздание — это время,
+на которое валидация задержала бы любой другой обработчик, например вебхук.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from app.core.offload import Offloader
+from app.models.avito import ChatsResponse
+from bench import payloads
+from bench.report import environment_info, write_report
+
+MODELS = ("app.models.avito:ChatsResponse",)
+
+
+async def heartbeat(lags: list[float], stop: asyncio.Event, interval: float = 0.001):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_mode(mode: str, raw: bytes, args: argparse.Namespace) -> dict:
+    offloader = None
+    if mode != "inline":
+        offloader = Offloader(mode, threshold=0, workers=args.workers, warm=MODELS)
+        await offloader.start()
+        mode = offloader.mode  # interpreters мог откатиться на processes
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def validate() -> int:
+        # результат не удерживается: иначе в замер попадают паузы GC на десятках тысяч живых объектов
+        async with semaphore:
+            return len((await validate_one()).chats)
+
+    async def validate_one():
+        if offloader is None:
+            # как в клиенте: без пула валидация идет прямо в корутине запроса
+            await asyncio.sleep(0)
+            return ChatsResponse.model_validate_json(raw)
+        return await offloader.validate((ChatsResponse,), raw)
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(0.01)
+    lags.clear()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(validate() for _ in range(args.payloads)))
+    duration = time.perf_counter() - started
+    stop.set()
+    await beat
+    if offloader:
+        offloader.close()
+    assert all(count == args.chats for count in results)
+    lags.sort()
+    return {
+        "mode": mode,
+        "seconds": duration,
+        "payloads_per_second": args.payloads / duration,
+        "loop_lag_ms_p50": statistics.median(lags) * 1000 if lags else None,
+        "loop_lag_ms_p99": lags[int(len(lags) * 0.99)] * 1000 if lags else None,
+        "loop_lag_ms_max": lags[-1] * 1000 if lags else None,
+        "heartbeats": len(lags),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    raw = json.dumps(payloads.chats_payload(args.chats, extra_users=args.extra_users), ensure_ascii=False).encode()
+    results = [await run_mode(mode, raw, args) for mode in args.modes]
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    config["payload_bytes"] = len(raw)
+    return {"meta": environment_info("offload", config), "results": results}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=500, help="чатов в одном ответе get_chats")
+    parser.add_argument("--extra-users", type=int, default=2, help="дополнительных участников в каждом чате")
+    parser.add_argument("--payloads", type=int, default=20, help="всего ответов")
+    parser.add_argument("--concurrency", type=int, default=1, help="ответов, валидируемых одновременно")
+    parser.add_argument("--workers", type=int, default=2, help="воркеров в пуле")
+    parser.add_argument("--modes", nargs="+", default=["inline", "chunked", "processes", "interpreters"],
+                        choices=["inline", "chunked", "processes", "interpreters"])
+    parser.add_argument("--output", type=Path, default=None, help="файл для JSON (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    write_report(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Синтетические payload'ы в форме ответов API мессенджера Avito.
+
+Сообщения идут от новых к старым, как в `/messenger/v3/.../messages/`; контент смешанный:
+текст, ссылки, картинки и голосовые. `users` и `context` можно раздуть до размеров реальных ответов.
+"""
+import random
+import time
+
+AI_MARK = "‎"
+COMPANY_ID = 1000
+
+_IMAGE_SIZES = ("140x105", "32x32", "640x480", "1280x960", "192x192", "24x24",
+                "256x256", "36x36", "48x48", "64x64", "72x72", "96x96")
+_BUYER_TEXTS = (
+    "Здравствуйте! Актуально?",
+    "Где можно забрать?",
+    "Торг уместен?",
+    "А доставка в Михайловск есть? Сколько будет стоить и когда сможете привезти?",
+    "Скиньте, пожалуйста, размеры шкафа и варианты цвета фасадов, интересует светлый дуб",
+)
+
+
+def image_sizes(seed: int = 0) -> dict[str, str]:
+    return {size: f"https://img.avito.st/image/{seed}/{size}.jpg" for size in _IMAGE_SIZES}
+
+
+def message(chat_id: str, n: int, direction: str, created: int, text: str | None = None, kind: str | None = None,
+            ai: bool = True) -> dict:
+    """
+    Сообщение чата. Если `kind` не задан, входящие сообщения детерминированно чередуют
+    текст, картинки, голосовые и ссылки по номеру `n`.
+    """
+    if kind is None:
+        kind = "text"
+        if text is None and direction == "in":
+            if n % 7 == 3:
+                kind = "image"
+            elif n % 11 == 5:
+                kind = "voice"
+            elif n % 13 == 7:
+                kind = "link"
+    if kind == "image":
+        content = {"image": {"sizes": image_sizes(n)}}
+    elif kind == "voice":
+        content = {"voice": {"voice_id": f"voice-{chat_id}-{n}"}}
+    elif kind == "link":
+        url = f"https://www.avito.ru/stavropol/mebel/{n}"
+        content = {"link": {"text": url, "url": url}}
+    elif direction == "in":
+        content = {"text": text or _BUYER_TEXTS[n % len(_BUYER_TEXTS)]}
+    else:
+        content = {"text": text or f"Ответ #{n}: уточните, пожалуйста, размеры{AI_MARK if ai else ''}"}
+    return {
+        "author_id": 1 if direction == "in" else COMPANY_ID,
+        "content": content,
+        "created": created,
+        "direction": direction,
+        "id": f"{chat_id}-m{n}",
+        "type": kind,
+    }
+
+
+def history(chat_id: str, length: int, created: int, unanswered: bool = True, assisted: bool = True) -> list[dict]:
+    """
+    История чата от новых сообщений к старым.
+    `assisted=False` — в чате только вопросы покупателя; иначе входящие и ответы AI чередуются.
+    """
+    messages = []
+    for n in range(length):
+        direction = "in" if not assisted or (n % 2 == 0) == unanswered else "out"
+        messages.append(message(chat_id, n, direction, created + (length - n) * 10))
+    return messages
+
+
+def user(user_id: int, name: str, item_id: int | None = None) -> dict:
+    data = {"id": user_id, "name": name}
+    if item_id is not None:
+        data["public_user_profile"] = {
+            "avatar": {"default": f"https://static.avito.ru/avatar/{user_id}.png", "images": image_sizes(user_id)},
+            "item_id": item_id,
+            "url": f"https://www.avito.ru/user/{user_id}/profile",
+            "user_id": user_id,
+        }
+    return data
+
+
+def chat(i: int, last_message: dict, created: int, extra_users: int = 0) -> dict:
+    """Чат из списка `/messenger/v2/.../chats` с контекстом объявления и `2 + extra_users` участниками."""
+    item_id = 10_000 + i
+    return {
+        "context": {"type": "item", "value": {
+            "id": item_id,
+            "images": {"count": len(_IMAGE_SIZES), "main": image_sizes(item_id)},
+            "price_string": f"{25_000 + i * 100} ₽",
+            "status_id": 1,
+            "title": f"Шкаф-купе «Модерн» {i}, 2400×600×2200",
+            "url": f"https://www.avito.ru/stavropol/mebel/shkaf_{item_id}",
+            "user_id": COMPANY_ID,
+        }},
+        "created": created,
+        "id": f"u2i-fake{i}",
+        "last_message": last_message,
+        "updated": last_message["created"],
+        "users": [user(1 + i, f"Покупатель {i}", item_id)]
+                 + [user(100_000 + i * 10 + k, f"Участник {k}", item_id) for k in range(extra_users)]
+                 + [user(COMPANY_ID, "М-мебель", item_id)],
+    }
+
+
+def chats_payload(count: int, history_length: int = 1, extra_users: int = 0, unanswered_ratio: float = 0.7,
+                  seed: int = 0) -> dict:
+    """Ответ `get_chats` на `count` чатов."""
+    rnd = random.Random(seed)
+    now = int(time.time())
+    chats = []
+    for i in range(count):
+        created = now - 3600 - i * 60
+        messages = history(f"u2i-fake{i}", max(history_length, 1), created, unanswered=rnd.random() < unanswered_ratio)
+        chats.append(chat(i, messages[0], created, extra_users))
+    return {"chats": chats}
+
+
+def messages_payload(length: int, chat_id: str = "u2i-fake0", unanswered: bool = True) -> dict:
+    """Ответ `get_chat_messages` с историей длины `length`."""
+    created = int(time.time()) - 86_400
+    return {"messages": history(chat_id, length, created, unanswered=unanswered), "meta": {}}
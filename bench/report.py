@@ -0,0 +1,37 @@
+import json
+import platform
+import subprocess
+import sys
+import time
+import tomllib
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def environment_info(benchmark: str, config: dict) -> dict:
+    """Шапка отчета: версия проекта, ревизия git и интерпретатор — чтобы сравнивать прогоны между версиями."""
+    with (ROOT / "pyproject.toml").open("rb") as f:
+        version = tomllib.load(f)["project"]["version"]
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "benchmark": benchmark,
+        "version": version,
+        "revision": revision,
+        "python": platform.python_version(),
+        "timestamp": int(time.time()),
+        "config": config,
+    }
+
+
+def write_report(report: dict, output: Path | None = None):
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if output:
+        output.write_text(text + "\n", encoding="utf-8")
+    else:
+        sys.stdout.write(text + "\n")
@@ -0,0 +1,54 @@
+import pytest
+
+from app.services.store import LocalStore
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment, FakeLimits
+
+
+@pytest.mark.asyncio
+class TestBenchE2E:
+
+    async def test_tick_on_fakes(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=4, assisted_ratio=0.5))
+        avito_bl = await build_avito_bl(env)
+
+        await avito_bl.meta()
+
+        assert env.avito.calls["send_message"] == 4
+        assert env.openai.calls["gen_answer"] == 4
+        # квота и уведомления — только для чатов, где AI отвечает впервые
+        assert env.limits.count == 2
+        assert env.telegram.calls["SendMessage"] == 2
+        assert all(chat["last_message"]["direction"] == "out" for chat in env.avito.chats.values())
+
+    async def test_restart_reuses_stored_histories(self, tmp_path):
+        # без квоты чаты остаются неотвеченными и попадают в каждый тик
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=4, assisted_ratio=0), limits=FakeLimits(limit=0))
+        store = LocalStore(tmp_path / "state.sqlite3")
+        await store.open()
+        await (await build_avito_bl(env, store)).meta()
+        await store.close()
+        assert env.avito.calls["get_chat_messages"] == 4
+
+        store = LocalStore(tmp_path / "state.sqlite3")
+        await store.open()
+        await (await build_avito_bl(env, store)).meta()
+        await store.close()
+        assert env.avito.calls["get_chat_messages"] == 4
+
+    async def test_notification_failure_does_not_abort_tick(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=4, assisted_ratio=0.5))
+        avito_bl = await build_avito_bl(env)
+
+        async def broken(**kwargs):
+            raise ConnectionError("telegram proxy is down")
+
+        avito_bl.tg_notificator.new_assist = broken
+        await avito_bl.meta()
+
+        assert env.avito.calls["send_message"] == 4
+        assert env.limits.count == 2
+        assert len(avito_bl.replied) == 4
+        # ответ уже отправлен: следующий тик не отвечает повторно
+        await avito_bl.meta()
+        assert env.avito.calls["send_message"] == 4
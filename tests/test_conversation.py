@@ -0,0 +1,47 @@
+from app.models.avito import Chat, MessagesResponse
+from app.services.conversation import ConversationCache
+from bench import payloads
+
+
+def chat_with_history(length: int) -> Chat:
+    chat = Chat.model_validate(payloads.chat(0, payloads.message("u2i-fake0", 0, "in", 0), 0))
+    chat.messages = MessagesResponse.model_validate(payloads.messages_payload(length)).messages
+    return chat
+
+
+class TestConversationCache:
+
+    def test_matches_full_build(self):
+        chat = chat_with_history(30)
+        cache = ConversationCache()
+        assert cache.build(chat, "prompt") == chat.as_conversation_with_prompt("prompt")
+
+    def test_appends_new_messages(self):
+        full = chat_with_history(30)
+        chat = full.model_copy(update={"messages": full.messages[5:]})
+        cache = ConversationCache()
+        cache.build(chat, "prompt")
+        state = cache.states[chat.id]
+        first_turn = state.turns[0]
+
+        conversation = cache.build(full, "prompt")
+        assert cache.states[chat.id] is state
+        assert state.turns[0] is first_turn
+        assert conversation == full.as_conversation_with_prompt("prompt")
+        assert cache.build(full, "prompt", last=4)[1:] == conversation[-4:]
+
+    def test_prompt_change_rebuilds(self):
+        chat = chat_with_history(10)
+        cache = ConversationCache()
+        cache.build(chat, "old")
+        state = cache.states[chat.id]
+        assert cache.build(chat, "new") == chat.as_conversation_with_prompt("new")
+        assert cache.states[chat.id] is not state
+
+    def test_unknown_history_rebuilds(self):
+        cache = ConversationCache(max_turns=5)
+        cache.build(chat_with_history(10), "prompt")
+        other = chat_with_history(3)
+        for message in other.messages:
+            message.id += "-other"
+        assert cache.build(other, "prompt") == other.as_conversation_with_prompt("prompt")
@@ -0,0 +1,81 @@
+import pytest
+
+from app.core.metrics import DEBOUNCE_COALESCED_MESSAGES
+from app.models.avito import Chat
+from app.services.debounce import Debouncer
+from bench import payloads
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+def chat_at(created: int) -> Chat:
+    return Chat.model_validate(payloads.chat(0, payloads.message("u2i-fake0", 0, "in", created), created))
+
+
+class TestDebouncer:
+
+    def test_waits_for_quiet_window(self):
+        debouncer = Debouncer(window=10, max_wait=60)
+        assert not debouncer.ready(chat_at(1000), now=1005)
+        assert debouncer.due_in(chat_at(1000), now=1005) == 5
+        assert debouncer.ready(chat_at(1000), now=1010)
+
+    def test_max_wait_caps_burst(self):
+        debouncer = Debouncer(window=10, max_wait=30)
+        assert not debouncer.ready(chat_at(1000), now=1001)
+        assert not debouncer.ready(chat_at(1025), now=1026)
+        assert debouncer.ready(chat_at(1031), now=1032)
+
+    def test_burst_reset_after_chat_left_queue(self):
+        debouncer = Debouncer(window=10, max_wait=30)
+        assert not debouncer.ready(chat_at(1000), now=1001)
+        debouncer.prune([])
+        # покупатель вернулся через несколько часов — это новая серия
+        assert not debouncer.ready(chat_at(9000), now=9001)
+
+    def test_disabled(self):
+        assert Debouncer(window=0).ready(chat_at(1000), now=1000)
+
+
+@pytest.mark.asyncio
+class TestDebounceTick:
+
+    async def test_burst_answered_once(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=0, answered=1))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.debouncer = Debouncer(window=30, max_wait=120)
+        for text in ("Здравствуйте", "Шкаф еще продается?", "И доставка есть?"):
+            env.avito.buyer_writes("u2i-fake0", text)
+
+        await avito_bl.meta()
+        assert env.openai.calls["gen_answer"] == 0
+
+        # серия закончилась минуту назад
+        for message in env.avito.messages["u2i-fake0"][:3]:
+            message["created"] -= 60
+        env.avito.chats["u2i-fake0"]["updated"] -= 60
+        coalesced = DEBOUNCE_COALESCED_MESSAGES.count()
+
+        await avito_bl.meta()
+        assert env.openai.calls["gen_answer"] == 1
+        assert env.avito.calls["send_message"] == 1
+        assert DEBOUNCE_COALESCED_MESSAGES.count() == coalesced + 1
+
+    async def test_manager_reply_closes_burst(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=0, answered=1))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.debouncer = Debouncer(window=30, max_wait=120)
+        env.avito.buyer_writes("u2i-fake0")
+
+        await avito_bl.meta()
+        assert "u2i-fake0" in avito_bl.debouncer.bursts
+
+        # ответил менеджер: чат больше не ждет ответа
+        chat = env.avito.chats["u2i-fake0"]
+        message = payloads.message("u2i-fake0", len(env.avito.messages["u2i-fake0"]), "out", chat["updated"] + 1)
+        env.avito.messages["u2i-fake0"].insert(0, message)
+        chat["last_message"], chat["updated"] = message, message["created"]
+
+        await avito_bl.meta()
+        assert "u2i-fake0" not in avito_bl.debouncer.bursts
+        assert env.avito.calls["send_message"] == 0
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+
+from app.models.avito import Message
+from app.services.eventlog import EventLog
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+from bench.payloads import message
+
+
+def event(i: int) -> dict:
+    return {"id": f"evt-{i}", "payload": {"type": "message", "value": {"chat_id": "c1", "id": f"m{i}"}}}
+
+
+@pytest.mark.asyncio
+class TestEventLog:
+
+    async def test_append_consume_commit(self, tmp_path):
+        log = EventLog(tmp_path, fsync_interval=0.001)
+        await log.open()
+        offsets = await asyncio.gather(*(log.append(event(i)) for i in range(5)))
+        assert sorted(offsets) == list(range(5))
+
+        seen = []
+        consumer = asyncio.create_task(log.consume(seen.append))
+        while log.committed < 4:
+            await asyncio.sleep(0.001)
+        consumer.cancel()
+        await log.close()
+
+        assert [e["id"] for e in seen] == [f"evt-{i}" for i in range(5)]
+        assert json.loads((tmp_path / "checkpoint.json").read_text())["offset"] == 4
+
+    async def test_replay_unprocessed(self, tmp_path):
+        log = EventLog(tmp_path, fsync_interval=0.001)
+        await log.open()
+        for i in range(3):
+            await log.append(event(i))
+        await log.commit(0)
+        await log.close()
+
+        log = EventLog(tmp_path, fsync_interval=0.001)
+        await log.open()
+        replayed = [log._queue.get_nowait()[1]["id"] for _ in range(log._queue.qsize())]
+        assert replayed == ["evt-1", "evt-2"]
+        assert await log.append(event(3)) == 3
+        await log.close()
+
+    async def test_torn_tail(self, tmp_path):
+        log = EventLog(tmp_path, fsync_interval=0.001)
+        await log.open()
+        await log.append(event(0))
+        await log.close()
+        segment = next(tmp_path.glob("*.log"))
+        with segment.open("a", encoding="utf-8") as f:
+            f.write('{"offset": 1, "event": {"id"')
+
+        log = EventLog(tmp_path, fsync_interval=0.001)
+        await log.open()
+        assert log._queue.qsize() == 1
+        assert await log.append(event(1)) == 1
+        await log.close()
+        assert all(json.loads(line) for line in segment.read_text(encoding="utf-8").splitlines())
+
+    async def test_rotation_and_compaction(self, tmp_path):
+        log = EventLog(tmp_path, segment_bytes=200, fsync_interval=0.001)
+        await log.open()
+        for i in range(10):
+            await log.append(event(i))
+        assert len(list(tmp_path.glob("*.log"))) > 2
+
+        await log.commit(9)
+        segments = sorted(tmp_path.glob("*.log"))
+        assert len(segments) == 1 and int(segments[0].stem) == 10
+        await log.close()
+
+        log = EventLog(tmp_path, segment_bytes=200, fsync_interval=0.001)
+        await log.open()
+        assert log._queue.empty() and log.next_offset == 10
+        await log.close()
+
+    async def test_ingest_updates_history_cache(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=1))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.histories["c1"] = [Message.model_validate(message("c1", 1, "in", 100))]
+
+        value = message("c1", 2, "in", 200)
+        value.pop("direction")
+        avito_bl.ingest_event({"payload": {"type": "message", "value": {**value, "chat_id": "c1", "user_id": 1000}}})
+        avito_bl.ingest_event({"payload": {"type": "message", "value": {**value, "chat_id": "c1", "user_id": 1000}}})
+
+        assert [m.id for m in avito_bl.histories["c1"]] == ["c1-m2", "c1-m1"]
+        assert avito_bl.histories["c1"][0].direction == "in"
+
+    async def test_event_for_uncached_chat_answered_next_tick(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=0, answered=3))
+        avito_bl = await build_avito_bl(env)
+        await avito_bl.meta()
+        assert "u2i-fake2" not in avito_bl.histories and not avito_bl.sync.pending
+
+        # покупатель написал, но список чатов Avito еще отдает старое последнее сообщение
+        chat = env.avito.chats["u2i-fake2"]
+        value = message("u2i-fake2", len(env.avito.messages["u2i-fake2"]), "in", chat["updated"] + 1)
+        env.avito.messages["u2i-fake2"].insert(0, dict(value))
+        value.pop("direction")
+        avito_bl.ingest_event({"payload": {"type": "message", "value": {**value, "user_id": 1000,
+                                                                         "chat_id": "u2i-fake2"}}})
+
+        await avito_bl.meta()
+        assert env.avito.calls["send_message"] == 1
+        assert avito_bl.replied["u2i-fake2"] == value["id"]
+        assert not avito_bl.sync.dirty
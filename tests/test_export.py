@@ -0,0 +1,172 @@
+import gzip
+import json
+import time
+from functools import partial
+
+import httpx
+import pytest
+
+from app.models.avito import ChatsResponse, MessagesResponse
+from app.services.avito import Avito
+from app.services.export import Exporter, api_chats, api_messages, project, store_chats, store_messages
+from app.services.store import LocalStore
+from bench import payloads
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+async def filled_store(tmp_path, chats: int, history: int) -> LocalStore:
+    store = LocalStore(tmp_path / "state.sqlite3", flush_interval=0.01)
+    await store.open()
+    for chat in ChatsResponse.model_validate(payloads.chats_payload(chats)).chats:
+        store.save_chat(chat)
+        store.save_messages(chat.id, MessagesResponse.model_validate(
+            payloads.messages_payload(history, chat_id=chat.id)
+        ).messages)
+    await store.flush()
+    return store
+
+
+def read_rows(exporter: Exporter) -> list[dict]:
+    rows = []
+    for path in sorted(exporter.out_dir.glob(f"{exporter.kind}-*.jsonl.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            rows += [json.loads(line) for line in f]
+    return rows
+
+
+async def interrupted(source, after: int, cursor):
+    """Источник, который падает после `after` пачек."""
+    async for i, item in aenumerate(source(cursor)):
+        if i == after:
+            raise ConnectionError("interrupted")
+        yield item
+
+
+async def aenumerate(iterator):
+    i = 0
+    async for item in iterator:
+        yield i, item
+        i += 1
+
+
+def test_project():
+    row = {"id": "m1", "content": {"text": "Актуально?"}, "created": 1}
+    assert project(row, ["id", "content.text", "content.image.sizes"]) == {
+        "id": "m1", "content.text": "Актуально?", "content.image.sizes": None
+    }
+    assert project(row, None) is row
+
+
+@pytest.mark.asyncio
+class TestExport:
+
+    async def test_chunks_and_projection(self, tmp_path):
+        store = await filled_store(tmp_path, chats=5, history=10)
+        exporter = Exporter(tmp_path / "out", "messages", fields=["id", "chat_id", "content.text"], chunk_rows=20)
+        checkpoint = await exporter.run(partial(store_messages, store, batch=7))
+        await store.close()
+
+        rows = read_rows(exporter)
+        assert checkpoint.rows == len(rows) == 50
+        assert checkpoint.chunk == 3  # 21 + 21 + 8: граница файла — по пачке источника
+        assert set(rows[0]) == {"id", "chat_id", "content.text"}
+        assert len({row["id"] for row in rows}) == 50
+        assert not list(exporter.out_dir.glob("*.part"))
+
+    async def test_resume_after_interruption(self, tmp_path):
+        store = await filled_store(tmp_path, chats=4, history=10)
+        exporter = Exporter(tmp_path / "out", "messages", chunk_rows=10)
+        source = partial(store_messages, store, batch=5)
+
+        with pytest.raises(ConnectionError):
+            await exporter.run(partial(interrupted, source, 5))
+        assert exporter.load().rows == 20  # недописанный третий файл не засчитан
+
+        checkpoint = await exporter.run(source)
+        rows = read_rows(exporter)
+        assert checkpoint.rows == len(rows) == 40
+        assert len({row["id"] for row in rows}) == 40
+        await store.close()
+
+    async def test_rerun_exports_only_new(self, tmp_path):
+        store = await filled_store(tmp_path, chats=3, history=4)
+        chats = Exporter(tmp_path / "out", "chats")
+        messages = Exporter(tmp_path / "out", "messages")
+        await chats.run(partial(store_chats, store))
+        await messages.run(partial(store_messages, store))
+
+        chat = ChatsResponse.model_validate(payloads.chats_payload(4)).chats[3]
+        chat.updated = max(c.updated for c in await store.load_chats()) + 1
+        store.save_chat(chat)
+        store.save_messages(chat.id, MessagesResponse.model_validate(
+            payloads.messages_payload(2, chat_id=chat.id)
+        ).messages)
+        await store.flush()
+
+        assert (await chats.run(partial(store_chats, store))).rows == 4
+        assert (await messages.run(partial(store_messages, store))).rows == 14
+        assert [row["chat_id"] for row in read_rows(messages)[-2:]] == [chat.id, chat.id]
+
+        # сообщения, сохраненные повторно (например, синхронизацией), не выгружаются второй раз
+        for known in await store.load_chats():
+            store.save_messages(known.id, await store.load_messages(known.id))
+        await store.flush()
+        assert (await messages.run(partial(store_messages, store))).rows == 14
+        assert len({row["id"] for row in read_rows(messages)}) == 14
+        await store.close()
+
+    async def test_api_rerun_exports_new_chats_and_messages(self, tmp_path):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=3, history=4))
+        avito = Avito("fake-client-id", "fake-client-secret")
+        await avito.httpx_client.aclose()
+        avito.httpx_client = httpx.AsyncClient(base_url="https://api.avito.ru", transport=env.avito.transport())
+        await avito.get_user_data()
+        chats = Exporter(tmp_path / "out", "chats")
+        messages = Exporter(tmp_path / "out", "messages")
+        assert (await chats.run(partial(api_chats, avito, page_size=2))).rows == 3
+        assert (await messages.run(partial(api_messages, avito, page_size=2))).rows == 12
+
+        # новый чат встает в начало списка, в старом чате покупатель написал снова
+        env.avito._add_chat(3, 2, unanswered=True, assisted=False)
+        env.avito.chats["u2i-fake3"]["created"] = int(time.time())
+        env.avito.buyer_writes("u2i-fake3")
+        env.avito.buyer_writes("u2i-fake1")
+
+        assert (await chats.run(partial(api_chats, avito, page_size=2))).rows == 5
+        assert sorted(row["id"] for row in read_rows(chats)[-2:]) == ["u2i-fake1", "u2i-fake3"]
+        assert (await messages.run(partial(api_messages, avito, page_size=2))).rows == 16
+        rows = read_rows(messages)
+        assert len({row["id"] for row in rows}) == 16
+        assert sorted(row["chat_id"] for row in rows[-4:]) == ["u2i-fake1"] + ["u2i-fake3"] * 3
+
+        # без изменений повторный запуск ничего не дописывает
+        assert (await messages.run(partial(api_messages, avito, page_size=2))).rows == 16
+        await avito.httpx_client.aclose()
+
+    async def test_fields_must_match_checkpoint(self, tmp_path):
+        store = await filled_store(tmp_path, chats=1, history=2)
+        await Exporter(tmp_path / "out", "messages", fields=["id"]).run(partial(store_messages, store))
+        with pytest.raises(ValueError):
+            Exporter(tmp_path / "out", "messages", fields=["id", "created"]).load()
+        await store.close()
+
+    async def test_api_export_reuses_store(self, tmp_path):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=3, history=6))
+        avito = Avito("fake-client-id", "fake-client-secret")
+        await avito.httpx_client.aclose()
+        avito.httpx_client = httpx.AsyncClient(base_url="https://api.avito.ru", transport=env.avito.transport())
+        await avito.get_user_data()
+        store = LocalStore(tmp_path / "state.sqlite3", flush_interval=0.01)
+        await store.open()
+
+        first = Exporter(tmp_path / "first", "messages")
+        assert (await first.run(partial(api_messages, avito, store=store))).rows == 18
+        assert env.avito.calls["get_chat_messages"] == 3
+        await store.flush()
+
+        # история уже в локальном состоянии: повторная выгрузка не запрашивает сообщения
+        second = Exporter(tmp_path / "second", "messages")
+        assert (await second.run(partial(api_messages, avito, store=store))).rows == 18
+        assert env.avito.calls["get_chat_messages"] == 3
+        assert read_rows(first) == read_rows(second)
+        await store.close()
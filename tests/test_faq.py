@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from app.services.faq import FAQIndex, parse_faq
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+FAQ = """Комментарий оператора вне записей.
+
+## Актуально?
+? еще актуально
+Да, «{title}» актуально, цена {price}.
+
+## Где можно забрать?
+? самовывоз есть
+Самовывоза нет, доставляем по Ставрополю.
+"""
+
+
+@pytest.fixture
+def faq_file(tmp_path):
+    path = tmp_path / "faq.md"
+    path.write_text(FAQ, encoding="utf-8")
+    return path
+
+
+@pytest.mark.asyncio
+class TestFAQIndex:
+
+    async def test_parse(self):
+        entries = parse_faq(FAQ)
+        assert [entry.question for entry in entries] == ["Актуально?", "Где можно забрать?"]
+        assert entries[0].phrasings == ["Актуально?", "еще актуально"]
+        assert entries[0].fields == {"title", "price"}
+
+    async def test_confident_match(self, faq_file):
+        index = FAQIndex(faq_file)
+        index.refresh()
+        assert index.answer("Здравствуйте! Актуально?", title="Шкаф", price="25 000 ₽") == "Да, «Шкаф» актуально, цена 25 000 ₽."
+        assert index.answer("Добрый день, ещё актуально?", title="Шкаф", price="1 ₽").startswith("Да")
+        assert index.answer("Самовывоз есть?") == "Самовывоза нет, доставляем по Ставрополю."
+
+    async def test_fallback(self, faq_file):
+        index = FAQIndex(faq_file)
+        index.refresh()
+        assert index.answer("А доставка в Михайловск есть? Сколько будет стоить?") is None
+        assert index.answer("Здравствуйте") is None
+        # наличие не подтверждается ответом «актуально»
+        assert index.answer("Есть в наличии?", title="Шкаф", price="1 ₽") is None
+        # в объявлении нет цены — шаблон не заполнить
+        assert index.answer("Актуально?", title="Шкаф", price=None) is None
+
+    async def test_incremental_rebuild(self, faq_file):
+        index = FAQIndex(faq_file)
+        assert index.refresh()
+        assert not index.refresh()
+        tokens = index._tokens["еще актуально"]
+
+        faq_file.write_text(FAQ + "\n## Торг уместен?\nЦена окончательная.\n", encoding="utf-8")
+        os.utime(faq_file, ns=(0, 10**18))
+        assert index.refresh()
+        assert index._tokens["еще актуально"] is tokens
+        assert index.answer("торг уместен") == "Цена окончательная."
+
+        faq_file.unlink()
+        assert index.refresh() and index.answer("Актуально?", title="t", price="p") is None
+
+    async def test_tick_skips_llm(self, faq_file):
+        # первое сообщение каждого чата — «Здравствуйте! Актуально?»
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=4, history=1, assisted_ratio=0))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.faq = FAQIndex(faq_file)
+
+        await avito_bl.meta()
+
+        assert env.avito.calls["send_message"] == 4
+        assert env.openai.calls["gen_answer"] == 0
+        assert env.limits.count == 4
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.services.governor import AIMDGovernor
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+@pytest.mark.asyncio
+class TestAIMDGovernor:
+
+    async def test_limits_in_flight(self):
+        governor = AIMDGovernor(initial=3, max_limit=3)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with governor.slot():
+                peak = max(peak, governor.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call() for _ in range(10)))
+        assert peak == 3
+        assert governor.in_flight == 0
+
+    async def test_additive_increase(self):
+        governor = AIMDGovernor(initial=2, max_limit=10)
+        for _ in range(10):
+            async with governor.slot():
+                pass
+        assert governor.current_limit > 2
+
+    async def test_decrease_once_per_epoch(self):
+        governor = AIMDGovernor(initial=16)
+
+        async def rate_limited():
+            async with governor.slot():
+                await asyncio.sleep(0.01)
+                raise StatusError(429)
+
+        results = await asyncio.gather(*(rate_limited() for _ in range(8)), return_exceptions=True)
+        assert all(isinstance(r, StatusError) for r in results)
+        # все 8 запросов упали в одну эпоху — лимит снижен один раз
+        assert governor.current_limit == 8
+
+        with pytest.raises(StatusError):
+            async with governor.slot():
+                raise StatusError(503)
+        assert governor.current_limit == 4
+
+        with pytest.raises(StatusError):
+            async with governor.slot():
+                raise StatusError(400)
+        assert governor.current_limit == 4
+
+    async def test_latency_spike(self):
+        governor = AIMDGovernor(initial=8, latency_target=0.001)
+        async with governor.slot():
+            await asyncio.sleep(0.01)
+        assert governor.current_limit == 4
+
+    async def test_ratelimit_headers(self):
+        governor = AIMDGovernor(initial=8)
+        governor.observe_headers({"x-ratelimit-remaining-requests": "2", "x-ratelimit-remaining-tokens": "90000"})
+        assert governor.current_limit == 2
@@ -0,0 +1,65 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.services.limits import LimitsUOW, LocalLimits
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+BOT = uuid.uuid4()
+
+
+@pytest.fixture
+async def limits(tmp_path):
+    limits = LocalLimits(tmp_path / "limits.sqlite3", limit=10)
+    await limits.open()
+    yield limits
+    await limits.close()
+
+
+@pytest.mark.asyncio
+class TestLocalLimits:
+
+    async def test_inc_dec(self, limits: LocalLimits):
+        uow = LimitsUOW(BOT, limits)
+        bot = await uow.get_bot()
+        assert (bot.uuid, bot.limit, bot.count, bot.remain) == (BOT, 10, 0, 10)
+        assert (await uow.increment_usage()).count == 1
+        assert (await uow.decrement_usage()).count == 0
+        assert (await uow.decrement_usage()).count == 0
+
+    async def test_concurrent_increments(self, limits: LocalLimits):
+        await asyncio.gather(*(limits.increment_usage(BOT) for _ in range(50)))
+        bot = await limits.get_bot(BOT)
+        assert bot.count == 50
+        assert bot.remain == 0
+
+    async def test_reset_on_new_period(self, limits: LocalLimits):
+        limits._period = lambda: "2026-09"
+        await limits.increment_usage(BOT)
+        await limits.increment_usage(BOT)
+        limits._period = lambda: "2026-10"
+        assert (await limits.get_bot(BOT)).count == 0
+        assert (await limits.increment_usage(BOT)).count == 1
+
+    async def test_persistence_and_limit_from_settings(self, tmp_path):
+        limits = LocalLimits(tmp_path / "limits.sqlite3", limit=10)
+        await limits.open()
+        await limits.increment_usage(BOT)
+        await limits.close()
+
+        limits = LocalLimits(tmp_path / "limits.sqlite3", limit=3)
+        await limits.open()
+        bot = await limits.get_bot(BOT)
+        await limits.close()
+        assert (bot.limit, bot.count) == (3, 1)
+
+    async def test_avito_bl_spends_local_quota(self, limits: LocalLimits):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=4, assisted_ratio=0.5))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.limits = LimitsUOW(BOT, limits)
+
+        await avito_bl.meta()
+        assert (await limits.get_bot(BOT)).count == 2
+        assert env.limits.count == 0
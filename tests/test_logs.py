@@ -0,0 +1,66 @@
+import asyncio
+import io
+import json
+import logging
+
+import pytest
+
+from app.core.logs import log_context, setup_logging, stop_logging
+from app.core.tracing import TRACER
+
+
+def records(stream: io.StringIO) -> list[dict]:
+    stop_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+@pytest.mark.asyncio
+class TestStructuredLogging:
+
+    async def test_context_fields(self):
+        stream = io.StringIO()
+        setup_logging(stream=stream)
+        logger = logging.getLogger("app.test")
+
+        async def chat(chat_id: str):
+            with log_context(chat_id=chat_id):
+                await asyncio.sleep(0)
+                logger.info("answered", extra={"tokens": 10})
+
+        with TRACER.span("tick") as span, log_context(tick=1, bot="b-1"):
+            await asyncio.gather(chat("c1"), chat("c2"))
+        logger.info("outside")
+
+        first, second, outside = records(stream)
+        assert {first["chat_id"], second["chat_id"]} == {"c1", "c2"}
+        assert first["tick"] == 1 and first["bot"] == "b-1" and first["tokens"] == 10
+        assert first["trace_id"] == span.trace.trace_id and first["msg"] == "answered"
+        assert "tick" not in outside and "chat_id" not in outside
+
+    async def test_exception_and_levels(self):
+        stream = io.StringIO()
+        setup_logging(level="INFO", levels={"app.noisy": "ERROR"}, stream=stream)
+        logging.getLogger("app.noisy").warning("dropped")
+        logging.getLogger("app.quiet").debug("dropped")
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            logging.getLogger("app.test").exception("failed %s", "x")
+
+        (entry,) = records(stream)
+        assert entry["level"] == "ERROR" and entry["msg"] == "failed x"
+        assert "RuntimeError: boom" in entry["exc"]
+        logging.getLogger("app.noisy").setLevel(logging.NOTSET)
+
+    async def test_sampling(self):
+        stream = io.StringIO()
+        setup_logging(sampling={"chat.seen": 0.25}, stream=stream)
+        logger = logging.getLogger("app.test")
+        for i in range(100):
+            logger.info("seen", extra={"event": "chat.seen", "i": i})
+        logger.info("tick planned")
+
+        entries = records(stream)
+        seen = [e for e in entries if e.get("event") == "chat.seen"]
+        assert len(seen) == 25 and all(e["sample_rate"] == 0.25 for e in seen)
+        assert entries[-1]["msg"] == "tick planned"
@@ -0,0 +1,42 @@
+import pytest
+
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+@pytest.mark.asyncio
+class TestMessageHistory:
+
+    async def test_fetch_tail(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=1, history=300))
+        avito = (await build_avito_bl(env)).avito
+
+        tail = await avito.fetch_tail("u2i-fake0", 5)
+        assert [m.id for m in tail] == [m["id"] for m in env.avito.messages["u2i-fake0"][:5]]
+        assert env.avito.calls["get_chat_messages"] == 1
+
+        assert len(await avito.fetch_tail("u2i-fake0", 250)) == 250
+
+    async def test_iter_messages_stops_at_known(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=1, history=300))
+        avito = (await build_avito_bl(env)).avito
+        known = {m["id"] for m in env.avito.messages["u2i-fake0"][3:]}
+
+        fresh = [m.id async for m in avito.iter_messages("u2i-fake0", known, first_page=10)]
+        assert fresh == [m["id"] for m in env.avito.messages["u2i-fake0"][:3]]
+
+    async def test_enrich_backfills_cached_history(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=1, history=50))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.history_tail = 20
+
+        chat = (await avito_bl.not_answered_chats())[0]
+        await avito_bl.enrich_message(chat)
+        assert len(chat.messages) == 20
+
+        env.avito.buyer_writes("u2i-fake0")
+        chat = (await avito_bl.not_answered_chats())[0]
+        await avito_bl.enrich_message(chat)
+        assert chat.messages[0].id == chat.last_message.id
+        assert [m.id for m in chat.messages] == [m["id"] for m in env.avito.messages["u2i-fake0"][:20]]
+        assert env.avito.calls["get_chat_messages"] == 2
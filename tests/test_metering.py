@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.metering import BudgetMode, TokenMeter
+from app.services.store import LocalStore
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+def usage(prompt: int, completion: int, cached: int = 0):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion,
+                           prompt_tokens_details=SimpleNamespace(cached_tokens=cached))
+
+
+@pytest.mark.asyncio
+class TestTokenMeter:
+
+    async def test_budget_modes(self):
+        meter = TokenMeter("bot", daily_budget=1000, chat_daily_budget=500, reduced_model="cheap")
+        assert meter.decide("a").mode is BudgetMode.full
+
+        meter.record("a", "gpt-4o-mini", usage(400, 100))
+        assert meter.decide("a").mode is BudgetMode.skip  # бюджет чата исчерпан
+        assert meter.decide("b").mode is BudgetMode.full
+
+        meter.record("b", "gpt-4o-mini", usage(300, 50))
+        decision = meter.decide("b")
+        assert decision.mode is BudgetMode.reduced
+        assert decision.model == "cheap" and decision.context_messages == 10
+
+        meter.record("b", "cheap", usage(150, 0))
+        assert meter.decide("c").mode is BudgetMode.skip
+
+    async def test_flush_and_restore(self, tmp_path):
+        store = LocalStore(tmp_path / "state.sqlite3")
+        await store.open()
+        meter = TokenMeter("bot", store)
+        meter.record("a", "gpt-4o-mini", usage(100, 20, cached=64))
+        meter.record("a", "gpt-4o-mini", usage(100, 20))
+        meter.record("b", "gpt-4o-mini", usage(10, 5))
+        meter.flush()
+        assert meter.pending == {}
+        await store.flush()
+
+        restored = TokenMeter("bot", store)
+        await restored.restore()
+        await store.close()
+        assert restored.chats == {"a": 240, "b": 15}
+
+    async def test_tick_skips_over_budget(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=4, assisted_ratio=1))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.meter.daily_budget = 1
+        avito_bl.meter.chats["u2i-fake9"] = 1
+
+        await avito_bl.meta()
+
+        assert env.openai.calls["gen_answer"] == 0
+        assert env.avito.calls["send_message"] == 0
@@ -0,0 +1,45 @@
+import pytest
+
+from app.core.metrics import Counter, Gauge, Histogram, MetricsRegistry, STAGE_DURATION, observe_stage
+
+
+class TestMetrics:
+
+    def test_render_exposition(self):
+        registry = MetricsRegistry()
+        counter = registry.register(Counter("test_chats_total", "chats", labels=("status",)))
+        gauge = registry.register(Gauge("test_backlog", "backlog"))
+        histogram = registry.register(Histogram("test_latency_seconds", "latency", buckets=(0.1, 1.0)))
+
+        counter.inc(status="answered")
+        counter.inc(2, status="answered")
+        gauge.set(7)
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        text = registry.render()
+        assert 'test_chats_total{status="answered"} 3' in text
+        assert "test_backlog 7" in text
+        assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{le="1.0"} 2' in text
+        assert 'test_latency_seconds_bucket{le="+Inf"} 3' in text
+        assert "test_latency_seconds_count 3" in text
+
+    def test_labels_mismatch(self):
+        counter = Counter("test_labels_total", "labels", labels=("status",))
+        with pytest.raises(ValueError):
+            counter.inc(kind="x")
+
+
+@pytest.mark.asyncio
+class TestObserveStage:
+
+    async def test_observe_error(self):
+        @observe_stage("test_stage")
+        async def fail():
+            raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            await fail()
+        assert STAGE_DURATION.count(stage="test_stage", outcome="error") == 1
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from app.core.offload import Offloader
+from app.models.avito import ChatsResponse, FailedResponse, MessagesResponse
+from bench import payloads
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+def raw(data: dict) -> bytes:
+    return json.dumps(data, ensure_ascii=False).encode()
+
+
+@pytest.mark.asyncio
+class TestOffloader:
+
+    async def test_threshold(self):
+        assert not Offloader("off", threshold=0).should(10**9)
+        assert not Offloader("chunked", threshold=1024).should(1023)
+        assert Offloader("chunked", threshold=1024).should(1024)
+
+    async def test_chunked_matches_inline(self):
+        data = payloads.chats_payload(120, extra_users=1)
+        offloader = Offloader("chunked", threshold=0, chunk=25)
+        result = await offloader.validate((ChatsResponse,), raw(data))
+        assert result == ChatsResponse.model_validate(data)
+
+    async def test_chunked_union(self):
+        offloader = Offloader("chunked", threshold=0)
+        models = (MessagesResponse, FailedResponse)
+        messages = await offloader.validate(models, raw(payloads.messages_payload(30)))
+        assert isinstance(messages, MessagesResponse) and len(messages.messages) == 30
+        failed = await offloader.validate(models, raw({"code": 404, "message": "chat not found"}))
+        assert isinstance(failed, FailedResponse)
+        broken = payloads.messages_payload(3)
+        broken["messages"][1]["created"] = "yesterday"
+        with pytest.raises(ValueError):
+            await offloader.validate(models, raw(broken))
+
+    async def test_process_pool(self):
+        offloader = Offloader("processes", threshold=0, workers=1, warm=("app.models.avito:ChatsResponse",))
+        try:
+            data = payloads.chats_payload(20)
+            result = await offloader.validate((ChatsResponse,), raw(data))
+            assert result == ChatsResponse.model_validate(data)
+        finally:
+            offloader.close()
+
+    async def test_client_validates_large_payloads_offloaded(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=30, assisted_ratio=0.5))
+        avito_bl = await build_avito_bl(env)
+        offloader = Offloader("chunked", threshold=8 * 1024, chunk=10)
+        offloaded = []
+        validate = offloader.validate
+
+        async def spy(models, data):
+            offloaded.append((models, len(data)))
+            return await validate(models, data)
+
+        offloader.validate = spy
+        avito_bl.avito.offload = offloader
+
+        await avito_bl.meta()
+
+        # большой список чатов ушел в Offloader, короткие истории валидировались на месте
+        assert [models for models, _ in offloaded] == [(ChatsResponse,)]
+        assert env.avito.calls["get_chat_messages"] > 0
+        assert env.openai.calls["gen_answer"] > 0
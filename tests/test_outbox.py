@@ -0,0 +1,98 @@
+import httpx
+import pytest
+
+from app.models.avito import ChatsResponse
+from app.services.outbox import Outbox
+from app.services.store import LocalStore
+from bench import payloads
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+def flaky_send(env: FakeEnvironment, failures: int):
+    """Первые `failures` отправок отвечают 500."""
+    send = env.avito._send_message
+    state = {"left": failures}
+
+    def handler(request, **params):
+        if state["left"] > 0:
+            state["left"] -= 1
+            return httpx.Response(500, json={"code": 500, "message": "fake failure"})
+        return send(request, **params)
+
+    # маршруты связаны с методами в __init__, поэтому подменяется запись в таблице
+    env.avito._routes = [
+        (method, pattern, stage, handler if stage == "send_message" else route)
+        for method, pattern, stage, route in env.avito._routes
+    ]
+
+
+def chat(last_message_id: str = "m1"):
+    data = payloads.chats_payload(1)["chats"][0]
+    data["last_message"]["id"] = last_message_id
+    return ChatsResponse.model_validate({"chats": [data]}).chats[0]
+
+
+@pytest.mark.asyncio
+class TestOutbox:
+
+    async def test_retry_without_regeneration(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=2, assisted_ratio=1))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.outbox.backoff = 0
+        flaky_send(env, failures=2)
+
+        await avito_bl.meta()
+        assert env.openai.calls["gen_answer"] == 2
+        assert len(avito_bl.outbox.entries) == 2
+
+        await avito_bl.meta()
+        assert env.openai.calls["gen_answer"] == 2
+        assert env.avito.calls["send_message"] == 4
+        assert not avito_bl.outbox.entries
+
+    async def test_stale_when_buyer_writes_again(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=1, assisted_ratio=1))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.outbox.backoff = 0
+        avito_bl.debouncer.window = 0
+        flaky_send(env, failures=1)
+
+        await avito_bl.meta()
+        (entry,) = avito_bl.outbox.entries.values()
+        env.avito.buyer_writes(entry.chat_id)
+
+        await avito_bl.meta()
+        assert env.openai.calls["gen_answer"] == 2
+        assert not avito_bl.outbox.entries
+
+    async def test_backoff_and_expiry(self):
+        outbox = Outbox(max_attempts=3, backoff=10)
+        entry = outbox.put(chat(), "ответ", first_time=True)
+        outbox.failed(entry, now=entry.created_at)
+        assert not outbox.due(entry, now=entry.created_at + 9)
+        assert outbox.due(entry, now=entry.created_at + 10)
+        outbox.failed(entry, now=entry.created_at + 10)
+        assert entry.next_attempt == entry.created_at + 30
+        outbox.failed(entry, now=entry.created_at + 30)
+        assert not outbox.entries
+
+    async def test_prune(self):
+        outbox = Outbox()
+        answered, rewritten, waiting = chat("a"), chat("b"), chat("c")
+        for i, c in enumerate((answered, rewritten, waiting)):
+            c.id = f"chat-{i}"
+            outbox.put(c, "ответ", first_time=False)
+        outbox.prune({rewritten.id: chat("b2"), waiting.id: waiting})
+        assert list(outbox.entries) == [waiting.id]
+
+    async def test_survives_restart(self, tmp_path):
+        store = LocalStore(tmp_path / "state.sqlite3")
+        await store.open()
+        entry = Outbox(store).put(chat(), "ответ", first_time=True)
+        await store.flush()
+
+        restored = Outbox(store)
+        await restored.restore()
+        await store.close()
+        assert restored.entries == {entry.chat_id: entry}
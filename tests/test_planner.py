@@ -0,0 +1,59 @@
+import pytest
+
+from app.core.metrics import PLANNER_AVOIDED_CALLS_TOTAL
+from bench import payloads
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment, FakeLimits
+
+
+@pytest.mark.asyncio
+class TestTickPlanner:
+
+    async def test_enriches_only_what_quota_can_use(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=20, assisted_ratio=0), limits=FakeLimits(limit=2))
+        avito_bl = await build_avito_bl(env)
+        avoided = PLANNER_AVOIDED_CALLS_TOTAL.get(call="get_chat_messages")
+
+        await avito_bl.meta()
+
+        assert env.avito.calls["get_chat_messages"] == 2 + avito_bl.planner.lookahead
+        assert env.avito.calls["send_message"] == 2
+        assert PLANNER_AVOIDED_CALLS_TOTAL.get(call="get_chat_messages") == avoided + 13
+
+    async def test_assisted_chats_ignore_quota(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=10, assisted_ratio=1), limits=FakeLimits(limit=0))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.planner.lookahead = 10
+        await avito_bl.meta()
+        for chat_id in env.avito.chats:
+            env.avito.buyer_writes(chat_id)
+        avito_bl.planner.lookahead = 0
+
+        await avito_bl.meta()
+
+        # уже отвеченные чаты известны как ассистированные и обогащаются без оглядки на квоту
+        assert env.avito.calls["send_message"] == 20
+
+    async def test_manager_chats_do_not_starve_new_buyers(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=6, assisted_ratio=1), limits=FakeLimits(limit=1))
+        for messages in env.avito.messages.values():
+            for message in messages:
+                if message["direction"] == "out":
+                    # ответы без метки AI — в чатах уже отвечал менеджер
+                    message["content"]["text"] = message["content"]["text"].replace(payloads.AI_MARK, "")
+        avito_bl = await build_avito_bl(env)
+        avito_bl.planner.lookahead = 5
+
+        await avito_bl.meta()
+        assert env.avito.calls["send_message"] == 0
+        enriched = env.avito.calls["get_chat_messages"]
+
+        for i in range(6, 9):
+            env.avito._add_chat(i, history=1, unanswered=True, assisted=False)
+            env.avito.buyer_writes(f"u2i-fake{i}")
+        for _ in range(3):
+            await avito_bl.meta()
+
+        # чаты менеджера больше не обогащаются и не занимают квоту новых покупателей
+        assert env.avito.calls["send_message"] == 1
+        assert env.avito.calls["get_chat_messages"] - enriched <= 3
@@ -0,0 +1,52 @@
+import asyncio
+import marshal
+import time
+
+import pytest
+
+from app.core.profiling import PROFILER, LoopLagMonitor, Profiler
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+@pytest.mark.asyncio
+class TestProfiler:
+
+    async def test_captures_armed_ticks(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=2))
+        avito_bl = await build_avito_bl(env)
+        captured = len(PROFILER.captured)
+        PROFILER.capture_ticks(1)
+
+        await avito_bl.meta()
+        await avito_bl.meta()
+
+        assert len(PROFILER.captured) == captured + 1 and PROFILER.armed == 0
+        profile = PROFILER.captured[-1]
+        assert PROFILER.get(profile.index) is profile
+        assert "gen_answer" in profile.summary(limit=200)
+        assert marshal.loads(profile.dump()) == profile.stats
+
+    async def test_memory_diff_between_ticks(self):
+        profiler = Profiler()
+        profiler.start_memory(frames=1)
+        try:
+            kept = []
+            for _ in range(2):
+                async with profiler.tick():
+                    kept.append(bytearray(1_000_000))
+        finally:
+            profiler.stop_memory()
+        assert any("test_profiling.py" in line for line in profiler.memory_diff)
+
+    async def test_loop_lag_monitor_reports_blocking_stack(self):
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            time.sleep(0.2)
+            await asyncio.sleep(0.05)
+        finally:
+            monitor.stop()
+        assert monitor.events
+        assert any("time.sleep(0.2)" in line for line in monitor.events[0]["stack"])
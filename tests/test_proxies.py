@@ -0,0 +1,91 @@
+import httpx
+import pytest
+
+from app.core.metrics import PROXY_HEALTHY
+from app.services.proxies import ProxyPool, ProxyPoolTransport
+
+URLS = ["http://u:p@proxy-a:3128", "http://u:p@proxy-b:3128", "http://u:p@proxy-c:3128"]
+
+
+class FakeTransport(httpx.AsyncBaseTransport):
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.fail:
+            raise httpx.ProxyError("407 or refused", request=request)
+        return httpx.Response(200, json={"ok": True})
+
+
+def pooled(pool: ProxyPool, fail: set[str] = frozenset()) -> ProxyPoolTransport:
+    transport = ProxyPoolTransport(pool)
+    transport._transports = {p.url: FakeTransport(fail=p.url in fail) for p in pool.proxies}
+    return transport
+
+
+@pytest.mark.asyncio
+class TestProxyPool:
+
+    async def test_latency_weighted(self):
+        pool = ProxyPool(URLS)
+        fast, slow, _ = pool.proxies
+        for _ in range(20):
+            pool.observe(fast, 0.05, ok=True)
+            pool.observe(slow, 2.0, ok=True)
+        chosen = [pool.choose() for _ in range(2000)]
+        assert chosen.count(fast) > 5 * chosen.count(slow)
+        assert {p["proxy"] for p in pool.as_dict()} == {"proxy-a:3128", "proxy-b:3128", "proxy-c:3128"}
+
+    async def test_sticky_moves_only_from_ejected(self):
+        pool = ProxyPool(URLS, eject_after=1)
+        keys = [f"host-{i}" for i in range(50)]
+        before = {key: pool.choose(key) for key in keys}
+        victim = before["host-0"]
+        pool.observe(victim, 1.0, ok=False)
+        after = {key: pool.choose(key) for key in keys}
+        assert victim not in after.values()
+        assert all(after[key] is before[key] for key in keys if before[key] is not victim)
+
+    async def test_single_proxy_readmitted_by_traffic(self):
+        pool = ProxyPool(URLS[:1], eject_after=2)
+        proxy = pool.proxies[0]
+        pool.start()
+        assert pool._checker is None
+        for _ in range(2):
+            pool.observe(proxy, 1.0, ok=False)
+        assert not proxy.healthy and PROXY_HEALTHY.get(proxy="proxy-a:3128") == 0
+
+        assert pool.choose() is proxy
+        pool.observe(proxy, 0.5, ok=True)
+        assert proxy.healthy and PROXY_HEALTHY.get(proxy="proxy-a:3128") == 1
+
+        # следующий сбой — снова первая пауза, а не удвоенная
+        for _ in range(2):
+            pool.observe(proxy, 1.0, ok=False)
+        assert proxy.ejections == 1
+
+    async def test_failover_and_ejection(self):
+        # alpha=0: задержки не меняются, выбор 50/50
+        pool = ProxyPool(URLS[:2], eject_after=2, alpha=0)
+        transport = pooled(pool, fail={URLS[0]})
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(50):
+                assert (await client.get("https://api.openai.com/v1/models")).status_code == 200
+        bad, good = pool.proxies
+        assert not bad.healthy and bad.errors == 2
+        assert good.healthy and good.requests == 50
+
+    async def test_readmission(self, monkeypatch):
+        pool = ProxyPool(URLS[:2], eject_after=1, eject_for=0)
+        bad = pool.proxies[0]
+        pool.observe(bad, 1.0, ok=False)
+        assert not bad.healthy
+
+        async def check(proxy):
+            return True, 0.1
+
+        monkeypatch.setattr(pool, "check", check)
+        await pool.check_all()
+        assert bad.healthy and bad.failures == 0
@@ -0,0 +1,59 @@
+import pytest
+
+from app.models.avito import Chat
+from app.services.scheduling import DeadlineScheduler
+from bench import payloads
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+def chat(i: int, created: int) -> Chat:
+    return Chat.model_validate(payloads.chat(i, payloads.message(f"u2i-fake{i}", 0, "in", created), created))
+
+
+class TestDeadlineScheduler:
+
+    def test_earliest_deadline_first(self):
+        chats = [chat(0, 900), chat(1, 100), chat(2, 500)]
+        plan = DeadlineScheduler(sla=60).plan(chats, now=1000)
+        assert [c.id for c in plan.ordered] == ["u2i-fake1", "u2i-fake2", "u2i-fake0"]
+        assert plan.shed == [] and plan.deferred == []
+
+    def test_no_shedding_without_overload(self):
+        chats = [chat(0, 0), chat(1, 990)]
+        plan = DeadlineScheduler(stale_after=100, capacity=2).plan(chats, now=1000)
+        assert len(plan.ordered) == 2 and plan.shed == []
+
+    def test_sheds_stale_then_defers(self):
+        chats = [chat(i, created) for i, created in enumerate((0, 10, 950, 960, 970))]
+        plan = DeadlineScheduler(stale_after=100, capacity=2).plan(chats, now=1000)
+        assert [c.id for c in plan.shed] == ["u2i-fake0", "u2i-fake1"]
+        assert [c.id for c in plan.ordered] == ["u2i-fake2", "u2i-fake3"]
+        assert [c.id for c in plan.deferred] == ["u2i-fake4"]
+
+    def test_sheds_only_overflow(self):
+        chats = [chat(i, created) for i, created in enumerate((0, 10, 20, 30))]
+        scheduler = DeadlineScheduler(stale_after=100, capacity=3)
+        plan = scheduler.plan(chats, now=1000)
+        assert [c.id for c in plan.shed] == ["u2i-fake0"]
+        assert [c.id for c in plan.ordered] == ["u2i-fake1", "u2i-fake2", "u2i-fake3"]
+
+        # нагрузка спала: пропущенный чат снова в работе
+        plan = scheduler.plan(chats[:1], now=1010)
+        assert [c.id for c in plan.ordered] == ["u2i-fake0"] and plan.shed == []
+
+
+@pytest.mark.asyncio
+class TestSheddingTick:
+
+    async def test_shed_chat_answered_later(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=4, assisted_ratio=1))
+        avito_bl = await build_avito_bl(env)
+        avito_bl.scheduler = DeadlineScheduler(stale_after=600, capacity=3)
+
+        await avito_bl.meta()
+        assert env.avito.calls["send_message"] == 3
+        assert "u2i-fake3" in avito_bl.sync.pending and "u2i-fake3" not in avito_bl.replied
+
+        await avito_bl.meta()
+        assert env.avito.calls["send_message"] == 4
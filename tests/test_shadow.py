@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.metrics import CHATS_LATE_TOTAL, CHATS_TOTAL, OPENAI_CONCURRENCY_LIMIT, OPENAI_TOKENS_TOTAL
+from app.services.avito import ShadowAvitoBL
+from app.services.shadow import ShadowLog
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+def shadow_of(live, tmp_path) -> ShadowAvitoBL:
+    return ShadowAvitoBL(
+        avito=live.avito,
+        openai=live.openai,
+        editor=live.editor,
+        limits_service=live.limits,
+        tg_notificator=live.tg_notificator,
+        shadow=ShadowLog(tmp_path / "shadow.jsonl"),
+    )
+
+
+def tokens() -> float:
+    return OPENAI_TOKENS_TOTAL.get(kind="prompt") + OPENAI_TOKENS_TOTAL.get(kind="completion")
+
+
+@pytest.mark.asyncio
+class TestShadowMode:
+
+    async def test_no_side_effects(self, tmp_path):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=4, assisted_ratio=0.5))
+        live = await build_avito_bl(env)
+        shadow = shadow_of(live, tmp_path)
+
+        await shadow.meta()
+        await shadow.meta()
+        await shadow.shadow.flush()
+
+        assert env.openai.calls["gen_answer"] == 4
+        assert env.avito.calls["send_message"] == 0
+        assert env.limits.count == 0
+        assert env.telegram.calls["SendMessage"] == 0
+
+        records = [json.loads(line) for line in (tmp_path / "shadow.jsonl").read_text(encoding="utf-8").splitlines()]
+        replies = [r for r in records if r["kind"] == "reply"]
+        ticks = [r for r in records if r["kind"] == "tick"]
+        assert len(replies) == 4 and sum(r["first_time"] for r in replies) == 2
+        assert all(r["answer"] and r["tokens"] > 0 for r in replies)
+        assert len(ticks) == 2 and set(ticks[0]["stages"]) == {"listing", "enrichment", "answering"}
+
+    async def test_alongside_keeps_live_metrics(self, tmp_path):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=4, assisted_ratio=1))
+        live = await build_avito_bl(env)
+        shadow = shadow_of(live, tmp_path)
+        shadow.governor.limit = 1
+        seen, answered, late, used = (
+            CHATS_TOTAL.get(status="seen"), CHATS_TOTAL.get(status="answered"), CHATS_LATE_TOTAL.get(), tokens()
+        )
+
+        await asyncio.gather(live.meta(), shadow.meta())
+
+        assert env.openai.calls["gen_answer"] == 8
+        assert env.avito.calls["send_message"] == 4
+        assert CHATS_TOTAL.get(status="seen") - seen == 4
+        assert CHATS_TOTAL.get(status="answered") - answered == 4
+        assert CHATS_LATE_TOTAL.get() - late == 4
+        assert tokens() - used == live.meter.used
+        assert OPENAI_CONCURRENCY_LIMIT.get() == live.governor.current_limit
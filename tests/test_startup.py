@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from app.core.startup import StartupReport
+
+
+@pytest.mark.asyncio
+class TestStartupReport:
+
+    async def test_warm_up(self):
+        report = StartupReport()
+
+        async def ok():
+            await asyncio.sleep(0)
+
+        async def fail():
+            raise ConnectionError("proxy is down")
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        warmup = await report.warm_up({"avito": ok, "openai": fail, "telegram": slow}, timeout=0.05)
+
+        assert warmup["avito"]["ok"]
+        assert not warmup["openai"]["ok"]
+        assert "proxy is down" in warmup["openai"]["error"]
+        assert not warmup["telegram"]["ok"]
+
+    async def test_preload(self):
+        report = StartupReport()
+        report.preload(["json"])
+        report.phase("imports_loaded")
+
+        data = report.as_dict()
+        assert "json" in data["imports"]
+        assert "imports_loaded" in data["phases"]
@@ -0,0 +1,65 @@
+import pytest
+
+from app.core.metrics import STORE_DROPPED_WRITES_TOTAL
+from app.models.avito import ChatsResponse, MessagesResponse
+from app.services.store import LocalStore
+from bench import payloads
+
+
+@pytest.fixture
+async def store(tmp_path):
+    store = LocalStore(tmp_path / "state.sqlite3", flush_interval=0.01)
+    await store.open()
+    yield store
+    await store.close()
+
+
+@pytest.mark.asyncio
+class TestLocalStore:
+
+    async def test_chats_and_messages(self, store: LocalStore):
+        chat = ChatsResponse.model_validate(payloads.chats_payload(1)).chats[0]
+        messages = MessagesResponse.model_validate(payloads.messages_payload(8, chat_id=chat.id)).messages
+        store.save_chat(chat)
+        store.save_messages(chat.id, messages)
+        await store.flush()
+
+        assert [c.id for c in await store.load_chats()] == [chat.id]
+        assert [m.id for m in await store.load_messages(chat.id)] == [m.id for m in messages]
+        histories = await store.recent_histories(10)
+        assert histories[chat.id][0].id == messages[0].id
+
+    async def test_replies_and_watermarks(self, store: LocalStore):
+        store.record_reply("u2i-1", "m1", "Здравствуйте!", first_time=True)
+        store.record_reply("u2i-1", "m3", "Да, есть доставка", first_time=False)
+        store.set_watermark("chats_updated", 1700000000)
+        await store.flush()
+
+        assert await store.last_replies() == {"u2i-1": "m3"}
+        assert await store.get_watermark("chats_updated") == 1700000000
+        assert await store.get_watermark("missing", 0) == 0
+
+    async def test_reopen(self, tmp_path):
+        store = LocalStore(tmp_path / "state.sqlite3")
+        await store.open()
+        store.set_watermark("last_tick", 1)
+        await store.close()
+
+        reopened = LocalStore(tmp_path / "state.sqlite3")
+        await reopened.open()
+        assert await reopened.get_watermark("last_tick") == 1
+        await reopened.close()
+
+    async def test_failed_operation_keeps_rest_of_batch(self, store: LocalStore):
+        dropped = STORE_DROPPED_WRITES_TOTAL.get(scope="statement")
+        store.record_reply("u2i-1", "m1", "Здравствуйте!", first_time=True)
+        store.record_reply("u2i-2", "m1", None, first_time=True)  # NOT NULL: операция отброшена
+        store.save_outbox("u2i-3", "m1", "Да", True, 1.0, 0, 0.0)
+        store.set_watermark("chats_updated", 1700000000)
+        await store.flush()
+
+        assert await store.last_replies() == {"u2i-1": "m1"}
+        assert [row["chat_id"] for row in await store.load_outbox()] == ["u2i-3"]
+        assert await store.get_watermark("chats_updated") == 1700000000
+        assert STORE_DROPPED_WRITES_TOTAL.get(scope="statement") == dropped + 1
+
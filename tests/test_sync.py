@@ -0,0 +1,79 @@
+import pytest
+
+from app.models.avito import Message
+from app.services.store import LocalStore
+from app.services.sync import InboxSync
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+from bench.payloads import message
+
+
+async def make_sync(env: FakeEnvironment, store: LocalStore | None = None) -> InboxSync:
+    avito_bl = await build_avito_bl(env)
+    sync = InboxSync(avito_bl.avito, store, page_size=50)
+    await sync.restore()
+    return sync
+
+
+@pytest.mark.asyncio
+class TestInboxSync:
+
+    async def test_incremental_reads_only_changed_pages(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=120, answered=100))
+        sync = await make_sync(env)
+
+        first = await sync.delta()
+        assert first.full and first.pages == 5
+        assert len(first.changed) == 220
+        assert len(sync.pending) == 120
+
+        idle = await sync.delta()
+        assert not idle.full and idle.pages == 1 and idle.changed == []
+
+        # старый отвеченный чат поднимается наверх списка и попадает в дельту с первой же страницы
+        env.avito.buyer_writes("u2i-fake219")
+        active = await sync.delta()
+        assert active.pages == 1
+        assert [chat.id for chat in active.changed] == ["u2i-fake219"]
+        assert "u2i-fake219" in sync.pending
+
+    async def test_incremental_reads_until_marked_chats(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=0, answered=220))
+        sync = await make_sync(env)
+        await sync.delta()
+
+        # событие вебхука пришло раньше, чем чат поднялся в списке
+        updated = env.avito.chats["u2i-fake219"]["updated"]
+        sync.mark("u2i-fake219", Message.model_validate(message("u2i-fake219", 99, "in", updated + 1)))
+        delta = await sync.delta()
+        assert not delta.full and delta.pages == 5
+        assert sync.pending["u2i-fake219"].last_message.id == "u2i-fake219-m99"
+        assert not sync.dirty
+
+        # отставший список не затирает чат из события
+        await sync.delta(full=True)
+        assert sync.pending["u2i-fake219"].last_message.id == "u2i-fake219-m99"
+
+    async def test_full_sweep_drops_vanished_chats(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=3))
+        sync = await make_sync(env)
+        await sync.delta()
+
+        del env.avito.chats["u2i-fake0"]
+        await sync.delta()
+        assert "u2i-fake0" in sync.pending
+
+        await sync.delta(full=True)
+        assert "u2i-fake0" not in sync.pending
+
+    async def test_restore_from_store(self, tmp_path):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=3, answered=2))
+        store = LocalStore(tmp_path / "state.sqlite3")
+        await store.open()
+        await (await make_sync(env, store)).delta()
+        await store.flush()
+
+        sync = await make_sync(env, store)
+        await store.close()
+        assert sync.watermark == max(chat["updated"] for chat in env.avito.chats.values())
+        assert set(sync.pending) == {"u2i-fake0", "u2i-fake1", "u2i-fake2"}
@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+from app.api.routes.tick import _ticks, tick_events
+from bench.e2e import build_avito_bl
+from bench.fakes import FakeAvito, FakeEnvironment
+
+
+def parse(chunks: list[str]) -> list[tuple[str, dict]]:
+    events = []
+    for chunk in chunks:
+        if chunk.startswith(":"):
+            continue
+        event, data = chunk.strip().split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+@pytest.mark.asyncio
+class TestTick:
+
+    async def test_progress_stream(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=3, assisted_ratio=1))
+        avito_bl = await build_avito_bl(env)
+
+        events = parse([chunk async for chunk in tick_events(avito_bl)])
+        names = [event for event, _ in events]
+        assert names[0] == "tick.started"
+        assert names[-2:] == ["tick.finished", "done"]
+        assert [data["stage"] for event, data in events if event == "stage"] == ["listing", "enrichment", "answering"]
+        chats = [data for event, data in events if event == "chat"]
+        assert len(chats) == 3 and all(chat["answered"] for chat in chats)
+        assert events[-1][1] == {"ok": True}
+
+    async def test_scheduled_tick_skipped_while_running(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=1))
+        avito_bl = await build_avito_bl(env)
+
+        async with avito_bl._tick_lock:
+            assert not await avito_bl.run_tick()
+        assert await avito_bl.run_tick(cooldown=15)
+        assert not await avito_bl.run_tick(cooldown=15)
+        # ручной тик не ограничен паузой
+        assert await avito_bl.run_tick(cooldown=15, wait=True)
+        assert avito_bl.ticks == 2
+
+    async def test_manual_tick_waits_for_running(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=1))
+        avito_bl = await build_avito_bl(env)
+
+        await avito_bl._tick_lock.acquire()
+        stream = tick_events(avito_bl, keepalive=0.01)
+        assert await anext(stream) == ": keepalive\n\n"
+        assert avito_bl.ticks == 0
+        avito_bl._tick_lock.release()
+
+        events = parse([chunk async for chunk in stream])
+        assert events[-1] == ("done", {"ok": True})
+        assert avito_bl.ticks == 1
+
+    async def test_failed_tick(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=1))
+        avito_bl = await build_avito_bl(env)
+
+        async def broken():
+            raise RuntimeError("limits unavailable")
+
+        avito_bl.limits.get_bot = broken
+        events = parse([chunk async for chunk in tick_events(avito_bl)])
+        assert ("tick.finished", False) in [(event, data.get("ok")) for event, data in events]
+        assert events[-2][0] == "error"
+        assert events[-1] == ("done", {"ok": False})
+
+    async def test_manual_tick_skips_running_tick_events(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=2, assisted_ratio=1))
+        avito_bl = await build_avito_bl(env)
+        gate = asyncio.Event()
+        get_bot = avito_bl.limits.get_bot
+
+        async def slow():
+            await gate.wait()
+            return await get_bot()
+
+        avito_bl.limits.get_bot = slow
+        scheduled = asyncio.create_task(avito_bl.run_tick())
+        await asyncio.sleep(0)
+        stream = tick_events(avito_bl, keepalive=0.01)
+        assert await anext(stream) == ": keepalive\n\n"
+        avito_bl.limits.get_bot = get_bot
+        gate.set()
+
+        events = parse([chunk async for chunk in stream])
+        await scheduled
+        assert avito_bl.ticks == 2
+        assert events[0] == ("tick.started", {"tick": 2, "at": events[0][1]["at"]})
+        assert {data["tick"] for _, data in events[:-1]} == {2}
+        assert events[-1] == ("done", {"ok": True})
+
+    async def test_cancelled_tick(self):
+        env = FakeEnvironment(avito=FakeAvito(inbox_size=1))
+        avito_bl = await build_avito_bl(env)
+
+        await avito_bl._tick_lock.acquire()
+        stream = tick_events(avito_bl, keepalive=0.01)
+        assert await anext(stream) == ": keepalive\n\n"
+        for tick in list(_ticks):
+            tick.cancel()
+        avito_bl._tick_lock.release()
+
+        events = parse([chunk async for chunk in stream])
+        assert events == [("error", {"error": "CancelledError()"}), ("done", {"ok": False})]
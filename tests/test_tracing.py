@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.tracing import OTLPFileExporter, Tracer
+
+
+@pytest.mark.asyncio
+class TestTracer:
+
+    async def test_nested_spans(self):
+        tracer = Tracer(buffer_size=2)
+
+        async def call(name: str, chat_id: str):
+            with tracer.span(name, chat_id=chat_id):
+                await asyncio.sleep(0)
+
+        with tracer.span("tick"):
+            await asyncio.gather(call("avito.get_chat_messages", "1"), call("avito.get_chat_messages", "2"))
+
+        trace = tracer.last(1)[0]
+        assert trace.root.name == "tick"
+        assert len(trace.spans) == 3
+        assert all(span.parent_id == trace.root.span_id for span in trace.spans[1:])
+        assert {span.attributes["chat_id"] for span in trace.spans[1:]} == {"1", "2"}
+
+    async def test_ring_buffer_and_slowest(self):
+        tracer = Tracer(buffer_size=2, slowest_size=1)
+        for delay in (0.02, 0, 0):
+            with tracer.span("tick"):
+                await asyncio.sleep(delay)
+
+        assert len(tracer.last(10)) == 2
+        assert tracer.slowest(10)[0].duration_ms >= 20
+
+    async def test_error_status(self):
+        tracer = Tracer()
+        with pytest.raises(RuntimeError):
+            with tracer.span("tick"):
+                raise RuntimeError
+
+        assert tracer.last(1)[0].root.status == "error"
+
+
+class TestOTLPFileExporter:
+
+    def test_export(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        tracer = Tracer(exporter=OTLPFileExporter(path))
+        with tracer.span("tick", chat_id="u2i-1"):
+            pass
+
+        payload = json.loads(path.read_text(encoding="utf-8").splitlines()[0])
+        span = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        assert span["name"] == "tick"
+        assert span["attributes"] == [{"key": "chat_id", "value": {"stringValue": "u2i-1"}}]